@@ -0,0 +1,111 @@
+"""
+github_scraper のベンチマーク（保存済み HTML を使うのでネットワークには出ない）
+    python bench_scraper.py [--latency 0.3] [--interval 0.5]
+
+fixtures/google_repos_page*.html は GitHub の一覧ページと同じ要素構成の見本 HTML。
+  1. バックエンドごとの解析時間（ms/page）
+  2. 逐次版（取得→解析→保存→待機）とパイプライン版 crawl() の全体時間
+     取得は latency 秒かかる擬似リクエストで置き換える
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import tempfile
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import github_scraper as gs
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "google_repos_page*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def available_backends():
+    backends = ["html.parser"]
+    if gs._HAS_LXML:
+        backends.append("lxml")
+    if gs.HTMLParser is not None:
+        backends.append("selectolax")
+    return backends
+
+
+def fake_fetch(pages, latency: float):
+    def fetch(url: str) -> str:
+        time.sleep(latency)
+        page = int(dict(parse_qsl(urlsplit(url).query)).get("page", 1))
+        return pages[page - 1]
+
+    return fetch
+
+
+def sequential_crawl(pages, db_path: str, latency: float, interval: float, backend: str) -> int:
+    """issue1.ipynb と同じ順番で1ページずつ処理する"""
+    fetch = fake_fetch(pages, latency)
+    conn = sqlite3.connect(db_path)
+    gs.init_db(conn)
+    conn.execute("DELETE FROM repositories;")
+    conn.commit()
+    saved = 0
+    url = gs.org_url("google")
+    page = 1
+    while url:
+        html = fetch(url)
+        repos, next_href = gs.parse_page(html, backend)
+        conn.executemany("INSERT INTO repositories (name, language, stars) VALUES (?, ?, ?)", repos)
+        conn.commit()
+        saved += len(repos)
+        time.sleep(interval)
+        page += 1
+        url = gs.page_url(gs.org_url("google"), page) if next_href else None
+    conn.close()
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50, help="解析時間を測る繰り返し回数")
+    parser.add_argument("--latency", type=float, default=0.3, help="擬似リクエスト1回の所要時間（秒）")
+    parser.add_argument("--interval", type=float, default=0.5, help="リクエスト間隔（秒）")
+    args = parser.parse_args()
+
+    pages = load_pages()
+    if not pages:
+        raise SystemExit(f"fixture がありません: {FIXTURE_DIR}")
+
+    print(f"pages: {len(pages)}")
+    print("--- parse ---")
+    for backend in available_backends():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for html in pages:
+                gs.parse_page(html, backend)
+        ms = (time.perf_counter() - start) / (args.repeat * len(pages)) * 1000
+        print(f"{backend:12s}: {ms:7.2f} ms/page")
+
+    print(f"--- crawl (latency={args.latency}s, interval={args.interval}s) ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        n = sequential_crawl(pages, os.path.join(tmp, "seq.db"), args.latency, args.interval, "html.parser")
+        print(f"sequential (html.parser): {time.perf_counter() - start:6.2f} s  {n} 件")
+
+        start = time.perf_counter()
+        n = gs.crawl(
+            gs.org_url("google"),
+            db_path=os.path.join(tmp, "pipe.db"),
+            interval=args.interval,
+            fetch=fake_fetch(pages, args.latency),
+            verbose=False,
+        )
+        print(f"pipelined ({gs.PARSER_BACKEND}): {time.perf_counter() - start:6.2f} s  {n} 件")
+
+
+if __name__ == "__main__":
+    main()
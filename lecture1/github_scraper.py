@@ -0,0 +1,384 @@
+"""
+GitHub の organization リポジトリ一覧をスクレイピングして SQLite に保存する（issue1.ipynb のモジュール版）
+
+取得・解析・保存を別々に動かすパイプライン構成:
+  取得スレッド : 解析したページに次ページへのリンクがあれば次を取得する（リクエスト間隔は request_interval 秒以上空け、
+                 その待ち時間は解析・保存と重なる。最後のページの先は取得しない）
+  メインスレッド: HTML を解析する（selectolax > lxml > html.parser の順で使えるものを使う）
+  書き込みスレッド: 1本の接続・1トランザクションで upsert する
+
+    python github_scraper.py [--org google] [--interval 1.0]
+"""
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+# DBファイルの設定
+DB_NAME = "github.db"
+
+# GitHub のトップURL
+BASE_URL = "https://github.com"
+
+USER_AGENT = "Mozilla/5.0 (student scraper for assignment)"
+
+# 課題条件：各リクエストの間は必ず 1 秒空ける
+REQUEST_INTERVAL = 1.0
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+
+    _HAS_LXML = True
+except ImportError:
+    _HAS_LXML = False
+
+PARSER_BACKEND = "selectolax" if HTMLParser is not None else ("lxml" if _HAS_LXML else "html.parser")
+
+Repo = Tuple[str, Optional[str], int]  # (name, language, stars)
+
+_DONE = object()
+_ABORT = object()
+
+
+def org_url(org: str) -> str:
+    return f"{BASE_URL}/{org}?tab=repositories"
+
+
+def page_url(url: str, page: int) -> str:
+    """一覧URLの page パラメータを差し替えたURL（先読み用）"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+    if page > 1:
+        query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def parse_star_count(text: str) -> int:
+    """
+    スター数の文字列を整数に変換する補助関数
+    例: '1.2k' -> 1200, '12,345' -> 12345
+    """
+    text = text.strip()
+    if not text:
+        return 0
+
+    if text.endswith("k"):
+        try:
+            return int(float(text[:-1]) * 1000)
+        except ValueError:
+            return 0
+
+    try:
+        return int(text.replace(",", ""))
+    except ValueError:
+        return 0
+
+
+def _parse_selectolax(html: str) -> Tuple[List[Repo], Optional[str]]:
+    tree = HTMLParser(html)
+    items = tree.css('li[itemprop="owns"]') or tree.css("li.Box-row")
+
+    repos = []
+    for item in items:
+        name_tag = (
+            item.css_first('a[itemprop="name codeRepository"]')
+            or item.css_first('a[data-hovercard-type="repository"]')
+        )
+        if name_tag is None:
+            continue
+        lang_tag = item.css_first('[itemprop="programmingLanguage"]')
+        star_tag = item.css_first('a.Link--muted[href*="/stargazers"]')
+        repos.append((
+            name_tag.text(strip=True),
+            lang_tag.text(strip=True) if lang_tag is not None else None,
+            parse_star_count(star_tag.text(strip=True)) if star_tag is not None else 0,
+        ))
+
+    next_link = tree.css_first("a.next_page") or tree.css_first("a[rel='next']")
+    next_href = next_link.attributes.get("href") if next_link is not None else None
+    return repos, next_href
+
+
+def _parse_bs4(html: str, features: str) -> Tuple[List[Repo], Optional[str]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, features)
+    items = soup.select('li[itemprop="owns"]') or soup.select("li.Box-row")
+
+    repos = []
+    for item in items:
+        name_tag = (
+            item.select_one('a[itemprop="name codeRepository"]')
+            or item.select_one('a[data-hovercard-type="repository"]')
+        )
+        if not name_tag:
+            continue
+        lang_tag = item.select_one('[itemprop="programmingLanguage"]')
+        star_tag = item.select_one('a.Link--muted[href*="/stargazers"]')
+        repos.append((
+            name_tag.get_text(strip=True),
+            lang_tag.get_text(strip=True) if lang_tag else None,
+            parse_star_count(star_tag.get_text(strip=True)) if star_tag else 0,
+        ))
+
+    next_link = soup.select_one("a.next_page") or soup.select_one("a[rel='next']")
+    next_href = next_link.get("href") if next_link else None
+    return repos, next_href
+
+
+def parse_page(html: str, backend: str = PARSER_BACKEND) -> Tuple[List[Repo], Optional[str]]:
+    """
+    一覧ページ1枚を解析する
+    backend: "selectolax" / "lxml" / "html.parser"
+    returns:
+      repos: (name, language, stars) のリスト
+      next_href: 次ページへのリンク（無ければ None）
+    """
+    if backend == "selectolax":
+        return _parse_selectolax(html)
+    return _parse_bs4(html, backend)
+
+
+def http_fetch(url: str) -> str:
+    res = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=30)
+    res.raise_for_status()
+    return res.text
+
+
+def init_db(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS repositories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            language TEXT,
+            stars INTEGER NOT NULL
+        );
+        """
+    )
+    # 以前の版は毎回全削除して入れ直していたので、念のため同名の重複を最新だけにしてから一意にする
+    conn.execute("DELETE FROM repositories WHERE id NOT IN (SELECT MAX(id) FROM repositories GROUP BY name);")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_repositories_name ON repositories(name);")
+    # ORDER BY stars DESC を索引の逆順走査で返せるようにする
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_repositories_stars ON repositories(stars);")
+
+    # スター数の履歴。値が変わったときだけトリガーで1行追加する
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS repository_stars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            stars INTEGER NOT NULL,
+            recorded_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_repository_stars_name ON repository_stars(name, recorded_at);")
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_repositories_stars_insert
+        AFTER INSERT ON repositories
+        BEGIN
+            INSERT INTO repository_stars (name, stars) VALUES (new.name, new.stars);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_repositories_stars_update
+        AFTER UPDATE OF stars ON repositories
+        WHEN old.stars IS NOT new.stars
+        BEGIN
+            INSERT INTO repository_stars (name, stars) VALUES (new.name, new.stars);
+        END;
+        """
+    )
+    conn.commit()
+
+
+UPSERT_SQL = """
+INSERT INTO repositories (name, language, stars) VALUES (?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET
+    language=excluded.language,
+    stars=excluded.stars
+WHERE repositories.language IS NOT excluded.language
+   OR repositories.stars IS NOT excluded.stars;
+"""
+
+
+class _Fetcher(threading.Thread):
+    """
+    一覧ページを番号順に取得してキューに積む
+    2ページ目からは request_next() で次ページがあると知らされてから取得する（最後のページの先へはリクエストしない）
+    """
+
+    def __init__(self, start_url: str, fetch: Callable[[str], str], interval: float):
+        super().__init__(daemon=True)
+        self.start_url = start_url
+        self.fetch = fetch
+        self.interval = interval
+        self.pages: "queue.Queue" = queue.Queue()
+        self.stop = threading.Event()
+        self._next = threading.Semaphore(0)
+
+    def request_next(self) -> None:
+        self._next.release()
+
+    def run(self):
+        page = 1
+        last_request = 0.0
+        while not self.stop.is_set():
+            if page > 1:
+                while not self._next.acquire(timeout=0.1):
+                    if self.stop.is_set():
+                        return
+            wait = self.interval - (time.monotonic() - last_request)
+            if wait > 0 and self.stop.wait(wait):
+                break
+            url = page_url(self.start_url, page)
+            last_request = time.monotonic()
+            try:
+                item = (page, url, self.fetch(url))
+            except Exception as ex:
+                item = (page, url, ex)
+            self.pages.put(item)
+            if isinstance(item[2], Exception):
+                break
+            page += 1
+
+
+class _Writer(threading.Thread):
+    """
+    DB への書き込みを1本の接続にまとめる
+    クロール全体を1トランザクションにして、完了したときだけ COMMIT する（WAL なので読み手は前回の状態を読み続けられる）
+    """
+
+    def __init__(self, db_path: str):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.batches: "queue.Queue" = queue.Queue()
+        self.saved = 0
+        self.removed = 0
+        self.error: Optional[Exception] = None
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            init_db(conn)
+            conn.execute("BEGIN IMMEDIATE;")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (name TEXT PRIMARY KEY);")
+            conn.execute("DELETE FROM temp.seen;")
+            while True:
+                repos = self.batches.get()
+                if repos is _ABORT:
+                    conn.execute("ROLLBACK;")
+                    break
+                if repos is _DONE:
+                    # 今回の一覧に出てこなかったリポジトリは消す（履歴は残す）
+                    self.removed = conn.execute(
+                        "DELETE FROM repositories WHERE name NOT IN (SELECT name FROM temp.seen);"
+                    ).rowcount
+                    conn.execute("COMMIT;")
+                    break
+                conn.executemany(UPSERT_SQL, repos)
+                conn.executemany("INSERT OR IGNORE INTO temp.seen (name) VALUES (?);", [(r[0],) for r in repos])
+                self.saved += len(repos)
+        except Exception as ex:
+            self.error = ex
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+        finally:
+            conn.close()
+
+
+def crawl(
+    start_url: str = org_url("google"),
+    db_path: str = DB_NAME,
+    interval: float = REQUEST_INTERVAL,
+    fetch: Callable[[str], str] = http_fetch,
+    verbose: bool = True,
+) -> int:
+    """
+    一覧ページを最後までたどって保存する。保存した件数を返す
+    次ページは page パラメータで取得し、リポジトリのあるページに次ページへのリンクが無ければ終了する
+    リポジトリが1件も読めないページ（マークアップの変更・制限やエラーのページ）が来たら、何も反映せずに RuntimeError
+    （完了したクロールだけが「一覧に出てこなかったリポジトリの削除」まで進む）
+    """
+    fetcher = _Fetcher(start_url, fetch, interval)
+    writer = _Writer(db_path)
+    writer.start()
+    fetcher.start()
+
+    finished = False
+    try:
+        while True:
+            page, url, html = fetcher.pages.get()
+            if isinstance(html, Exception):
+                raise html
+            if verbose:
+                print(f"\n=== PAGE {page} ===")
+                print("[REQUEST]", url)
+
+            repos, next_href = parse_page(html)
+            if verbose:
+                print(f"{len(repos)} 件取得")
+            if not repos:
+                raise RuntimeError(f"PAGE {page} からリポジトリを読み取れませんでした: {url}")
+            writer.batches.put(repos)
+            if not next_href:
+                finished = True
+                break
+            fetcher.request_next()
+    finally:
+        fetcher.stop.set()
+        # 途中で失敗したときは何も反映しない
+        writer.batches.put(_DONE if finished else _ABORT)
+        writer.join()
+        fetcher.join()
+
+    if writer.error:
+        raise writer.error
+    if verbose:
+        print(f"\n{writer.saved} 件を保存しました（削除 {writer.removed} 件, parser: {PARSER_BACKEND}）")
+    return writer.saved
+
+
+def print_saved(db_path: str = DB_NAME) -> None:
+    conn = sqlite3.connect(db_path)
+    try:
+        print("\n=== 保存されたデータ一覧 ===")
+        for repo_id, name, language, stars in conn.execute(
+            "SELECT id, name, language, stars FROM repositories ORDER BY stars DESC;"
+        ):
+            print(f"[{repo_id}] {name} | language={language} | stars={stars}")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--org", default="google", help="対象の organization")
+    parser.add_argument("--db", default=DB_NAME, help="保存先DB")
+    parser.add_argument("--interval", type=float, default=REQUEST_INTERVAL, help="リクエスト間隔（秒）")
+    args = parser.parse_args()
+
+    try:
+        crawl(org_url(args.org), args.db, args.interval)
+        print_saved(args.db)
+    except Exception as e:
+        print("エラーが発生:", e)
+
+
+if __name__ == "__main__":
+    main()
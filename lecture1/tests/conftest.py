@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests/ から github_scraper を import できるようにする（lecture1 をパスに足す）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,80 @@
+"""
+github_scraper.crawl を保存済みの HTML（fixtures/）で確かめる（ネットワークには出ない）
+"""
+import glob
+import os
+import sqlite3
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+import github_scraper as gs
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+EMPTY_PAGE = "<html><body><p>Too many requests</p></body></html>"
+
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "google_repos_page*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def page_fetch(pages, requested):
+    def fetch(url: str) -> str:
+        requested.append(url)
+        page = int(dict(parse_qsl(urlsplit(url).query)).get("page", 1))
+        return pages[page - 1]
+
+    return fetch
+
+
+def snapshot(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        repos = conn.execute("SELECT name, language, stars FROM repositories ORDER BY name").fetchall()
+        stars = conn.execute("SELECT name, stars FROM repository_stars ORDER BY id").fetchall()
+        return repos, stars
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """全ページをクロールして保存済みにした DB"""
+    db_path = str(tmp_path / "github.db")
+    pages = load_pages()
+    requested = []
+    saved = gs.crawl(gs.org_url("google"), db_path=db_path, interval=0, fetch=page_fetch(pages, requested), verbose=False)
+    assert saved > 0
+    return db_path, pages, requested
+
+
+def test_crawl_saves_all_pages_without_requesting_past_last(stored):
+    db_path, pages, requested = stored
+    # 最後のページの先（page=len+1）はリクエストしない
+    assert len(requested) == len(pages)
+    repos, _ = snapshot(db_path)
+    expected = {r[0] for html in pages for r in gs.parse_page(html)[0]}
+    assert {r[0] for r in repos} == expected
+
+
+def test_empty_first_page_leaves_table_untouched(stored):
+    db_path, _, _ = stored
+    before = snapshot(db_path)
+    with pytest.raises(RuntimeError):
+        gs.crawl(gs.org_url("google"), db_path=db_path, interval=0, fetch=lambda url: EMPTY_PAGE, verbose=False)
+    assert snapshot(db_path) == before
+
+
+def test_empty_later_page_leaves_table_untouched(stored):
+    db_path, pages, _ = stored
+    before = snapshot(db_path)
+    requested = []
+    broken = [pages[0], EMPTY_PAGE] + pages[2:]
+    with pytest.raises(RuntimeError):
+        gs.crawl(gs.org_url("google"), db_path=db_path, interval=0, fetch=page_fetch(broken, requested), verbose=False)
+    assert snapshot(db_path) == before
+    assert len(requested) == 2
@@ -1,13 +1,17 @@
 import flet as ft
 
+from ui_scheduler import UpdateScheduler
+
 
 def main(page: ft.Page):
+    # 連打しても counter の送信は1フレームに1回にまとめる
+    ui = UpdateScheduler(page)
     counter = ft.Text("0", size=50, data=0)
 
     def increment_click(e):
         counter.data += 1
         counter.value = str(counter.data)
-        counter.update()
+        ui.mark(counter)
 
     page.floating_action_button = ft.FloatingActionButton(
         icon=ft.Icons.ADD, on_click=increment_click
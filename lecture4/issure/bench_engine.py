@@ -0,0 +1,88 @@
+"""
+式エンジンと従来の safe_eval（文字制限 + eval）の処理速度比較
+    python bench_engine.py [--seconds 1.0]
+
+  cold : キャッシュを空にした状態（毎回 字句解析・構文解析・変換する）
+  warm : 同じ式を繰り返し評価する（= ボタンを何度も押す、sin/cos を続けて押すなど）
+  table: 関数表モードで --points 点を NumPy でまとめて計算する時間
+"""
+import argparse
+import math
+import time
+
+import calc_engine
+
+EXPRESSIONS = [
+    "1+2*3",
+    "12.5*(3-1.25)/4",
+    "2^10-1",
+    "(1+2)*(3+4)*(5+6)",
+    "3.14159*2^2",
+    "-7/3+0.5",
+    "((1.5+2.5)*3-4)/2",
+    "123456789*987654321",
+    "2^0.5*2^0.5",
+    "100-99.99",
+]
+
+
+def legacy_safe_eval(expression: str) -> float:
+    """issure.py で使っていた評価方法（比較用）"""
+    expression = expression.replace("^", "**")
+    allowed = set("0123456789+-*/(). ")
+    if any(c not in allowed for c in expression):
+        raise ValueError("invalid characters")
+    env = {
+        "__builtins__": None,
+        "pi": math.pi,
+        "e": math.e,
+    }
+    return eval(expression, env, {})
+
+
+def throughput(fn, seconds: float, before_each=None) -> float:
+    """seconds 秒の間に評価できた式の数 / 秒"""
+    n = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for expr in EXPRESSIONS:
+            if before_each:
+                before_each()
+            fn(expr)
+        n += len(EXPRESSIONS)
+    return n / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--points", type=int, default=calc_engine.MAX_TABLE_POINTS)
+    args = parser.parse_args()
+
+    for expr in EXPRESSIONS:
+        assert math.isclose(legacy_safe_eval(expr), calc_engine.evaluate(expr)), expr
+
+    legacy = throughput(legacy_safe_eval, args.seconds)
+    cold = throughput(calc_engine.evaluate, args.seconds, before_each=calc_engine.clear_caches)
+    calc_engine.clear_caches()
+    warm = throughput(calc_engine.evaluate, args.seconds)
+
+    print(f"safe_eval (eval)  : {legacy:12,.0f} expr/s")
+    print(f"calc_engine cold  : {cold:12,.0f} expr/s  (x{cold / legacy:.2f})")
+    print(f"calc_engine warm  : {warm:12,.0f} expr/s  (x{warm / legacy:.2f})")
+
+    start = time.perf_counter()
+    try:
+        calc_engine.evaluate("9^9^9")
+    except calc_engine.CalcError as ex:
+        print(f"9^9^9 -> CalcError({ex}) in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    table_expr = "sin(x)*x^2/(1+x)"
+    calc_engine.evaluate_table(table_expr, 0, 100, 2)  # 変換と NumPy の読み込みを済ませておく
+    start = time.perf_counter()
+    calc_engine.evaluate_table(table_expr, 0, 100, args.points)
+    print(f"table {table_expr} x {args.points:,} points: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
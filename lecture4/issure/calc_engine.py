@@ -0,0 +1,582 @@
+"""
+電卓の式エンジン
+eval() を使わず、字句解析 → 構文木 → Python の関数（クロージャ）へ一度だけ変換して評価する。
+  - 同じ式の変換結果と計算結果は LRU キャッシュで使い回す
+  - 指数の大きさ・入れ子の深さ・計算時間に上限を設けて、9^9^9 のような入力で固まらないようにする
+  - 数の種類（モード）を選べる
+      float    : 2進の浮動小数点（これまでどおり）
+      decimal  : 10進の浮動小数点。桁数（precision）を指定できる（0.1+0.2 = 0.3）
+      fraction : 分数で厳密に計算する（1/3*3 = 1）
+      int      : 多倍長整数のみ。/ は切り捨て除算
+  - 変数 x を含む式は NumPy の配列演算に変換して、x の範囲全体を1回で計算できる（関数表モード）
+"""
+import math
+import re
+import time
+from contextlib import nullcontext
+from decimal import Context, Decimal, DivisionByZero, InvalidOperation, Overflow, localcontext, MAX_EMAX, MIN_EMIN
+from fractions import Fraction
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple, Union
+
+Number = Union[int, float, Decimal, Fraction]
+
+MODES = ("float", "decimal", "fraction", "int")
+
+MAX_DEPTH = 64            # 括弧・単項演算の入れ子の上限
+MAX_TOKENS = 512          # 式の長さの上限（構文木の高さ = 評価時の再帰の深さを抑える）
+MAX_INT_BITS = 100_000    # 整数の計算結果のビット数の上限（約3万桁）
+MAX_FLOAT_EXPONENT = 1e6  # 小数のべき乗の指数の上限
+TIME_BUDGET_SEC = 0.5     # 1回の評価にかけてよい時間
+MAX_TABLE_POINTS = 1_000_000  # 関数表で計算する点数の上限
+
+DEFAULT_PRECISION = 28    # decimal モードの有効桁数（decimal モジュールの既定値と同じ）
+MAX_PRECISION = 5_000     # decimal モードで指定できる有効桁数の上限
+
+# 大きな階乗・べき乗は別プロセスで、上限を広げて計算する（calc_worker.py）
+HEAVY_INT_BITS = 20_000_000   # 約600万桁
+HEAVY_TIME_BUDGET_SEC = 60.0
+
+DISPLAY_MAX_BITS = 13_000  # これより大きい整数は「仮数e+指数」で表示する（str() は 4300 桁を超えると例外になる）
+
+CONSTANTS: Dict[str, float] = {
+    "pi": math.pi,
+    "e": math.e,
+}
+
+
+# 関数名 -> (スカラー用, NumPy での名前)
+FUNCTIONS: Dict[str, Tuple[Callable[[float], float], str]] = {
+    "sin": (math.sin, "sin"),
+    "cos": (math.cos, "cos"),
+    "tan": (math.tan, "tan"),
+    "log": (math.log10, "log10"),
+    "ln": (math.log, "log"),
+    "sqrt": (math.sqrt, "sqrt"),
+}
+
+# decimal モードで Decimal 自身の高精度な計算を使う関数
+_DECIMAL_FUNCTIONS: Dict[str, Callable[[Decimal], Decimal]] = {
+    "log": Decimal.log10,
+    "ln": Decimal.ln,
+    "sqrt": Decimal.sqrt,
+}
+
+
+class CalcError(ValueError):
+    """式が不正、または上限を超えたとき"""
+
+
+class LimitExceeded(CalcError):
+    """結果の大きさ・計算時間の上限を超えたとき（上限を広げれば計算できる）"""
+
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<op>\*\*|[-+*/^()!])"
+    r")"
+)
+
+
+def tokenize(src: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    src = src.rstrip()
+    while pos < len(src):
+        m = _TOKEN_RE.match(src, pos)
+        if not m or m.end() == pos:
+            raise CalcError(f"invalid character at {pos}: {src[pos]!r}")
+        kind = m.lastgroup
+        text = m.group(kind)
+        if kind == "op" and text == "**":
+            text = "^"
+        tokens.append((kind, text))
+        if len(tokens) > MAX_TOKENS:
+            raise CalcError("expression too long")
+        pos = m.end()
+    return tokens
+
+
+# ---- モードごとの数 ----
+
+def _decimal_context(precision: int) -> Context:
+    # 指数の範囲は最大にして、9^9^9 も 4.28...E+369693099 のように近似で出せるようにする
+    return Context(
+        prec=precision,
+        Emax=MAX_EMAX,
+        Emin=MIN_EMIN,
+        traps=[InvalidOperation, DivisionByZero, Overflow],
+    )
+
+
+def _mode_context(mode: str, precision: int):
+    return localcontext(_decimal_context(precision)) if mode == "decimal" else nullcontext()
+
+
+def _decimal_pi() -> Decimal:
+    """現在の精度で円周率を求める（decimal モジュールのドキュメントの級数）"""
+    with localcontext() as ctx:
+        ctx.prec += 2
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    return +s
+
+
+def _literal(text: str, mode: str) -> Number:
+    if mode == "decimal":
+        return Decimal(text)
+    if mode == "fraction":
+        return Fraction(text)
+    if any(c in text for c in ".eE"):
+        if mode == "int":
+            raise CalcError("integer mode accepts integers only")
+        return float(text)
+    return int(text)
+
+
+def _constant(name: str, mode: str) -> Number:
+    if mode == "decimal":
+        return _decimal_pi() if name == "pi" else Decimal(1).exp()
+    if mode == "fraction":
+        # 無理数なので float の値をそのまま分数にする
+        return Fraction(repr(CONSTANTS[name]))
+    if mode == "int":
+        raise CalcError(f"{name} is not available in integer mode")
+    return CONSTANTS[name]
+
+
+def _function(name: str, mode: str) -> Callable[[Number], Number]:
+    func = FUNCTIONS[name][0]
+    if mode == "decimal":
+        if name in _DECIMAL_FUNCTIONS:
+            return _decimal_function(name)
+        return lambda v: Decimal(repr(func(float(v))))
+    if mode == "fraction":
+        return lambda v: Fraction(repr(func(float(v))))
+    if mode == "int":
+        if name == "sqrt":
+            return math.isqrt
+        raise CalcError(f"{name} is not available in integer mode")
+    return func
+
+
+def _decimal_function(name: str) -> Callable[[Decimal], Decimal]:
+    func = _DECIMAL_FUNCTIONS[name]
+
+    def call(value: Decimal) -> Decimal:
+        # Decimal は ln(0) を -Infinity にするので、float モードと同じく定義域の外は CalcError にする
+        if value < 0 or (value == 0 and name != "sqrt"):
+            raise CalcError("math domain error")
+        result = func(value)
+        if not result.is_finite():
+            raise CalcError("result is not a number")
+        return result
+
+    return call
+
+
+def _from_int(value: int, mode: str) -> Number:
+    if mode == "decimal":
+        return +Decimal(value)
+    if mode == "fraction":
+        return Fraction(value)
+    return value
+
+
+def _as_int(value: Number) -> int:
+    """整数値なら int にする（2.0 / 4/2 / Decimal('3') など）"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, Fraction) and value.denominator == 1:
+        return value.numerator
+    if isinstance(value, Decimal) and value.is_finite() and value == value.to_integral_value():
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise CalcError("factorial needs an integer")
+
+
+def _size_bits(value: Union[int, Fraction]) -> float:
+    """整数・分数を表すのに必要なビット数の目安"""
+    if isinstance(value, Fraction):
+        return max(_size_bits(value.numerator), _size_bits(value.denominator))
+    return math.log2(abs(value)) if value else 0.0
+
+
+# ---- 構文解析（構文木はタプルで表す） ----
+#   ("num", value) / ("var", name) / ("neg", node) / ("bin", op, left, right) / ("call", name, node) / ("fact", node)
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]], variables: Tuple[str, ...] = (), mode: str = "float"):
+        self.tokens = tokens
+        self.variables = variables
+        self.mode = mode
+        self.i = 0
+        self.depth = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.i] if self.i < len(self.tokens) else ("end", "")
+
+    def take(self) -> Tuple[str, str]:
+        tok = self.peek()
+        self.i += 1
+        return tok
+
+    def enter(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise CalcError("expression too deeply nested")
+
+    def parse(self):
+        if not self.tokens:
+            raise CalcError("empty expression")
+        node = self.expr()
+        if self.peek()[0] != "end":
+            raise CalcError(f"unexpected token: {self.peek()[1]!r}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.take()[1]
+            node = ("bin", op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.take()[1]
+            node = ("bin", op, node, self.unary())
+        return node
+
+    def unary(self):
+        # Python と同じく -2^2 = -(2^2)
+        if self.peek() in (("op", "-"), ("op", "+")):
+            op = self.take()[1]
+            self.enter()
+            node = self.unary()
+            self.depth -= 1
+            return ("neg", node) if op == "-" else node
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.peek() == ("op", "^"):
+            self.take()
+            self.enter()
+            # 右結合: 2^3^2 = 2^(3^2)
+            node = ("bin", "^", node, self.unary())
+            self.depth -= 1
+        return node
+
+    def postfix(self):
+        # 階乗: 3!^2 = (3!)^2、2^3! = 2^(3!)
+        node = self.atom()
+        while self.peek() == ("op", "!"):
+            self.take()
+            self.enter()
+            node = ("fact", node)
+        return node
+
+    def atom(self):
+        kind, text = self.take()
+        if kind == "num":
+            return ("num", _literal(text, self.mode))
+        if kind == "name":
+            if text in FUNCTIONS:
+                if self.take() != ("op", "("):
+                    raise CalcError(f"'(' expected after {text}")
+                self.enter()
+                arg = self.expr()
+                self.depth -= 1
+                if self.take() != ("op", ")"):
+                    raise CalcError("missing ')'")
+                return ("call", text, arg)
+            if text in self.variables:
+                return ("var", text)
+            if text not in CONSTANTS:
+                raise CalcError(f"unknown name: {text}")
+            return ("num", _constant(text, self.mode))
+        if (kind, text) == ("op", "("):
+            self.enter()
+            node = self.expr()
+            self.depth -= 1
+            if self.take() != ("op", ")"):
+                raise CalcError("missing ')'")
+            return node
+        raise CalcError(f"unexpected token: {text!r}" if text else "unexpected end of expression")
+
+
+def parse(src: str, variables: Tuple[str, ...] = (), mode: str = "float"):
+    return _Parser(tokenize(src), variables, mode).parse()
+
+
+# ---- 上限付きの演算 ----
+
+class _Budget:
+    __slots__ = ("deadline", "max_int_bits")
+
+    def __init__(self, seconds: float, max_int_bits: int = MAX_INT_BITS):
+        self.deadline = time.perf_counter() + seconds
+        self.max_int_bits = max_int_bits
+
+    def check(self):
+        if time.perf_counter() > self.deadline:
+            raise LimitExceeded("time budget exceeded")
+
+
+def _pow(a: Number, b: Number, budget: _Budget) -> Number:
+    budget.check()
+    if isinstance(a, Decimal):
+        # Decimal は指数が大きくても有効桁数の範囲で近似するので、桁あふれだけ見ればよい
+        return a ** b
+    if isinstance(b, Fraction):
+        if b.denominator != 1:
+            raise CalcError("fraction mode needs an integer exponent")
+        b = b.numerator
+    if isinstance(a, (int, Fraction)) and isinstance(b, int) and (b > 0 or isinstance(a, Fraction)) and _size_bits(a) > 0:
+        # 結果のビット数 ≒ |b| * log2|a| を計算前に見積もる（整数の負の指数は float になるので対象外）
+        if abs(b) * _size_bits(a) > budget.max_int_bits:
+            raise LimitExceeded("result too large")
+    elif abs(b) > MAX_FLOAT_EXPONENT and abs(a) != 1:
+        raise CalcError("exponent too large")
+    try:
+        result = a ** b
+    except OverflowError as ex:
+        raise CalcError("result too large") from ex
+    if isinstance(result, complex):
+        # 負の数の分数乗（(-8)^(1/3) など）は Python では複素数になる
+        raise CalcError("result is not a real number")
+    return result
+
+
+def _int_pow(a: int, b: int, budget: _Budget) -> int:
+    if b < 0:
+        raise CalcError("negative exponent in integer mode")
+    return _pow(a, b, budget)
+
+
+def _mul(a: Number, b: Number, budget: _Budget) -> Number:
+    if isinstance(a, int) and isinstance(b, int):
+        if a.bit_length() + b.bit_length() > budget.max_int_bits:
+            raise LimitExceeded("result too large")
+    elif isinstance(a, Fraction) and _size_bits(a) + _size_bits(b) > budget.max_int_bits:
+        raise LimitExceeded("result too large")
+    return a * b
+
+
+def _div(a: Number, b: Number, budget: _Budget) -> Number:
+    if b == 0:
+        raise CalcError("division by zero")
+    try:
+        return a / b
+    except OverflowError as ex:
+        raise CalcError("result too large") from ex
+
+
+def _floordiv(a: int, b: int, budget: _Budget) -> int:
+    if b == 0:
+        raise CalcError("division by zero")
+    return a // b
+
+
+def _factorial(a: Number, budget: _Budget) -> int:
+    budget.check()
+    n = _as_int(a)
+    if n < 0:
+        raise CalcError("factorial of a negative number")
+    # log2(n!) = lgamma(n+1) / ln 2 で結果のビット数を計算前に見積もる
+    if n > 1 and math.lgamma(n + 1) / math.log(2) > budget.max_int_bits:
+        raise LimitExceeded("result too large")
+    return math.factorial(n)
+
+
+_BINARY: Dict[str, Callable[[Number, Number, _Budget], Number]] = {
+    "+": lambda a, b, budget: a + b,
+    "-": lambda a, b, budget: a - b,
+    "*": _mul,
+    "/": _div,
+    "^": _pow,
+}
+
+_BINARY_INT = dict(_BINARY, **{"/": _floordiv, "^": _int_pow})
+
+
+def _compile_node(node, mode: str = "float") -> Callable[[_Budget], Number]:
+    kind = node[0]
+    if kind == "num":
+        value = node[1]
+        return lambda budget: value
+    if kind == "neg":
+        inner = _compile_node(node[1], mode)
+        return lambda budget: -inner(budget)
+    if kind == "bin":
+        fn = (_BINARY_INT if mode == "int" else _BINARY)[node[1]]
+        left = _compile_node(node[2], mode)
+        right = _compile_node(node[3], mode)
+        return lambda budget: fn(left(budget), right(budget), budget)
+    if kind == "call":
+        func = _function(node[1], mode)
+        inner = _compile_node(node[2], mode)
+        return lambda budget: func(inner(budget))
+    if kind == "fact":
+        inner = _compile_node(node[1], mode)
+        return lambda budget: _from_int(_factorial(inner(budget), budget), mode)
+    raise CalcError(f"unknown node: {kind}")
+
+
+@lru_cache(maxsize=256)
+def compile_expression(src: str, mode: str = "float", precision: int = DEFAULT_PRECISION) -> Callable[[_Budget], Number]:
+    """式を評価用の関数に変換する（同じ式は1回だけ変換）"""
+    with _mode_context(mode, precision):
+        return _compile_node(parse(src, mode=mode), mode)
+
+
+@lru_cache(maxsize=1024)
+def _evaluate_cached(src: str, mode: str, precision: int, time_budget: float, max_int_bits: int) -> Number:
+    fn = compile_expression(src, mode, precision)
+    with _mode_context(mode, precision):
+        return fn(_Budget(time_budget, max_int_bits))
+
+
+def evaluate(
+    src: str,
+    mode: str = "float",
+    precision: int = DEFAULT_PRECISION,
+    time_budget: float = TIME_BUDGET_SEC,
+    max_int_bits: int = MAX_INT_BITS,
+) -> Number:
+    """
+    式を評価する。不正な式は CalcError、大きさ・時間の上限超えは LimitExceeded
+    エラーはキャッシュされないので、失敗した式は毎回評価し直す
+    """
+    if mode not in MODES:
+        raise CalcError(f"unknown mode: {mode}")
+    if mode == "decimal":
+        if not 1 <= precision <= MAX_PRECISION:
+            raise CalcError(f"precision must be 1..{MAX_PRECISION}")
+    else:
+        # decimal 以外では桁数は使わないので、キャッシュのキーをそろえる
+        precision = DEFAULT_PRECISION
+    try:
+        return _evaluate_cached(src, mode, precision, time_budget, max_int_bits)
+    except CalcError:
+        raise
+    except (ArithmeticError, ValueError, TypeError) as ex:
+        raise CalcError(str(ex) or type(ex).__name__) from ex
+
+
+def _format_int(n: int) -> str:
+    if n.bit_length() <= DISPLAY_MAX_BITS:
+        return str(n)
+    # 上位 64 ビットと桁数から「仮数e+指数」を求める（巨大な整数を10進に変換しない）
+    shift = n.bit_length() - 64
+    digits = math.log10(abs(n) >> shift) + shift * math.log10(2)
+    exponent = int(digits)
+    sign = "-" if n < 0 else ""
+    return f"{sign}{10 ** (digits - exponent):.8f}e+{exponent}"
+
+
+def format_result(value: Number, mode: str = "float") -> str:
+    """計算結果を表示用の文字列にする（表示した文字列はそのまま式として再入力できる）"""
+    if isinstance(value, int):
+        return _format_int(value)
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return _format_int(value.numerator)
+        return f"{_format_int(value.numerator)}/{_format_int(value.denominator)}"
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            raise CalcError("result too large" if value.is_infinite() else "result is not a number")
+        # 末尾の 0 を落とす。表示中の精度で丸めないよう、値の桁数に合わせた精度で行う
+        value = value.normalize(_decimal_context(max(1, len(value.as_tuple().digits))))
+        # 桁が多すぎなければ指数表記を使わない（1E+2 -> 100）
+        if -40 < value.adjusted() < 40:
+            return format(value, "f")
+        return str(value)
+    # float: inf / nan は int() にできないので、ほかの計算エラーと同じく CalcError にする
+    if not math.isfinite(value):
+        raise CalcError("result too large" if math.isinf(value) else "result is not a number")
+    # 整数に十分近ければ整数で表示
+    if abs(value - int(value)) < 1e-12:
+        return _format_int(int(value))
+    return str(value)
+
+
+def cache_info() -> Dict[str, object]:
+    return {
+        "compiled": compile_expression.cache_info(),
+        "results": _evaluate_cached.cache_info(),
+    }
+
+
+def clear_caches() -> None:
+    compile_expression.cache_clear()
+    _evaluate_cached.cache_clear()
+
+
+# ---- 関数表（NumPy でまとめて計算） ----
+
+def _compile_vector_node(node, np):
+    kind = node[0]
+    if kind == "num":
+        value = float(node[1])
+        return lambda xs: value
+    if kind == "var":
+        return lambda xs: xs
+    if kind == "neg":
+        inner = _compile_vector_node(node[1], np)
+        return lambda xs: np.negative(inner(xs))
+    if kind == "bin" and node[1] == "^" and node[3] == ("num", 2):
+        # x^2 はよく使うので np.power より速い np.square にする
+        inner = _compile_vector_node(node[2], np)
+        return lambda xs: np.square(inner(xs))
+    if kind == "bin":
+        ufunc = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide, "^": np.power}[node[1]]
+        left = _compile_vector_node(node[2], np)
+        right = _compile_vector_node(node[3], np)
+        return lambda xs: ufunc(left(xs), right(xs))
+    if kind == "call":
+        ufunc = getattr(np, FUNCTIONS[node[1]][1])
+        inner = _compile_vector_node(node[2], np)
+        return lambda xs: ufunc(inner(xs))
+    if kind == "fact":
+        raise CalcError("'!' is not available in table mode")
+    raise CalcError(f"unknown node: {kind}")
+
+
+@lru_cache(maxsize=64)
+def compile_vectorized(src: str, var: str = "x"):
+    """x を含む式を、x の配列を受け取って結果の配列を返す関数に変換する"""
+    try:
+        import numpy as np
+    except ImportError as ex:
+        raise CalcError("numpy is required for table mode") from ex
+    return _compile_vector_node(parse(src, (var,)), np)
+
+
+def evaluate_table(src: str, start: float, stop: float, points: int, max_points: int = MAX_TABLE_POINTS):
+    """
+    x = start..stop を points 等分した点で式を評価する
+    returns: (xs, ys) の NumPy 配列。定義域外は nan、桁あふれは inf になる
+    """
+    if points < 2:
+        raise CalcError("points must be >= 2")
+    if points > max_points:
+        raise CalcError(f"too many points (max {max_points})")
+    fn = compile_vectorized(src)
+
+    import numpy as np
+
+    xs = np.linspace(float(start), float(stop), int(points))
+    with np.errstate(all="ignore"):
+        ys = np.broadcast_to(fn(xs), xs.shape).astype(float, copy=False)
+    return xs, ys
@@ -0,0 +1,97 @@
+"""
+重い計算（大きな階乗・べき乗）を別プロセスで行う
+画面側のスレッドは待たないので、計算中もボタン操作ができる。中止するとプロセスごと止める。
+
+    job = EvalJob("100000!", "int", 28, on_done=show, on_error=show_error, on_progress=show_elapsed)
+    job.start()
+    ...
+    job.cancel()
+"""
+import multiprocessing
+import threading
+import time
+from typing import Callable, Optional
+
+from calc_engine import HEAVY_INT_BITS, HEAVY_TIME_BUDGET_SEC, evaluate, format_result
+
+PROGRESS_INTERVAL_SEC = 0.2
+
+
+def _run(conn, src: str, mode: str, precision: int) -> None:
+    """子プロセス側：上限を広げて評価し、表示用の文字列にして返す（巨大な数そのものは送らない）"""
+    try:
+        value = evaluate(src, mode, precision, time_budget=HEAVY_TIME_BUDGET_SEC, max_int_bits=HEAVY_INT_BITS)
+        conn.send(("ok", format_result(value, mode)))
+    except Exception as ex:
+        conn.send(("error", str(ex)))
+    finally:
+        conn.close()
+
+
+class EvalJob:
+    """1つの式を子プロセスで評価する。結果・経過はコールバックで受け取る（監視スレッドから呼ばれる）"""
+
+    def __init__(
+        self,
+        src: str,
+        mode: str,
+        precision: int,
+        on_done: Callable[[str], None],
+        on_error: Callable[[str], None],
+        on_progress: Optional[Callable[[float], None]] = None,
+    ):
+        self.src = src
+        self.mode = mode
+        self.precision = precision
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancelled = False
+        self._proc = None
+
+    def start(self) -> "EvalJob":
+        # flet はスレッドを使っているので fork ではなく spawn で起動する
+        ctx = multiprocessing.get_context("spawn")
+        parent, child = ctx.Pipe(duplex=False)
+        self._proc = ctx.Process(target=_run, args=(child, self.src, self.mode, self.precision), daemon=True)
+        self._proc.start()
+        child.close()
+        threading.Thread(target=self._watch, args=(parent,), daemon=True).start()
+        return self
+
+    def _watch(self, conn) -> None:
+        started = time.monotonic()
+        status, payload = "error", "worker exited"
+        try:
+            while not self.cancelled:
+                if conn.poll(PROGRESS_INTERVAL_SEC):
+                    status, payload = conn.recv()
+                    break
+                if not self._proc.is_alive():
+                    # 終了直前に送られた結果を取りこぼさない
+                    if conn.poll():
+                        status, payload = conn.recv()
+                    break
+                if self.on_progress:
+                    self.on_progress(time.monotonic() - started)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            self._proc.join(timeout=1)
+
+        if self.cancelled:
+            return
+        if status == "ok":
+            self.on_done(payload)
+        else:
+            self.on_error(payload)
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.is_alive() and not self.cancelled
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self._proc is not None and self._proc.is_alive():
+            self._proc.terminate()
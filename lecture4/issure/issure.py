@@ -1,6 +1,24 @@
 import math
 import flet as ft
 
+from calc_engine import (
+    DEFAULT_PRECISION,
+    MAX_PRECISION,
+    MAX_TABLE_POINTS,
+    CalcError,
+    LimitExceeded,
+    evaluate,
+    evaluate_table,
+    format_result,
+)
+from calc_worker import EvalJob
+from ui_scheduler import UpdateScheduler
+
+# 関数表モード：計算は最大 MAX_TABLE_POINTS 点まで。画面には間引いて表示する
+TABLE_ROWS = 200     # 表に出す行数
+TABLE_CHUNK = 50     # 何行ずつ表に流し込むか
+CHART_POINTS = 300   # グラフに渡す点数
+
 
 def main(page: ft.Page):
     page.title = "Calculator"
@@ -8,6 +26,10 @@ def main(page: ft.Page):
     page.window_height = 640
     page.padding = 16
     page.theme_mode = ft.ThemeMode.LIGHT
+    page.scroll = ft.ScrollMode.AUTO
+
+    # キー入力ごとの表示更新は1フレームに1回にまとめて送る
+    ui = UpdateScheduler(page)
 
     display = ft.TextField(
         value="0",
@@ -23,17 +45,57 @@ def main(page: ft.Page):
         segments=[
             ft.Segment(value="basic", label=ft.Text("基本")),
             ft.Segment(value="sci", label=ft.Text("科学")),
+            ft.Segment(value="table", label=ft.Text("関数表")),
+        ],
+    )
+
+    # 数の種類：小数（float）/ 高精度10進（decimal）/ 分数 / 整数
+    number_mode = ft.Dropdown(
+        value="float",
+        dense=True,
+        expand=2,
+        options=[
+            ft.dropdown.Option("float", "小数"),
+            ft.dropdown.Option("decimal", "高精度 (decimal)"),
+            ft.dropdown.Option("fraction", "分数"),
+            ft.dropdown.Option("int", "整数"),
+        ],
+    )
+    precision = ft.TextField(
+        label=f"桁数（1〜{MAX_PRECISION}）",
+        value=str(DEFAULT_PRECISION),
+        dense=True,
+        expand=1,
+        visible=False,
+    )
+
+    def on_number_mode_change(e):
+        precision.visible = number_mode.value == "decimal"
+        ui.mark(precision)
+
+    number_mode.on_change = on_number_mode_change
+
+    # 別プロセスでの計算中に出す表示
+    busy_text = ft.Text("", size=12)
+    busy_row = ft.Row(
+        visible=False,
+        controls=[
+            ft.ProgressRing(width=16, height=16, stroke_width=2),
+            busy_text,
+            ft.TextButton("中止", on_click=lambda e: cancel_job()),
         ],
     )
 
     # 内部状態
     expr = "0"
+    job = None
 
     def set_display(v: str):
         nonlocal expr
         expr = v
         display.value = v
-        display.update()
+        display.error_text = None
+        ui.mark(display)
 
     def append(s: str):
         nonlocal expr
@@ -44,6 +106,7 @@ def main(page: ft.Page):
         set_display(expr)
 
     def clear(_=None):
+        cancel_job()
         set_display("0")
 
     def backspace(_=None):
@@ -52,81 +115,103 @@ def main(page: ft.Page):
         set_display(expr)
 
     def toggle_sign(_=None):
-        nonlocal expr
-        # 表示全体を数値として反転できるときだけ反転
+        # 先頭に - を付け外し（float に変換しないので、整数・分数モードでもそのまま使える）
+        if expr.startswith("-"):
+            set_display(expr[1:])
+        else:
+            set_display("-" + expr)
+
+    def current_precision() -> int:
         try:
-            x = float(expr)
-            set_display(str(-x))
-        except:
-            # 数式中なら末尾の数だけ反転するのは面倒なので、シンプルに先頭に - を付け外し
-            if expr.startswith("-"):
-                set_display(expr[1:])
-            else:
-                set_display("-" + expr)
-
-    # 安全に評価（許可する文字を制限）
-    def safe_eval(expression: str) -> float:
-        allowed = set("0123456789+-*/(). ")
-        # Sci用の記号は先に変換してから評価するのでここでは不要
-        if any(c not in allowed for c in expression):
-            raise ValueError("invalid characters")
-
-        # math の関数/定数だけ許可
-        env = {
-            "__builtins__": None,
-            "pi": math.pi,
-            "e": math.e,
-        }
-        return eval(expression, env, {})
+            return int(precision.value)
+        except (TypeError, ValueError):
+            raise CalcError("precision must be an integer")
 
-    def equals(_=None):
-        nonlocal expr
+    # 重い計算（上限を超えた階乗・べき乗）は別プロセスへ
+    def start_job(src: str):
+        nonlocal job
+
+        def done(result: str):
+            if job is this:
+                finish_job(result)
+
+        def failed(message: str):
+            if job is this:
+                finish_job("Error", message)
+
+        def progress(elapsed: float):
+            if job is this:
+                busy_text.value = f"計算中… {elapsed:.1f} 秒"
+                ui.mark(busy_text)
+
+        this = EvalJob(src, number_mode.value, current_precision(), on_done=done, on_error=failed, on_progress=progress)
+        job = this
+        busy_text.value = "計算中…"
+        busy_row.visible = True
+        ui.mark(busy_row)
+        this.start()
+
+    def finish_job(result: str, message: str = ""):
+        nonlocal job
+        job = None
+        busy_row.visible = False
+        ui.mark(busy_row)
+        set_display(result)
+        if message:
+            # 別プロセスでの計算が失敗した理由は表示欄の下に出す
+            display.error_text = message
+
+    def cancel_job():
+        nonlocal job
+        if job is not None:
+            job.cancel()
+            job = None
+            busy_row.visible = False
+            ui.mark(busy_row)
+
+    def run_expression(src: str):
+        cancel_job()
         try:
-            # x^y を ** に変換
-            s = expr.replace("^", "**")
-            v = safe_eval(s)
-            # きれい表示
-            if abs(v - int(v)) < 1e-12:
-                set_display(str(int(v)))
-            else:
-                set_display(str(v))
+            # 式エンジンで評価（同じ式は変換・計算結果をキャッシュ、巨大なべき乗などは上限で打ち切り）
+            v = evaluate(src, number_mode.value, current_precision())
+            set_display(format_result(v, number_mode.value))
+        except LimitExceeded:
+            # 画面のスレッドでは打ち切った計算を、上限を広げて別プロセスでやり直す
+            start_job(src)
         except Exception:
             set_display("Error")
 
+    def equals(_=None):
+        run_expression(expr)
+
     # 科学関数：表示をその場で数値に変換（ワンタップで計算）
-    def apply_unary(fn):
-        nonlocal expr
-        try:
-            s = expr.replace("^", "**")
-            x = safe_eval(s)
-            v = fn(x)
-            if abs(v - int(v)) < 1e-12:
-                set_display(str(int(v)))
-            else:
-                set_display(str(v))
-        except Exception:
-            set_display("Error")
+    def apply_unary(name: str):
+        run_expression(f"{name}({expr})")
 
     def insert_pi(_=None):
-        append(str(math.pi))
+        # 数字ではなく pi と入れておくと、高精度モードでは桁数ぶんの円周率になる
+        append("pi")
 
     def sqrt(_=None):
-        apply_unary(lambda x: math.sqrt(x))
+        apply_unary("sqrt")
 
     def sin(_=None):
-        apply_unary(lambda x: math.sin(x))
+        apply_unary("sin")
 
     def cos(_=None):
-        apply_unary(lambda x: math.cos(x))
+        apply_unary("cos")
 
     def tan(_=None):
-        apply_unary(lambda x: math.tan(x))
+        apply_unary("tan")
 
     def log10(_=None):
-        apply_unary(lambda x: math.log10(x))
+        apply_unary("log")
 
     def ln(_=None):
-        apply_unary(lambda x: math.log(x))
+        apply_unary("ln")
+
+    def factorial(_=None):
+        run_expression(f"({expr})!")
 
     # ボタン生成ヘルパ
     def btn(label, on_click, expand=1, bgcolor=None):
@@ -148,6 +233,81 @@ def main(page: ft.Page):
         controls=[
             ft.Row([btn("sin", sin), btn("cos", cos), btn("tan", tan), btn("π", insert_pi)]),
             ft.Row([btn("log", log10), btn("ln", ln), btn("√", sqrt), btn("^", lambda e: append("^"))]),
+            ft.Row([btn("n!", factorial), btn("(", lambda e: append("(")), btn(")", lambda e: append(")")), btn("!", lambda e: append("!"))]),
+        ],
+    )
+
+    # 関数表パッド：x を含む式を範囲全体でまとめて計算して、表とグラフにする
+    x_start = ft.TextField(label="x 開始", value="0", expand=1, dense=True)
+    x_stop = ft.TextField(label="x 終了", value="10", expand=1, dense=True)
+    x_points = ft.TextField(label=f"点数（最大 {MAX_TABLE_POINTS:,}）", value="100", expand=1, dense=True)
+    table_status = ft.Text("", size=12)
+    table_chart = ft.LineChart(height=180, visible=False)
+    table_view = ft.DataTable(
+        columns=[ft.DataColumn(ft.Text("x")), ft.DataColumn(ft.Text("f(x)"))],
+        rows=[],
+        visible=False,
+    )
+
+    def make_table(_=None):
+        try:
+            points = int(x_points.value)
+            xs, ys = evaluate_table(expr, float(x_start.value), float(x_stop.value), points)
+        except (CalcError, ValueError) as ex:
+            table_status.value = f"Error: {ex}"
+            ui.mark(table_status)
+            return
+
+        n = len(xs)
+        shown = min(n, TABLE_ROWS)
+        with ui.batch():
+            table_status.value = f"{n:,} 点を計算（表は {shown} 行に間引いて表示）"
+
+            # グラフ：有限値だけを等間隔に間引いて描く
+            step = max(1, n // CHART_POINTS)
+            table_chart.data_series = [
+                ft.LineChartData(
+                    data_points=[
+                        ft.LineChartDataPoint(float(x), float(y))
+                        for x, y in zip(xs[::step], ys[::step])
+                        if math.isfinite(y)
+                    ],
+                    stroke_width=2,
+                    color=ft.Colors.BLUE,
+                )
+            ]
+            table_chart.visible = True
+            table_view.rows.clear()
+            table_view.visible = True
+            ui.mark(table_status, table_chart, table_view)
+        ui.flush()
+
+        # 表：少しずつ流し込んで、最初の行がすぐ見えるようにする（1かたまりごとに送る）
+        step = max(1, n // shown)
+        indices = list(range(0, n, step))[:shown]
+        for i in range(0, len(indices), TABLE_CHUNK):
+            with ui.batch():
+                table_view.rows.extend(
+                    ft.DataRow(cells=[ft.DataCell(ft.Text(f"{xs[j]:.6g}")), ft.DataCell(ft.Text(f"{ys[j]:.6g}"))])
+                    for j in indices[i:i + TABLE_CHUNK]
+                )
+                ui.mark(table_view)
+            ui.flush()
+
+    def insert_fn(name: str):
+        return lambda e: append(f"{name}(")
+
+    table_pad = ft.Column(
+        visible=False,
+        spacing=10,
+        controls=[
+            ft.Row([btn("x", lambda e: append("x")), btn("sin", insert_fn("sin")), btn("cos", insert_fn("cos")), btn("tan", insert_fn("tan"))]),
+            ft.Row([btn("log", insert_fn("log")), btn("ln", insert_fn("ln")), btn("√", insert_fn("sqrt")), btn("(", lambda e: append("(")), btn(")", lambda e: append(")"))]),
+            ft.Row([x_start, x_stop, x_points]),
+            btn("表を作成", make_table, bgcolor=ft.Colors.BLUE_50),
+            table_status,
+            table_chart,
+            table_view,
         ],
     )
 
@@ -165,7 +325,8 @@ def main(page: ft.Page):
 
     def on_mode_change(e):
         sci_pad.visible = "sci" in mode.selected
-        sci_pad.update()
+        table_pad.visible = "table" in mode.selected
+        ui.mark(sci_pad, table_pad)
 
     mode.on_change = on_mode_change
 
@@ -175,12 +336,17 @@ def main(page: ft.Page):
             controls=[
                 ft.Row([ft.Text("電卓", size=22, weight=ft.FontWeight.BOLD)], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 mode,
+                ft.Row([number_mode, precision]),
                 display,
+                busy_row,
                 sci_pad,
+                table_pad,
                 basic_pad,
             ],
         )
     )
 
 
-ft.app(target=main)
+if __name__ == "__main__":
+    # 計算用の子プロセス（spawn）がこのファイルを読み込んだときに、画面を二重に開かないようにする
+    ft.app(target=main)
@@ -1,11 +1,67 @@
+import sys
+import threading
+import time
+
+# --profile-startup: import と最初の描画までの時間を段階ごとに表示する
+PROFILE_STARTUP = "--profile-startup" in sys.argv[1:]
+_started = time.perf_counter()
+_phases = []
+
+
+def mark(phase: str):
+    if PROFILE_STARTUP:
+        _phases.append((phase, (time.perf_counter() - _started) * 1000, len(sys.modules)))
+
+
+def report_startup():
+    print(f"{'段階':<14}{'所要ms':>8}{'累計ms':>8}{'modules':>9}", file=sys.stderr)
+    last = 0.0
+    for phase, total_ms, modules in _phases:
+        print(f"{phase:<16}{total_ms - last:>10.1f}{total_ms:>10.1f}{modules:>9}", file=sys.stderr)
+        last = total_ms
+
+
 import flet as ft
-import requests
 
+mark("import flet")
+
+# requests（と urllib3）は読み込みに時間がかかるので、画面を出したあと通信するときに読み込む
 AREA_URL = "https://www.jma.go.jp/bosai/common/const/area.json"
 FORECAST_BASE_URL = "https://www.jma.go.jp/bosai/forecast/data/forecast"
 
+# 天気の区分（lecture6/app/weather_codes.py と同じ）-> アイコン
+UNKNOWN, SUNNY, PARTLY_CLOUDY, CLOUDY, RAIN, SNOW = range(6)
+WEATHER_ICONS = {
+    SNOW: ft.Icons.AC_UNIT,
+    RAIN: ft.Icons.UMBRELLA,
+    PARTLY_CLOUDY: ft.Icons.WB_CLOUDY,
+    CLOUDY: ft.Icons.CLOUD,
+    SUNNY: ft.Icons.WB_SUNNY,
+    UNKNOWN: ft.Icons.WB_CLOUDY,
+}
+# 天気コード（weatherCodes）の百の位 -> 区分。文字列で決まらないときに使う
+CODE_HUNDREDS = {1: SUNNY, 2: CLOUDY, 3: RAIN, 4: SNOW}
+
+
+def weather_category(weather: str, code) -> int:
+    """取得したときに1回だけ区分を決める（雪 > 雨 > 晴と曇 > 曇 > 晴 の順）"""
+    w = weather or ""
+    if "雪" in w:
+        return SNOW
+    if "雨" in w:
+        return RAIN
+    if "曇" in w or "くもり" in w:
+        return PARTLY_CLOUDY if "晴" in w else CLOUDY
+    if "晴" in w:
+        return SUNNY
+    try:
+        return CODE_HUNDREDS.get(int(code) // 100, UNKNOWN)
+    except (TypeError, ValueError):
+        return UNKNOWN
+
 
 def main(page: ft.Page):
+    mark("flet session")
     page.title = "天気予報アプリ"
     page.window_width = 1200
     page.window_height = 700
@@ -73,28 +129,17 @@ def main(page: ft.Page):
 
     layout = ft.Row([left_panel, right_panel], expand=True)
     page.add(layout)
+    mark("first frame")
 
     # 取得した (code, name) を保存
     areas_data = []
 
-    # -------- 天気→アイコン変換 --------
-    def weather_icon(weather: str):
-        if "雪" in weather:
-            return ft.Icons.AC_UNIT
-        if "雨" in weather:
-            return ft.Icons.UMBRELLA
-        if "曇" in weather or "くもり" in weather:
-            if "晴" in weather:
-                return ft.Icons.WB_CLOUDY
-            return ft.Icons.CLOUD
-        if "晴" in weather:
-            return ft.Icons.WB_SUNNY
-        return ft.Icons.WB_CLOUDY
-
     # -------- 地域リスト取得 --------
     def load_areas():
         nonlocal areas_data
         try:
+            import requests
+
             res = requests.get(AREA_URL, timeout=10)
             res.raise_for_status()
             data = res.json()
@@ -125,6 +170,9 @@ def main(page: ft.Page):
             error_text.value = f"[ERROR] {e}"
         finally:
             page.update()
+            if PROFILE_STARTUP:
+                mark("areas")
+                report_startup()
 
     # -------- 地域選択 --------
     def select_area(value: str):
@@ -162,6 +210,8 @@ def main(page: ft.Page):
         url = f"{FORECAST_BASE_URL}/{area_code}.json"
 
         try:
+            import requests
+
             res = requests.get(url, timeout=10)
             res.raise_for_status()
             data = res.json()
@@ -174,6 +224,7 @@ def main(page: ft.Page):
             areas = weather_ts["areas"]
             target_area = areas[0]
             weathers = target_area["weathers"]
+            weather_codes = target_area.get("weatherCodes", [])
 
             temps_min = []
             temps_max = []
@@ -197,6 +248,7 @@ def main(page: ft.Page):
             for i in range(days):
                 date_iso = time_defines[i][:10]
                 weather_str = weathers[i]
+                category = weather_category(weather_str, weather_codes[i] if i < len(weather_codes) else None)
                 tmin = temps_min[i] if i < len(temps_min) and temps_min[i] != "" else ""
                 tmax = temps_max[i] if i < len(temps_max) and temps_max[i] != "" else ""
 
@@ -216,7 +268,7 @@ def main(page: ft.Page):
                                 ft.Row(
                                     [
                                         ft.Icon(
-                                            weather_icon(weather_str),
+                                            WEATHER_ICONS[category],
                                             size=40,
                                             color="#ff9800",
                                         ),
@@ -268,8 +320,8 @@ def main(page: ft.Page):
 
         page.update()
 
-    # 起動時に地域リストを読み込み
-    load_areas()
+    # 起動時に地域リストを読み込み（画面を出したあと別スレッドで行う）
+    threading.Thread(target=load_areas, daemon=True).start()
 
 
 if __name__ == "__main__":
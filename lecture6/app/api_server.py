@@ -0,0 +1,297 @@
+"""
+weather.db を使った手元の予報 API（読み通しキャッシュ）
+    GET /areas                    -> 気象庁の area.json と同じ内容
+    GET /forecast/{area_code}     -> 気象庁の予報 JSON と同じ内容（.json を付けてもよい）
+    GET /stats                    -> キャッシュの状態
+
+  1. メモリの LRU（キーは 地域 + 直近の定時発表）にあればそれを返す
+  2. 無ければ weather.db の raw_payloads を見る。直近の発表が入っていればそれを返す
+  3. それも古ければ気象庁へ取りに行き、forecasts / forecast_series / raw_payloads に保存する
+     同じ地域への同時のリクエストは1回の取得にまとめる（後から来たものは結果を待つ）
+     発表がまだ反映されていなければ、API_MIN_REFETCH_SEC の間は DB の内容を返す
+応答には本文のハッシュを ETag として付け、If-None-Match が一致すれば 304 を返す。
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import requests
+
+from .config import (
+    API_AREAS_TTL_SEC,
+    API_CACHE_SIZE,
+    API_MIN_REFETCH_SEC,
+    JMA_AREA_URL,
+    JMA_FORECAST_BASE_URL,
+)
+from .db import Database, load_raw_payload, save_raw_payload, touch_raw_payload, upsert_forecast_records, upsert_series
+from .fastparse import decode_forecast
+from .jma_api import fetch_areas_bytes, fetch_forecast_bytes_if_changed
+from .poller import JST, latest_issuance
+
+_AREA_CODE_RE = re.compile(r"^\d{6}$")
+
+
+class Entry(NamedTuple):
+    body: bytes
+    etag: str
+    published_at: Optional[str]
+    fetched_at: int
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = API_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Entry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[str, str], entry: Entry) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class ReadThroughStore:
+    """LRU → weather.db → 気象庁 の順に探す。同じキーの同時取得は1回にまとめる"""
+
+    def __init__(
+        self,
+        db: Database,
+        cache_size: int = API_CACHE_SIZE,
+        min_refetch_sec: float = API_MIN_REFETCH_SEC,
+        areas_ttl_sec: float = API_AREAS_TTL_SEC,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db = db
+        self.cache = LRUCache(cache_size)
+        self.min_refetch_sec = min_refetch_sec
+        self.areas_ttl_sec = areas_ttl_sec
+        self.clock = clock
+        self._inflight: Dict[str, _Call] = {}
+        self._inflight_lock = threading.Lock()
+        self._office_names: Dict[str, str] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "lru_hits": 0,
+            "db_hits": 0,
+            "upstream": 0,
+            "upstream_not_modified": 0,
+            "coalesced": 0,
+            "stale_on_error": 0,
+        }
+
+    def _count(self, key: str) -> None:
+        with self._inflight_lock:
+            self.stats[key] += 1
+
+    def _coalesced(self, key: str, load: Callable[[], Entry]) -> Entry:
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = load()
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+
+    # ---- 地域リスト ----
+
+    def areas(self) -> Entry:
+        self._count("requests")
+        # 地域リストは発表と関係なく、取得した日ごとにキャッシュする
+        now = self.clock()
+        entry = self.cache.get(("areas", ""))
+        if entry is not None and now - entry.fetched_at < self.areas_ttl_sec:
+            self._count("lru_hits")
+            return entry
+        return self._coalesced("areas", self._load_areas)
+
+    def _load_areas(self) -> Entry:
+        now = int(self.clock())
+        row = load_raw_payload(self.db, "areas")
+        if row is not None and now - row["fetched_at"] < self.areas_ttl_sec:
+            self._count("db_hits")
+            entry = Entry(row["body"], row["etag"], None, row["fetched_at"])
+        else:
+            try:
+                body = fetch_areas_bytes(JMA_AREA_URL)
+            except requests.RequestException:
+                if row is None:
+                    raise
+                self._count("stale_on_error")
+                return Entry(row["body"], row["etag"], None, row["fetched_at"])
+            self._count("upstream")
+            entry = Entry(body, make_etag(body), None, now)
+            save_raw_payload(self.db, "areas", body, entry.etag, now)
+        self._office_names = {code: info.get("name", "") for code, info in json.loads(entry.body).get("offices", {}).items()}
+        self.cache.put(("areas", ""), entry)
+        return entry
+
+    def office_name(self, area_code: str) -> str:
+        if not self._office_names:
+            try:
+                self.areas()
+            except Exception:
+                pass
+        return self._office_names.get(area_code, area_code)
+
+    # ---- 予報 ----
+
+    def forecast(self, area_code: str) -> Entry:
+        self._count("requests")
+        issuance = latest_issuance(datetime.fromtimestamp(self.clock(), JST)).isoformat()
+        entry = self.cache.get((area_code, issuance))
+        if entry is not None:
+            self._count("lru_hits")
+            return entry
+        return self._coalesced(f"forecast/{area_code}", lambda: self._load_forecast(area_code, issuance))
+
+    def _load_forecast(self, area_code: str, issuance: str) -> Entry:
+        key = f"forecast/{area_code}"
+        now = int(self.clock())
+        row = load_raw_payload(self.db, key)
+
+        if row is not None:
+            entry = Entry(row["body"], row["etag"], row["published_at"], row["fetched_at"])
+            if (entry.published_at or "") >= issuance:
+                self._count("db_hits")
+                self.cache.put((area_code, issuance), entry)
+                return entry
+            if now - entry.fetched_at < self.min_refetch_sec:
+                # 直近の発表がまだ気象庁に出ていない。しばらくは取りに行かない
+                self._count("db_hits")
+                return entry
+
+        validators = {}
+        if row is not None:
+            validators = {k: v for k, v in (("etag", row["upstream_etag"]), ("last_modified", row["upstream_last_modified"])) if v}
+        try:
+            body, validators = fetch_forecast_bytes_if_changed(area_code, validators, base_url=JMA_FORECAST_BASE_URL)
+        except requests.RequestException:
+            if row is None:
+                raise
+            self._count("stale_on_error")
+            return entry
+
+        self._count("upstream")
+        if body is None:
+            self._count("upstream_not_modified")
+            touch_raw_payload(self.db, key, now)
+            entry = entry._replace(fetched_at=now)
+        else:
+            records, series, meta = decode_forecast(area_code, self.office_name(area_code), body)
+            entry = Entry(body, make_etag(body), meta.get("published_at") or None, now)
+            # 保存の間は書き込み用の接続を独占する（読み取り専用の接続は止まらない）
+            with self.db.write() as conn:
+                upsert_forecast_records(conn, records)
+                upsert_series(conn, series)
+                save_raw_payload(conn, key, body, entry.etag, now, entry.published_at, validators)
+
+        if (entry.published_at or "") >= issuance:
+            self.cache.put((area_code, issuance), entry)
+        return entry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "ApiServer"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith(".json"):
+            path = path[: -len(".json")]
+        store = self.server.store
+        try:
+            if path == "/areas":
+                entry = store.areas()
+            elif path.startswith("/forecast/"):
+                area_code = path[len("/forecast/"):]
+                if not _AREA_CODE_RE.match(area_code):
+                    return self._send_error(400, "area_code は6桁の数字です")
+                entry = store.forecast(area_code)
+            elif path == "/stats":
+                body = json.dumps(dict(store.stats, lru_size=len(store.cache)), ensure_ascii=False).encode("utf-8")
+                return self._send(200, body)
+            else:
+                return self._send_error(404, "not found")
+        except requests.HTTPError as ex:
+            status = ex.response.status_code if ex.response is not None else 502
+            return self._send_error(404 if status == 404 else 502, str(ex))
+        except Exception as ex:
+            return self._send_error(502, str(ex))
+
+        if self.headers.get("If-None-Match") == entry.etag:
+            self.send_response(304)
+            self.send_header("ETag", entry.etag)
+            self.end_headers()
+            return
+        self._send(200, entry.body, entry.etag)
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send(status, json.dumps({"error": message}, ensure_ascii=False).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: ReadThroughStore):
+        super().__init__(address, _Handler)
+        self.store = store
@@ -1,5 +1,44 @@
-AREA_URL = "https://www.jma.go.jp/bosai/common/const/area.json"
-FORECAST_BASE_URL = "https://www.jma.go.jp/bosai/forecast/data/forecast"
+import os
+
+# 取得先のホスト。ベンチマークなどで手元のスタブに向けるときは環境変数で差し替える
+JMA_BASE_URL = os.getenv("JMA_BASE_URL", "https://www.jma.go.jp").rstrip("/")
+JMA_AREA_URL = f"{JMA_BASE_URL}/bosai/common/const/area.json"
+JMA_FORECAST_BASE_URL = f"{JMA_BASE_URL}/bosai/forecast/data/forecast"
+
+# 手元の API サーバー（server.py）経由で取得するときはそのアドレスを設定する（例: http://127.0.0.1:8765）
+# 同じ事業所の端末が1台のサーバーを共有すれば、気象庁へのリクエストは発表ごとに1地域1回になる
+WEATHER_API_BASE = os.getenv("WEATHER_API_BASE", "").rstrip("/")
+if WEATHER_API_BASE:
+    AREA_URL = f"{WEATHER_API_BASE}/areas"
+    FORECAST_BASE_URL = f"{WEATHER_API_BASE}/forecast"
+else:
+    AREA_URL = JMA_AREA_URL
+    FORECAST_BASE_URL = JMA_FORECAST_BASE_URL
 
 DB_PATH = "weather.db"
+# 接続の設定（db.open_db）。書き込みは1本の接続にまとめ、読み取りは読み取り専用の接続を使い回す
+DB_READERS = 4                    # 読み取り専用の接続の数
+DB_MMAP_SIZE = 256 * 1024 * 1024  # メモリマップで読む大きさ（バイト）
+DB_CACHE_KIB = 16 * 1024          # 接続ごとのページキャッシュ（KiB）
+DB_BUSY_TIMEOUT_MS = 5000
 HTTP_TIMEOUT = 10
+
+# 常駐取得（daemon.py）
+ISSUANCE_HOURS_JST = (5, 11, 17)  # 気象庁の定時発表
+POLL_DELAY_SEC = 5 * 60           # 発表時刻からこれだけ待ってから取りに行く
+POLL_JITTER_SEC = 90              # 取得開始をランダムにずらす幅
+POLL_WINDOW_SEC = 60 * 60         # 発表が反映されるまで再試行する時間
+POLL_BACKOFF_BASE_SEC = 60
+POLL_BACKOFF_MAX_SEC = 15 * 60
+POLL_REQUEST_INTERVAL_SEC = 0.5   # 地域ごとのリクエスト間隔
+METRICS_PATH = "daemon_metrics.json"
+
+# 保持期間。これより古い発表は対象日ごとの最終発表だけ残す（0 で無効）
+RETENTION_DAYS = 30
+
+# 手元の API サーバー（server.py）
+API_SERVER_HOST = "127.0.0.1"
+API_SERVER_PORT = 8765
+API_CACHE_SIZE = 256              # メモリに置く（地域, 発表）の数
+API_MIN_REFETCH_SEC = 5 * 60      # 次の発表がまだ反映されていないとき、気象庁へ取りに行く最短間隔
+API_AREAS_TTL_SEC = 24 * 3600     # 地域リストを取り直す間隔
@@ -1,12 +1,30 @@
+import queue
 import sqlite3
-from typing import Dict, List, Optional
-from .config import DB_PATH
+import threading
+import unicodedata
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+from .config import DB_BUSY_TIMEOUT_MS, DB_CACHE_KIB, DB_MMAP_SIZE, DB_PATH, DB_READERS
+from .tracing import traced
+from .weather_codes import classify
+
+# 予報文の全文検索（FTS5 trigram）は SQLite 3.34 以降。古い SQLite では LIKE だけで探す
+HAS_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+# 短期予報の時系列は発表時刻の前後この秒数以内にしか無い（範囲検索で発表時刻側を絞るのに使う）
+SERIES_HORIZON_SEC = 3 * 24 * 3600
 
 def init_db(db_path: str = DB_PATH) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
+    # 新規DBのみ有効（テーブル作成前に設定する）。既存DBは retention.apply_retention が切り替える
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS forecasts (
@@ -23,59 +41,280 @@ def init_db(db_path: str = DB_PATH) -> sqlite3.Connection:
             temp_min REAL,
             temp_max REAL,
             source TEXT DEFAULT 'jma',
+            weather_code INTEGER,
+            weather_category INTEGER,
             UNIQUE(area_code, published_at, target_date)
         );
         """
     )
+    _add_weather_category(conn)
 
     cur.execute("CREATE INDEX IF NOT EXISTS idx_forecasts_area_date ON forecasts(area_code, target_date);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_forecasts_area_pub ON forecasts(area_code, published_at);")
+    # 「この日に雨の地域」を索引だけで探す
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecasts_date_cat ON forecasts(target_date, weather_category);")
+
+    _init_forecasts_fts(conn)
+
+    # 6時間ごとの降水確率・気温・天気コードを整数で持つ細長いテーブル
+    # 時刻はすべて UNIX秒。主キーのB木に行を直接持たせて(WITHOUT ROWID)余計な索引を作らない
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS forecast_series (
+            area_code TEXT NOT NULL,
+            published_at INTEGER NOT NULL,
+            valid_time INTEGER NOT NULL,
+            pop INTEGER,
+            temp INTEGER,
+            weather_code INTEGER,
+            PRIMARY KEY(area_code, published_at, valid_time)
+        ) WITHOUT ROWID;
+        """
+    )
+
+    # 取得した JSON をそのまま持つ（api_server がそのまま返す）。key は "areas" / "forecast/{area_code}"
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS raw_payloads (
+            key TEXT PRIMARY KEY,
+            published_at TEXT,
+            fetched_at INTEGER NOT NULL,
+            etag TEXT NOT NULL,
+            upstream_etag TEXT,
+            upstream_last_modified TEXT,
+            body BLOB NOT NULL
+        );
+        """
+    )
 
     conn.commit()
     return conn
 
-def upsert_forecast(conn: sqlite3.Connection, row: Dict) -> None:
-    sql = """
-    INSERT INTO forecasts (
-        area_code, area_name, detail_area_name, publishing_office,
-        published_at, target_date, weather, wind, wave, temp_min, temp_max, source
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(area_code, published_at, target_date) DO UPDATE SET
-        area_name=excluded.area_name,
-        detail_area_name=excluded.detail_area_name,
-        publishing_office=excluded.publishing_office,
-        weather=excluded.weather,
-        wind=excluded.wind,
-        wave=excluded.wave,
-        temp_min=excluded.temp_min,
-        temp_max=excluded.temp_max,
-        source=excluded.source;
+
+def _add_weather_category(conn: sqlite3.Connection) -> None:
+    """天気コード・区分の列が無い既存のDBに列を足し、保存済みの行にも区分を付ける"""
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(forecasts);")}
+    if "weather_category" in columns:
+        return
+    if "weather_code" not in columns:
+        conn.execute("ALTER TABLE forecasts ADD COLUMN weather_code INTEGER;")
+    conn.execute("ALTER TABLE forecasts ADD COLUMN weather_category INTEGER;")
+    conn.create_function("classify_weather", 2, classify, deterministic=True)
+    conn.execute("UPDATE forecasts SET weather_category = classify_weather(weather, weather_code);")
+    conn.commit()
+
+
+def _init_forecasts_fts(conn: sqlite3.Connection) -> None:
     """
-    conn.execute(
-        sql,
-        (
-            row["area_code"],
-            row["area_name"],
-            row.get("detail_area_name"),
-            row.get("publishing_office"),
-            row["published_at"],
-            row["target_date"],
-            row.get("weather"),
-            row.get("wind"),
-            row.get("wave"),
-            row.get("temp_min"),
-            row.get("temp_max"),
-            row.get("source", "jma"),
-        ),
+    天気・風・波の文を全文検索する forecasts_fts（本文は forecasts を参照し、索引だけを持つ）
+    forecasts への INSERT / UPSERT / DELETE（retention を含む）はトリガーでそのまま反映される
+    """
+    if not HAS_TRIGRAM:
+        return
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name='forecasts_fts';").fetchone()
+    conn.executescript(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS forecasts_fts USING fts5(
+            weather, wind, wave,
+            content='forecasts', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS forecasts_fts_ai AFTER INSERT ON forecasts BEGIN
+            INSERT INTO forecasts_fts(rowid, weather, wind, wave)
+            VALUES (new.id, new.weather, new.wind, new.wave);
+        END;
+        CREATE TRIGGER IF NOT EXISTS forecasts_fts_ad AFTER DELETE ON forecasts BEGIN
+            INSERT INTO forecasts_fts(forecasts_fts, rowid, weather, wind, wave)
+            VALUES ('delete', old.id, old.weather, old.wind, old.wave);
+        END;
+        CREATE TRIGGER IF NOT EXISTS forecasts_fts_au AFTER UPDATE OF weather, wind, wave ON forecasts BEGIN
+            INSERT INTO forecasts_fts(forecasts_fts, rowid, weather, wind, wave)
+            VALUES ('delete', old.id, old.weather, old.wind, old.wave);
+            INSERT INTO forecasts_fts(rowid, weather, wind, wave)
+            VALUES (new.id, new.weather, new.wind, new.wave);
+        END;
+        """
+    )
+    if not exists:
+        # 索引が無かった既存のDB: 保存済みの行から作る
+        conn.execute("INSERT INTO forecasts_fts(forecasts_fts) VALUES('rebuild');")
+    conn.commit()
+
+
+class Database:
+    """
+    書き込み用の接続1本と、読み取り専用の接続のプールをまとめたもの（open_db で作る）
+    WAL にしているので、書き込みの最中でも読み取りは待たされない。
+        with db.read() as conn: ...    # 読み取り専用の接続を借りる
+        with db.write() as conn: ...   # 書き込み用の接続を独占する（抜けるときに commit）
+    このファイルの関数には接続の代わりにこれを渡してもよい（読み書きに合わせて接続を選ぶ）。
+    """
+
+    def __init__(self, db_path: str = DB_PATH, readers: int = DB_READERS):
+        self.db_path = db_path
+        self._writer = init_db(db_path)
+        _tune(self._writer)
+        mode = self._writer.execute("PRAGMA journal_mode=WAL;").fetchone()[0]
+        # :memory: は WAL にできず別の接続からも見えないので、読み取りも書き込み用の接続で行う
+        self.readers = readers if mode == "wal" else 0
+        self._writer.execute("PRAGMA synchronous=NORMAL;")
+        self._write_lock = threading.RLock()
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened: List[sqlite3.Connection] = []
+        self._open_lock = threading.Lock()
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _tune(conn)
+        conn.execute("PRAGMA query_only=1;")
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        if not self.readers:
+            with self._write_lock:
+                yield self._writer
+            return
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._open_lock:
+                if len(self._opened) < self.readers:
+                    conn = self._open_reader()
+                    self._opened.append(conn)
+            if conn is None:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.rollback()
+                raise
+            self._writer.commit()
+
+    def close(self) -> None:
+        with self._write_lock, self._open_lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+            self._writer.close()
+
+
+# このファイルの関数の第1引数（素の接続か Database）
+Conn = Union[sqlite3.Connection, Database]
+
+
+def open_db(db_path: str = DB_PATH, readers: int = DB_READERS) -> Database:
+    return Database(db_path, readers)
+
+
+def _tune(conn: sqlite3.Connection) -> None:
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)};")
+    conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)};")
+    conn.execute(f"PRAGMA cache_size={-int(DB_CACHE_KIB)};")  # 負の値は KiB 単位
+
+
+def reads(fn):
+    """第1引数が Database なら読み取り専用の接続を借りて呼ぶ"""
+
+    @wraps(fn)
+    def wrapper(conn, *args, **kwargs):
+        if isinstance(conn, Database):
+            with conn.read() as c:
+                return fn(c, *args, **kwargs)
+        return fn(conn, *args, **kwargs)
+
+    return wrapper
+
+
+def writes(fn):
+    """第1引数が Database なら書き込み用の接続を独占して呼ぶ"""
+
+    @wraps(fn)
+    def wrapper(conn, *args, **kwargs):
+        if isinstance(conn, Database):
+            with conn.write() as c:
+                return fn(c, *args, **kwargs)
+        return fn(conn, *args, **kwargs)
+
+    return wrapper
+
+
+_UPSERT_FORECAST_SQL = """
+INSERT INTO forecasts (
+    area_code, area_name, detail_area_name, publishing_office,
+    published_at, target_date, weather, wind, wave, temp_min, temp_max, source,
+    weather_code, weather_category
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(area_code, published_at, target_date) DO UPDATE SET
+    area_name=excluded.area_name,
+    detail_area_name=excluded.detail_area_name,
+    publishing_office=excluded.publishing_office,
+    weather=excluded.weather,
+    wind=excluded.wind,
+    wave=excluded.wave,
+    temp_min=excluded.temp_min,
+    temp_max=excluded.temp_max,
+    source=excluded.source,
+    weather_code=excluded.weather_code,
+    weather_category=excluded.weather_category;
+"""
+
+def _forecast_params(row: Dict) -> Tuple:
+    return (
+        row["area_code"],
+        row["area_name"],
+        row.get("detail_area_name"),
+        row.get("publishing_office"),
+        row["published_at"],
+        row["target_date"],
+        row.get("weather"),
+        row.get("wind"),
+        row.get("wave"),
+        row.get("temp_min"),
+        row.get("temp_max"),
+        row.get("source", "jma"),
+        row.get("weather_code"),
+        row["weather_category"] if row.get("weather_category") is not None else classify(row.get("weather"), row.get("weather_code")),
     )
+
+@writes
+def upsert_forecast(conn: Conn, row: Dict) -> None:
+    conn.execute(_UPSERT_FORECAST_SQL, _forecast_params(row))
     conn.commit()
 
-def get_latest_published_at(conn: sqlite3.Connection, area_code: str) -> Optional[str]:
+@writes
+def upsert_forecasts(conn: Conn, rows: Iterable[Dict]) -> int:
+    """複数行を1トランザクションで保存する。保存した行数を返す"""
+    return upsert_forecast_records(conn, [_forecast_params(r) for r in rows])
+
+@traced("store", rows=lambda n: n)
+@writes
+def upsert_forecast_records(conn: Conn, records: Sequence[Tuple]) -> int:
+    """INSERT の列順に並んだタプル（fastparse.ForecastRecord など）をそのまま保存する"""
+    if not records:
+        return 0
+    conn.executemany(_UPSERT_FORECAST_SQL, records)
+    conn.commit()
+    return len(records)
+
+@reads
+def get_latest_published_at(conn: Conn, area_code: str) -> Optional[str]:
     cur = conn.execute("SELECT MAX(published_at) AS latest FROM forecasts WHERE area_code=?;", (area_code,))
     r = cur.fetchone()
     return r["latest"] if r and r["latest"] else None
 
-def load_latest_forecasts(conn: sqlite3.Connection, area_code: str) -> List[sqlite3.Row]:
+@traced("load", rows=len)
+@reads
+def load_latest_forecasts(conn: Conn, area_code: str) -> List[sqlite3.Row]:
     latest = get_latest_published_at(conn, area_code)
     if not latest:
         return []
@@ -89,7 +328,48 @@ def load_latest_forecasts(conn: sqlite3.Connection, area_code: str) -> List[sqli
     )
     return list(cur.fetchall())
 
-def list_available_target_dates(conn: sqlite3.Connection, area_code: str) -> List[str]:
+@traced("load.all", rows=len)
+@reads
+def load_latest_forecasts_all(conn: Conn, area_codes: Optional[Sequence[str]] = None) -> List[sqlite3.Row]:
+    """
+    地域ごとの最新の発表の予報をまとめて引く（load_latest_forecasts を全地域ぶん1回のクエリで）
+    area_codes を渡すとその地域だけ（地方ごとの表示など）。並びは area_code, target_date
+    地域コードは idx_forecasts_area_pub を飛び飛びにたどって集め（履歴の行数によらず地域数ぶんの探索で済む）、
+    地域ごとの最新の published_at も同じ索引の末尾を1回引くだけで求める。
+    """
+    if area_codes is not None:
+        if not area_codes:
+            return []
+        codes_sql = "codes(area_code) AS (VALUES " + ",".join("(?)" for _ in area_codes) + ")"
+        params: Sequence[str] = list(area_codes)
+    else:
+        codes_sql = """codes(area_code) AS (
+            SELECT MIN(area_code) FROM forecasts
+            UNION ALL
+            SELECT (SELECT MIN(f.area_code) FROM forecasts AS f WHERE f.area_code > codes.area_code)
+            FROM codes WHERE codes.area_code IS NOT NULL
+        )"""
+        params = []
+    cur = conn.execute(
+        f"""
+        WITH RECURSIVE {codes_sql},
+        latest AS (
+            SELECT codes.area_code, (
+                SELECT MAX(g.published_at) FROM forecasts AS g WHERE g.area_code = codes.area_code
+            ) AS published_at
+            FROM codes
+            WHERE codes.area_code IS NOT NULL
+        )
+        SELECT f.* FROM latest
+        JOIN forecasts AS f ON f.area_code = latest.area_code AND f.published_at = latest.published_at
+        ORDER BY f.area_code, f.target_date;
+        """,
+        params,
+    )
+    return list(cur.fetchall())
+
+@reads
+def list_available_target_dates(conn: Conn, area_code: str) -> List[str]:
     cur = conn.execute(
         """
         SELECT DISTINCT target_date
@@ -101,7 +381,8 @@ def list_available_target_dates(conn: sqlite3.Connection, area_code: str) -> Lis
     )
     return [r["target_date"] for r in cur.fetchall()]
 
-def load_forecast_for_date_latest(conn: sqlite3.Connection, area_code: str, target_date: str):
+@reads
+def load_forecast_for_date_latest(conn: Conn, area_code: str, target_date: str):
     cur = conn.execute(
         """
         SELECT * FROM forecasts
@@ -112,3 +393,196 @@ def load_forecast_for_date_latest(conn: sqlite3.Connection, area_code: str, targ
         (area_code, target_date),
     )
     return cur.fetchone()
+
+@traced("store.series", rows=lambda n: n)
+@writes
+def upsert_series(conn: Conn, rows: Iterable[Tuple]) -> int:
+    """parse_jma_series の結果をまとめて保存する。保存した行数を返す"""
+    rows = list(rows)
+    if not rows:
+        return 0
+    conn.executemany(
+        """
+        INSERT INTO forecast_series (area_code, published_at, valid_time, pop, temp, weather_code)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(area_code, published_at, valid_time) DO UPDATE SET
+            pop=excluded.pop,
+            temp=excluded.temp,
+            weather_code=excluded.weather_code;
+        """,
+        rows,
+    )
+    conn.commit()
+    return len(rows)
+
+@reads
+def find_areas_by_category(conn: Conn, target_date: str, category: int) -> List[sqlite3.Row]:
+    """
+    target_date の天気（各地域の最新の発表）が category の地域
+    (target_date, weather_category) の索引で候補を絞り、地域ごとに最新の発表かを確かめる
+    """
+    cur = conn.execute(
+        """
+        SELECT * FROM forecasts AS f
+        WHERE f.target_date=? AND f.weather_category=?
+          AND f.published_at = (
+              SELECT MAX(g.published_at) FROM forecasts AS g
+              WHERE g.area_code=f.area_code AND g.target_date=f.target_date
+          )
+        ORDER BY f.area_code;
+        """,
+        (target_date, category),
+    )
+    return list(cur.fetchall())
+
+# 検索語に書くと、ほかの語をその列だけで探す（例: "波 3メートル" は wave 列の「３メートル」）
+SEARCH_COLUMNS = {"天気": "weather", "風": "wind", "波": "wave", "波浪": "wave"}
+
+# 気象庁の文は数字・記号が全角（"１．５メートル"）なので、半角で書かれた語は全角にしても探す
+_TO_FULLWIDTH = str.maketrans({chr(c): chr(c + 0xFEE0) for c in range(0x21, 0x7F)})
+
+
+def _search_variants(term: str) -> List[str]:
+    half = unicodedata.normalize("NFKC", term)
+    return list(dict.fromkeys([term, half, half.translate(_TO_FULLWIDTH)]))
+
+
+def _escape_like(s: str) -> str:
+    return "%" + s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+@traced("search", rows=len)
+@reads
+def search_forecasts(
+    conn: Conn,
+    query: str,
+    area_codes: Optional[Sequence[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = 50,
+) -> List[sqlite3.Row]:
+    """
+    天気・風・波の文を検索する（空白区切りの語をすべて含む行。列 score は bm25 で小さいほど良く合う）
+    3文字以上の語は forecasts_fts で引いて関連度順、trigram で引けない2文字以下の語（"暴風" など）は LIKE で絞る。
+    語がすべて短いときは日付・地域で絞った行を LIKE で調べ、新しい順に返す。
+    area_codes / date_from / date_to（YYYY-MM-DD、両端を含む）で絞り込める。
+    """
+    columns = ["weather", "wind", "wave"]
+    words = []
+    for term in query.split():
+        if term in SEARCH_COLUMNS:
+            columns = [SEARCH_COLUMNS[term]]
+        else:
+            words.append(term)
+    if not words:
+        return []
+
+    long_words = [w for w in words if HAS_TRIGRAM and len(unicodedata.normalize("NFKC", w)) >= 3]
+    where: List[str] = []
+    params: List = []
+    for w in words:
+        if w in long_words:
+            continue
+        variants = _search_variants(w)
+        where.append("(" + " OR ".join(f"f.{c} LIKE ? ESCAPE '\\'" for c in columns for _ in variants) + ")")
+        params.extend(_escape_like(v) for _ in columns for v in variants)
+    if area_codes:
+        where.append(f"f.area_code IN ({','.join('?' for _ in area_codes)})")
+        params.extend(area_codes)
+    if date_from:
+        where.append("f.target_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("f.target_date <= ?")
+        params.append(date_to)
+
+    if long_words:
+        match = " AND ".join(
+            "(" + " OR ".join('"' + v.replace('"', '""') + '"' for v in _search_variants(w)) + ")"
+            for w in long_words
+        )
+        if len(columns) == 1:
+            match = f"{columns[0]} : ({match})"
+        sql = f"""
+            SELECT f.*, bm25(forecasts_fts) AS score
+            FROM forecasts_fts JOIN forecasts AS f ON f.id = forecasts_fts.rowid
+            WHERE forecasts_fts MATCH ? {''.join(' AND ' + w for w in where)}
+            ORDER BY score, f.target_date DESC
+            LIMIT ?;
+        """
+        params.insert(0, match)
+    else:
+        sql = f"""
+            SELECT f.*, NULL AS score FROM forecasts AS f
+            WHERE {' AND '.join(where)}
+            ORDER BY f.target_date DESC, f.published_at DESC
+            LIMIT ?;
+        """
+    params.append(limit)
+    return list(conn.execute(sql, params).fetchall())
+
+@reads
+def load_series(
+    conn: Conn,
+    area_codes: Sequence[str],
+    start: int,
+    end: int,
+) -> List[sqlite3.Row]:
+    """
+    valid_time が [start, end) の時系列を、各時刻について最新の発表分だけ返す
+    published_at は valid_time ± SERIES_HORIZON_SEC に収まるので、主キーの範囲検索で済む
+    """
+    if not area_codes:
+        return []
+    marks = ",".join("?" for _ in area_codes)
+    cur = conn.execute(
+        f"""
+        SELECT area_code, valid_time, pop, temp, weather_code, MAX(published_at) AS published_at
+        FROM forecast_series
+        WHERE area_code IN ({marks})
+          AND published_at >= ? AND published_at < ?
+          AND valid_time >= ? AND valid_time < ?
+        GROUP BY area_code, valid_time
+        ORDER BY area_code, valid_time;
+        """,
+        (*area_codes, start - SERIES_HORIZON_SEC, end + SERIES_HORIZON_SEC, start, end),
+    )
+    return list(cur.fetchall())
+
+@reads
+def load_raw_payload(conn: Conn, key: str) -> Optional[sqlite3.Row]:
+    cur = conn.execute("SELECT * FROM raw_payloads WHERE key=?;", (key,))
+    return cur.fetchone()
+
+@writes
+def save_raw_payload(
+    conn: Conn,
+    key: str,
+    body: bytes,
+    etag: str,
+    fetched_at: int,
+    published_at: Optional[str] = None,
+    validators: Optional[Dict[str, str]] = None,
+) -> None:
+    validators = validators or {}
+    conn.execute(
+        """
+        INSERT INTO raw_payloads (key, published_at, fetched_at, etag, upstream_etag, upstream_last_modified, body)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET
+            published_at=excluded.published_at,
+            fetched_at=excluded.fetched_at,
+            etag=excluded.etag,
+            upstream_etag=excluded.upstream_etag,
+            upstream_last_modified=excluded.upstream_last_modified,
+            body=excluded.body;
+        """,
+        (key, published_at, fetched_at, etag, validators.get("etag"), validators.get("last_modified"), body),
+    )
+    conn.commit()
+
+@writes
+def touch_raw_payload(conn: Conn, key: str, fetched_at: int) -> None:
+    """上流が 304 を返したとき、取得時刻だけ進める"""
+    conn.execute("UPDATE raw_payloads SET fetched_at=? WHERE key=?;", (fetched_at, key))
+    conn.commit()
@@ -0,0 +1,163 @@
+"""
+一括取得用の高速パース
+JSON は orjson / msgspec があればそれを使い、無ければ標準の json で読む。
+行は dict ではなく、INSERT の列順そのままの NamedTuple（= タプル）で返すので、
+そのまま db.upsert_forecast_records / upsert_series に渡せる。
+"""
+import json
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .parser import _to_epoch, _to_float, _to_int
+from .tracing import traced
+from .weather_codes import classify
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        _loads = msgspec.json.Decoder().decode
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        _loads = json.loads
+        JSON_BACKEND = "json"
+
+
+# timeDefines は全地域でほぼ同じ時刻が並ぶので変換結果を使い回す
+_epoch = lru_cache(maxsize=4096)(_to_epoch)
+
+
+class ForecastRecord(NamedTuple):
+    # forecasts テーブルの INSERT と同じ列順
+    area_code: str
+    area_name: str
+    detail_area_name: str
+    publishing_office: str
+    published_at: str
+    target_date: str
+    weather: Optional[str]
+    wind: Optional[str]
+    wave: Optional[str]
+    temp_min: Optional[float]
+    temp_max: Optional[float]
+    source: str
+    weather_code: Optional[int]
+    weather_category: int
+
+
+class SeriesRecord(NamedTuple):
+    # forecast_series テーブルの INSERT と同じ列順
+    area_code: str
+    published_at: int
+    valid_time: int
+    pop: Optional[int]
+    temp: Optional[int]
+    weather_code: Optional[int]
+
+
+def _at(values: list, i: int):
+    return values[i] if i < len(values) else None
+
+
+@traced("parse.fast", rows=lambda result: len(result[0]) + len(result[1]))
+def decode_forecast(
+    area_code: str,
+    area_name: str,
+    payload: Union[bytes, str, list],
+) -> Tuple[List[ForecastRecord], List[SeriesRecord], Dict]:
+    """
+    気象庁の予報 JSON（bytes のまま可）から forecasts / forecast_series の行を一度に作る
+    parse_jma_forecast + parse_jma_series と同じ内容を返す
+    """
+    data = payload if isinstance(payload, list) else _loads(payload)
+    if not data or not isinstance(data, list):
+        return [], [], {}
+
+    first = data[0]
+    publishing_office = first.get("publishingOffice", "")
+    published_at = first.get("reportDatetime", "")
+    time_series_list = first.get("timeSeries") or []
+    if not time_series_list:
+        return [], [], {}
+
+    weather_ts = time_series_list[0]
+    time_defines = weather_ts.get("timeDefines") or []
+    areas = weather_ts.get("areas") or []
+    if not areas:
+        return [], [], {}
+
+    target_area = areas[0]
+    detail_area_name = (target_area.get("area") or {}).get("name", "")
+    weathers = target_area.get("weathers") or []
+    weather_codes = [_to_int(c) for c in target_area.get("weatherCodes") or []]
+    winds = target_area.get("winds") or []
+    waves = target_area.get("waves") or []
+
+    temps_min: list = []
+    temps_max: list = []
+    published_epoch = _epoch(published_at)
+    points: Dict[int, List[Optional[int]]] = {}
+
+    for ts in time_series_list:
+        ts_areas = ts.get("areas")
+        if not ts_areas:
+            continue
+        a0 = ts_areas[0]
+        if not temps_min and "tempsMin" in a0:
+            temps_min = a0["tempsMin"]
+        if not temps_max and "tempsMax" in a0:
+            temps_max = a0["tempsMax"]
+
+        if published_epoch is None:
+            continue
+        epochs = None
+        for key, col in (("pops", 0), ("temps", 1), ("weatherCodes", 2)):
+            values = a0.get(key)
+            if not values:
+                continue
+            if epochs is None:
+                epochs = [_epoch(t) for t in ts.get("timeDefines", [])]
+            for valid_time, v in zip(epochs, values):
+                if valid_time is None:
+                    continue
+                p = points.get(valid_time)
+                if p is None:
+                    p = points[valid_time] = [None, None, None]
+                if p[col] is None:
+                    p[col] = _to_int(v)
+
+    days = min(len(time_defines), len(weathers)) if weathers else len(time_defines)
+    records = [
+        ForecastRecord(
+            area_code,
+            area_name,
+            detail_area_name,
+            publishing_office,
+            published_at,
+            time_defines[i][:10],
+            _at(weathers, i),
+            _at(winds, i),
+            _at(waves, i),
+            _to_float(temps_min[i]) if i < len(temps_min) else None,
+            _to_float(temps_max[i]) if i < len(temps_max) else None,
+            "jma",
+            _at(weather_codes, i),
+            classify(_at(weathers, i), _at(weather_codes, i)),
+        )
+        for i in range(days)
+    ]
+    series = [
+        SeriesRecord(area_code, published_epoch, valid_time, p[0], p[1], p[2])
+        for valid_time, p in sorted(points.items())
+    ]
+    meta = {
+        "publishing_office": publishing_office,
+        "published_at": published_at,
+        "detail_area_name": detail_area_name,
+    }
+    return records, series, meta
@@ -1,13 +1,73 @@
-import requests
+import threading
+from typing import Dict, Optional, Tuple
+
 from .config import AREA_URL, FORECAST_BASE_URL, HTTP_TIMEOUT
+from .tracing import span
+
+# requests（と urllib3）は読み込みに時間がかかるので、最初に通信するときに読み込む
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                _session = requests.Session()
+    return _session
 
 def fetch_areas_json() -> dict:
-    res = requests.get(AREA_URL, timeout=HTTP_TIMEOUT)
-    res.raise_for_status()
-    return res.json()
+    with span("fetch.areas") as s:
+        res = _get_session().get(AREA_URL, timeout=HTTP_TIMEOUT)
+        res.raise_for_status()
+        s.set(bytes=len(res.content), status=res.status_code)
+        return res.json()
+
+def fetch_areas_bytes(url: str = AREA_URL) -> bytes:
+    with span("fetch.areas") as s:
+        res = _get_session().get(url, timeout=HTTP_TIMEOUT)
+        res.raise_for_status()
+        s.set(bytes=len(res.content), status=res.status_code)
+        return res.content
 
 def fetch_forecast_json(area_code: str) -> list:
     url = f"{FORECAST_BASE_URL}/{area_code}.json"
-    res = requests.get(url, timeout=HTTP_TIMEOUT)
+    with span("fetch", area_code=area_code) as s:
+        res = _get_session().get(url, timeout=HTTP_TIMEOUT)
+        res.raise_for_status()
+        s.set(bytes=len(res.content), status=res.status_code)
+        return res.json()
+
+def fetch_forecast_bytes_if_changed(
+    area_code: str,
+    validators: Dict[str, str],
+    base_url: str = FORECAST_BASE_URL,
+) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """
+    ETag / Last-Modified を使った条件付き取得。本文はデコードせずに返す（fastparse 用）
+    base_url: 取得先（api_server は WEATHER_API_BASE に関係なく気象庁を指定する）
+    returns:
+      body: 変化が無ければ None（304）
+      validators: 次回に渡す ETag / Last-Modified
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    url = f"{base_url}/{area_code}.json"
+    with span("fetch", area_code=area_code) as s:
+        res = _get_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        s.set(bytes=len(res.content), status=res.status_code)
+    if res.status_code == 304:
+        return None, validators
     res.raise_for_status()
-    return res.json()
+
+    new_validators = {}
+    if res.headers.get("ETag"):
+        new_validators["etag"] = res.headers["ETag"]
+    if res.headers.get("Last-Modified"):
+        new_validators["last_modified"] = res.headers["Last-Modified"]
+    return res.content, new_validators
@@ -1,5 +1,9 @@
+from datetime import datetime
 from typing import Any, Dict, List, Tuple, Optional
 
+from .tracing import traced
+from .weather_codes import classify
+
 def _to_float(x: Any) -> Optional[float]:
     try:
         if x is None or x == "":
@@ -8,6 +12,18 @@ def _to_float(x: Any) -> Optional[float]:
     except Exception:
         return None
 
+def _to_int(x: Any) -> Optional[int]:
+    f = _to_float(x)
+    return int(round(f)) if f is not None else None
+
+def _to_epoch(s: str) -> Optional[int]:
+    # "2025-01-01T05:00:00+09:00" -> UNIX秒
+    try:
+        return int(datetime.fromisoformat(s).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+@traced("parse", rows=lambda result: len(result[0]))
 def parse_jma_forecast(area_code: str, area_name: str, data: list) -> Tuple[List[Dict], Dict]:
     """
     returns:
@@ -35,6 +51,7 @@ def parse_jma_forecast(area_code: str, area_name: str, data: list) -> Tuple[List
     detail_area_name = target_area.get("area", {}).get("name", "")
 
     weathers = target_area.get("weathers", [])
+    weather_codes = target_area.get("weatherCodes", [])
     winds = target_area.get("winds", [])
     waves = target_area.get("waves", [])
 
@@ -52,6 +69,8 @@ def parse_jma_forecast(area_code: str, area_name: str, data: list) -> Tuple[List
     rows: List[Dict] = []
     for i in range(days):
         target_date = time_defines[i][:10]  # YYYY-MM-DD
+        weather = weathers[i] if i < len(weathers) else None
+        weather_code = _to_int(weather_codes[i]) if i < len(weather_codes) else None
         row = {
             "area_code": area_code,
             "area_name": area_name,
@@ -59,12 +78,14 @@ def parse_jma_forecast(area_code: str, area_name: str, data: list) -> Tuple[List
             "publishing_office": publishing_office,
             "published_at": published_at,
             "target_date": target_date,
-            "weather": weathers[i] if i < len(weathers) else None,
+            "weather": weather,
             "wind": winds[i] if i < len(winds) else None,
             "wave": waves[i] if i < len(waves) else None,
             "temp_min": _to_float(temps_min[i]) if i < len(temps_min) else None,
             "temp_max": _to_float(temps_max[i]) if i < len(temps_max) else None,
             "source": "jma",
+            "weather_code": weather_code,
+            "weather_category": classify(weather, weather_code),
         }
         rows.append(row)
 
@@ -74,3 +95,43 @@ def parse_jma_forecast(area_code: str, area_name: str, data: list) -> Tuple[List
         "detail_area_name": detail_area_name,
     }
     return rows, meta
+
+@traced("parse.series", rows=len)
+def parse_jma_series(area_code: str, data: list) -> List[Tuple]:
+    """
+    短期予報(data[0])の時系列を forecast_series 用のタプルにする
+    returns:
+      rows: (area_code, published_at, valid_time, pop, temp, weather_code)
+            published_at / valid_time は UNIX秒
+    """
+    if not data or not isinstance(data, list):
+        return []
+
+    first = data[0]
+    published_at = _to_epoch(first.get("reportDatetime", ""))
+    if published_at is None:
+        return []
+
+    # valid_time -> [pop, temp, weather_code]
+    points: Dict[int, List[Optional[int]]] = {}
+    for ts in first.get("timeSeries", []):
+        areas = ts.get("areas", [])
+        if not areas:
+            continue
+        a0 = areas[0]
+        for key, col in (("pops", 0), ("temps", 1), ("weatherCodes", 2)):
+            values = a0.get(key)
+            if not values:
+                continue
+            for t, v in zip(ts.get("timeDefines", []), values):
+                valid_time = _to_epoch(t)
+                if valid_time is None:
+                    continue
+                p = points.setdefault(valid_time, [None, None, None])
+                if p[col] is None:
+                    p[col] = _to_int(v)
+
+    return [
+        (area_code, published_at, valid_time, p[0], p[1], p[2])
+        for valid_time, p in sorted(points.items())
+    ]
@@ -0,0 +1,233 @@
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    ISSUANCE_HOURS_JST,
+    METRICS_PATH,
+    POLL_BACKOFF_BASE_SEC,
+    POLL_BACKOFF_MAX_SEC,
+    POLL_DELAY_SEC,
+    POLL_JITTER_SEC,
+    POLL_REQUEST_INTERVAL_SEC,
+    POLL_WINDOW_SEC,
+    RETENTION_DAYS,
+)
+from .db import Conn, get_latest_published_at, upsert_forecast_records, upsert_series
+from .fastparse import decode_forecast
+from .jma_api import fetch_areas_json, fetch_forecast_bytes_if_changed
+from .retention import apply_retention
+from .tracing import flush as flush_trace, traced
+
+JST = timezone(timedelta(hours=9))
+
+
+def latest_issuance(now: datetime) -> datetime:
+    """now 以前で直近の定時発表時刻（JST）"""
+    now = now.astimezone(JST)
+    for days_back in (0, 1):
+        day = (now - timedelta(days=days_back)).replace(minute=0, second=0, microsecond=0)
+        for h in sorted(ISSUANCE_HOURS_JST, reverse=True):
+            t = day.replace(hour=h)
+            if t <= now:
+                return t
+    raise ValueError("ISSUANCE_HOURS_JST が空です")
+
+
+def next_issuance(now: datetime) -> datetime:
+    """now より後で最初の定時発表時刻（JST）"""
+    now = now.astimezone(JST)
+    for days_ahead in (0, 1):
+        day = (now + timedelta(days=days_ahead)).replace(minute=0, second=0, microsecond=0)
+        for h in sorted(ISSUANCE_HOURS_JST):
+            t = day.replace(hour=h)
+            if t > now:
+                return t
+    raise ValueError("ISSUANCE_HOURS_JST が空です")
+
+
+def backoff_delay(attempt: int) -> float:
+    """attempt 回目（0始まり）の待ち時間。指数的に伸ばしてジッタを足す"""
+    base = min(POLL_BACKOFF_MAX_SEC, POLL_BACKOFF_BASE_SEC * (2 ** attempt))
+    return base + random.uniform(0, POLL_JITTER_SEC)
+
+
+class PollerMetrics:
+    """常駐取得の状態。METRICS_PATH に JSON で書き出す"""
+
+    def __init__(self, path: str = METRICS_PATH):
+        self.path = path
+        self.started_at = time.time()
+        self.last_success_at: Optional[float] = None
+        self.last_error_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_issuance: Optional[str] = None
+        self.lag_sec: Optional[float] = None  # 定時発表から DB 反映までの遅れ
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.rows_written = 0
+        self.series_rows_written = 0
+        self.last_retention: Optional[Dict] = None
+
+    def to_dict(self) -> Dict:
+        d = {k: v for k, v in self.__dict__.items() if k != "path"}
+        if self.last_success_at is not None:
+            d["since_last_success_sec"] = round(time.time() - self.last_success_at, 1)
+        return d
+
+    def dump(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+
+def load_offices() -> List[Tuple[str, str]]:
+    data = fetch_areas_json()
+    offices = data.get("offices", {})
+    return sorted(
+        [(code, info.get("name", "")) for code, info in offices.items()],
+        key=lambda x: int(x[0]),
+    )
+
+
+@traced("poll")
+def poll_office(
+    conn: Conn,
+    area_code: str,
+    area_name: str,
+    validators: Dict[str, Dict[str, str]],
+    metrics: PollerMetrics,
+) -> Optional[str]:
+    """
+    1地域を条件付きで取得し、新しい発表なら保存する
+    returns: DB にある最新の published_at（取得できなかった場合は None）
+    """
+    metrics.requests += 1
+    body, validators[area_code] = fetch_forecast_bytes_if_changed(area_code, validators.get(area_code, {}))
+    if body is None:
+        metrics.not_modified += 1
+        return get_latest_published_at(conn, area_code)
+
+    records, series, meta = decode_forecast(area_code, area_name, body)
+    if not records:
+        raise ValueError(f"{area_code}: 予報データのパースに失敗しました。")
+
+    published_at = meta.get("published_at", "")
+    if published_at and published_at == get_latest_published_at(conn, area_code):
+        metrics.unchanged += 1
+        return published_at
+
+    metrics.rows_written += upsert_forecast_records(conn, records)
+    metrics.series_rows_written += upsert_series(conn, series)
+    return published_at
+
+
+def poll_issuance(
+    conn: Conn,
+    offices: List[Tuple[str, str]],
+    issuance: datetime,
+    validators: Dict[str, Dict[str, str]],
+    metrics: PollerMetrics,
+) -> List[str]:
+    """
+    issuance の発表がすべての地域で DB に入るまで再試行する
+    returns: 期限までに反映できなかった地域コード
+    """
+    deadline = issuance.timestamp() + POLL_WINDOW_SEC
+    pending = dict(offices)
+    attempt = 0
+    metrics.last_issuance = issuance.isoformat()
+
+    while pending:
+        for area_code, area_name in list(pending.items()):
+            try:
+                published_at = poll_office(conn, area_code, area_name, validators, metrics)
+                # published_at は "+09:00" 付き ISO 文字列なので JST 同士で比較できる
+                if published_at and datetime.fromisoformat(published_at) >= issuance:
+                    del pending[area_code]
+            except Exception as ex:
+                metrics.errors += 1
+                metrics.last_error_at = time.time()
+                metrics.last_error = f"{area_code}: {ex}"
+                print(f"[ERROR] {area_code}: {ex}", flush=True)
+            time.sleep(POLL_REQUEST_INTERVAL_SEC)
+
+        if len(pending) < len(offices):
+            metrics.last_success_at = time.time()
+            metrics.lag_sec = round(metrics.last_success_at - issuance.timestamp(), 1)
+        metrics.dump()
+
+        if not pending:
+            break
+        wait = backoff_delay(attempt)
+        if time.time() + wait > deadline:
+            break
+        print(f"未反映 {len(pending)} 地域: {wait:.0f} 秒後に再試行", flush=True)
+        time.sleep(wait)
+        attempt += 1
+
+    return list(pending)
+
+
+def run_daemon(
+    conn: Conn,
+    once: bool = False,
+    metrics_path: str = METRICS_PATH,
+    retention_days: int = RETENTION_DAYS,
+) -> None:
+    metrics = PollerMetrics(metrics_path)
+    validators: Dict[str, Dict[str, str]] = {}
+    offices: List[Tuple[str, str]] = []
+    offices_loaded_on = None
+
+    # 起動時は直近の発表分から取りに行く
+    issuance = latest_issuance(datetime.now(JST))
+
+    while True:
+        today = datetime.now(JST).date()
+        if offices_loaded_on != today:
+            try:
+                offices = load_offices()
+                offices_loaded_on = today
+            except Exception as ex:
+                metrics.errors += 1
+                metrics.last_error_at = time.time()
+                metrics.last_error = f"area.json: {ex}"
+                metrics.dump()
+                if not offices:
+                    wait = backoff_delay(0)
+                    print(f"[ERROR] 地域リストの取得に失敗: {ex}（{wait:.0f} 秒後に再試行）", flush=True)
+                    time.sleep(wait)
+                    continue
+
+        print(f"=== {issuance.isoformat()} の発表を取得（{len(offices)} 地域）===", flush=True)
+        missed = poll_issuance(conn, offices, issuance, validators, metrics)
+        if missed:
+            print(f"期限までに反映されなかった地域: {', '.join(missed)}", flush=True)
+        flush_trace()
+
+        if retention_days > 0:
+            try:
+                metrics.last_retention = apply_retention(conn, retention_days)
+                print(f"保持期間の整理: {metrics.last_retention['bytes_reclaimed']} bytes 回収", flush=True)
+            except Exception as ex:
+                metrics.errors += 1
+                metrics.last_error_at = time.time()
+                metrics.last_error = f"retention: {ex}"
+            metrics.dump()
+
+        if once:
+            return
+
+        issuance = next_issuance(datetime.now(JST))
+        start_at = issuance.timestamp() + POLL_DELAY_SEC + random.uniform(0, POLL_JITTER_SEC)
+        print(f"次回: {datetime.fromtimestamp(start_at, JST).isoformat()}", flush=True)
+        time.sleep(max(0.0, start_at - time.time()))
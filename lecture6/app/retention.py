@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from .db import SERIES_HORIZON_SEC, Conn, writes
+
+JST = timezone(timedelta(hours=9))
+
+
+def _pragma(conn: sqlite3.Connection, name: str) -> int:
+    return conn.execute(f"PRAGMA {name};").fetchone()[0]
+
+
+@writes
+def apply_retention(conn: Conn, keep_days: int, now: Optional[datetime] = None) -> Dict:
+    """
+    keep_days 日より古い発表は、対象日（時系列は対象時刻）ごとの最終発表だけ残して削除し、
+    空いたページを返却してから統計情報を取り直す
+    returns: 削除行数と回収したバイト数
+    """
+    now = (now or datetime.now(JST)).astimezone(JST)
+    cutoff = now - timedelta(days=keep_days)
+    # published_at は気象庁の "YYYY-MM-DDTHH:MM:SS+09:00" なので同じ形の文字列で比較する
+    cutoff_iso = cutoff.isoformat(timespec="seconds")
+    cutoff_epoch = int(cutoff.timestamp())
+
+    page_size = _pragma(conn, "page_size")
+    pages_before = _pragma(conn, "page_count")
+
+    with conn:
+        forecasts_deleted = conn.execute(
+            """
+            DELETE FROM forecasts
+            WHERE published_at < ?
+              AND EXISTS (
+                SELECT 1 FROM forecasts AS newer
+                WHERE newer.area_code = forecasts.area_code
+                  AND newer.target_date = forecasts.target_date
+                  AND newer.published_at > forecasts.published_at
+              );
+            """,
+            (cutoff_iso,),
+        ).rowcount
+        series_deleted = conn.execute(
+            """
+            DELETE FROM forecast_series
+            WHERE published_at < ?
+              AND EXISTS (
+                SELECT 1 FROM forecast_series AS newer
+                WHERE newer.area_code = forecast_series.area_code
+                  AND newer.published_at > forecast_series.published_at
+                  AND newer.published_at <= forecast_series.valid_time + ?
+                  AND newer.valid_time = forecast_series.valid_time
+              );
+            """,
+            (cutoff_epoch, SERIES_HORIZON_SEC),
+        ).rowcount
+
+    freed_pages = _pragma(conn, "freelist_count")
+    if _pragma(conn, "auto_vacuum") == 2:
+        # execute() だと1ページ分しか進まないので executescript で最後まで回す
+        conn.executescript("PRAGMA incremental_vacuum;")
+    else:
+        # 古い DB は auto_vacuum=NONE で作られているので、一度だけ全体 VACUUM して切り替える
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        conn.execute("VACUUM;")
+    # ANALYZE は初回に sqlite_stat1 のページを増やすので、回収量はその前に測る
+    pages_after = _pragma(conn, "page_count")
+    conn.execute("ANALYZE;")
+    conn.commit()
+
+    return {
+        "cutoff": cutoff_iso,
+        "forecasts_deleted": forecasts_deleted,
+        "series_deleted": series_deleted,
+        "freed_pages": freed_pages,
+        "bytes_before": pages_before * page_size,
+        "bytes_after": pages_after * page_size,
+        "bytes_reclaimed": (pages_before - pages_after) * page_size,
+    }
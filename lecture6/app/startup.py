@@ -0,0 +1,37 @@
+"""
+起動時間の計測（main.py --profile-startup）
+main.py の一番上で作り、段階が終わるごとに mark() する。report() で段階ごとの時間を表示する。
+flet や app.* より先に読み込むので、標準ライブラリ以外は import しない。
+"""
+import sys
+import time
+from typing import List, Optional, Tuple
+
+
+class StartupProfile:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.phases: List[Tuple[str, float, float, int]] = []  # (段階, 所要ms, 起動からのms, 読み込み済みモジュール数)
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000, (now - self.start) * 1000, len(sys.modules)))
+        self._last = now
+
+    def report(self, file=None) -> None:
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        print(f"{'段階':<14}{'所要ms':>8}{'累計ms':>8}{'modules':>9}", file=file)
+        for phase, ms, total_ms, modules in self.phases:
+            print(f"{phase:<16}{ms:>10.1f}{total_ms:>10.1f}{modules:>9}", file=file)
+        file.flush()
+
+
+def from_argv(argv: Optional[List[str]] = None) -> StartupProfile:
+    argv = sys.argv[1:] if argv is None else argv
+    return StartupProfile("--profile-startup" in argv)
@@ -0,0 +1,202 @@
+"""
+処理段階ごとの時間計測（スパン）
+環境変数で出力先を指定したときだけ記録する。指定しなければ何もしない（呼び出しのコストだけ）。
+
+    TRACE_JSONL=trace.jsonl   スパン1つを1行の JSON で追記する
+    TRACE_PROM=trace.prom     段階ごとの合計（回数・秒・バイト数・行数）を Prometheus のテキスト形式で書く
+
+    with span("fetch", area_code=code) as s:
+        res = requests.get(url)
+        s.set(bytes=len(res.content))
+
+    @traced("parse", rows=len)      # 戻り値から行数を数える
+    def parse(...): ...
+
+正本はこのファイル（lecture6/app/tracing.py）。最終課題 には同じ内容の写しを置き、
+lecture6/tests/test_tracing_copies.py で写しがずれていないかを確かめる。
+"""
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+
+_jsonl_file = None
+_prom_path: Optional[str] = None
+_enabled = False
+
+# 段階ごとの合計: name -> {"count", "errors", "seconds", "bytes", "rows"}
+_totals: Dict[str, Dict[str, float]] = {}
+
+
+def configure(jsonl_path: Optional[str] = None, prom_path: Optional[str] = None) -> None:
+    """出力先を設定する（どちらも None なら記録しない）"""
+    global _jsonl_file, _prom_path, _enabled
+    with _lock:
+        if _jsonl_file is not None:
+            _jsonl_file.close()
+        _jsonl_file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        _prom_path = prom_path
+        _enabled = bool(jsonl_path or prom_path)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _NoopContextManager:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NOOP
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NoopContext = _NoopContextManager()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "attrs")
+
+    def __init__(self, name: str, parent_id: Optional[int], attrs: Dict):
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent_id = parent_id
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        """bytes / rows などを後から付ける（bytes・rows は合計にも足し込む）"""
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def _record(name: str, attrs: Dict):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    s = Span(name, stack[-1].span_id if stack else None, attrs)
+    stack.append(s)
+    started_at = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield s
+    except BaseException as ex:
+        error = type(ex).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        _finish(s, started_at, seconds, error)
+
+
+def span(name: str, **attrs):
+    """with で囲んだ範囲を1つのスパンとして記録する。無効なときは何もしないオブジェクトを返す"""
+    if not _enabled:
+        return _NoopContext
+    return _record(name, attrs)
+
+
+def traced(name: str, rows: Optional[Callable] = None):
+    """関数全体をスパンにするデコレータ。rows を渡すと戻り値から行数を数えて記録する"""
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _record(name, {}) as s:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    s.set(rows=rows(result))
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def _finish(s: Span, started_at: float, seconds: float, error: Optional[str]) -> None:
+    with _lock:
+        t = _totals.setdefault(s.name, {"count": 0, "errors": 0, "seconds": 0.0, "bytes": 0, "rows": 0})
+        t["count"] += 1
+        t["seconds"] += seconds
+        if error:
+            t["errors"] += 1
+        for key in ("bytes", "rows"):
+            value = s.attrs.get(key)
+            if isinstance(value, int):
+                t[key] += value
+
+        if _jsonl_file is not None:
+            record = {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "start": round(started_at, 6),
+                "duration_ms": round(seconds * 1000, 3),
+                "thread": threading.current_thread().name,
+            }
+            if error:
+                record["error"] = error
+            record.update(s.attrs)
+            _jsonl_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            _jsonl_file.flush()
+
+
+def totals() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {name: dict(t) for name, t in _totals.items()}
+
+
+def prometheus_text() -> str:
+    lines = []
+    metrics = (
+        ("trace_spans_total", "counter", "count", "スパンの回数"),
+        ("trace_span_errors_total", "counter", "errors", "例外で終わったスパンの回数"),
+        ("trace_span_seconds_total", "counter", "seconds", "スパンの合計時間（秒）"),
+        ("trace_span_bytes_total", "counter", "bytes", "スパンで扱ったバイト数"),
+        ("trace_span_rows_total", "counter", "rows", "スパンで扱った行数"),
+    )
+    snapshot = totals()
+    for metric, kind, key, help_text in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(snapshot):
+            value = snapshot[name][key]
+            lines.append(f'{metric}{{span="{name}"}} {round(value, 6) if key == "seconds" else int(value)}')
+    return "\n".join(lines) + "\n"
+
+
+def flush() -> None:
+    """Prometheus 形式の合計を書き出す（一時ファイルに書いてから置き換える）"""
+    if not _prom_path:
+        return
+    tmp = f"{_prom_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, _prom_path)
+
+
+configure(os.getenv("TRACE_JSONL") or None, os.getenv("TRACE_PROM") or None)
+atexit.register(flush)
@@ -1,19 +1,45 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
 import flet as ft
 
 from .db import (
-    init_db,
-    upsert_forecast,
+    open_db,
+    upsert_forecasts,
+    upsert_series,
     load_latest_forecasts,
+    load_latest_forecasts_all,
     list_available_target_dates,
+    find_areas_by_category,
+    search_forecasts,
     load_forecast_for_date_latest,
     get_latest_published_at,
 )
 from .jma_api import fetch_areas_json, fetch_forecast_json
-from .parser import parse_jma_forecast
-
-
-def run_app(page: ft.Page):
-    conn = init_db()
+from .startup import StartupProfile
+from .tracing import span, traced
+from .ui_scheduler import UpdateScheduler
+from .weather_codes import CATEGORY_NAMES, CLOUDY, PARTLY_CLOUDY, RAIN, SNOW, SUNNY, UNKNOWN, classify
+
+JST = timezone(timedelta(hours=9))
+
+# 天気の区分 -> アイコン（区分は取り込み時に weather_codes.classify で付けてある）
+WEATHER_ICONS = {
+    SNOW: ft.Icons.AC_UNIT,
+    RAIN: ft.Icons.UMBRELLA,
+    PARTLY_CLOUDY: ft.Icons.WB_CLOUDY,
+    CLOUDY: ft.Icons.CLOUD,
+    SUNNY: ft.Icons.WB_SUNNY,
+    UNKNOWN: ft.Icons.WB_CLOUDY,
+}
+
+
+def run_app(page: ft.Page, profile: Optional[StartupProfile] = None):
+    profile = profile or StartupProfile(enabled=False)
+    profile.mark("flet session")
+    # page.update() の代わりに ui.mark(page) で印を付け、1フレームに1回まとめて送る
+    ui = UpdateScheduler(page)
 
     page.title = "天気予報アプリ（DB版）"
     page.window_width = 1200
@@ -32,6 +58,19 @@ def run_app(page: ft.Page):
 
     area_dropdown = ft.Dropdown(label="地域を選択", width=260)
 
+    condition_dropdown = ft.Dropdown(
+        label="明日の天気で絞り込み（保存済み）",
+        width=260,
+        options=[ft.dropdown.Option(key="", text="すべて")]
+        + [ft.dropdown.Option(key=str(c), text=name) for c, name in CATEGORY_NAMES.items() if c != UNKNOWN],
+    )
+
+    overview_dropdown = ft.Dropdown(label="概況を表示（保存済み）", width=260)
+
+    search_field = ft.TextField(label="予報の文を検索（例: 波 3メートル / 暴風）", width=260, dense=True)
+    search_area_only = ft.Checkbox(label="選択中の地域だけ", value=False)
+    search_upcoming = ft.Checkbox(label="今日以降だけ", value=True)
+
     area_list_view = ft.ListView(expand=True, spacing=2, padding=0, auto_scroll=False)
 
     left_panel = ft.Container(
@@ -43,6 +82,10 @@ def run_app(page: ft.Page):
                 status_text,
                 ft.Divider(height=10, color="transparent"),
                 area_dropdown,
+                condition_dropdown,
+                overview_dropdown,
+                search_field,
+                ft.Row([search_area_only, search_upcoming], wrap=True, spacing=0),
                 ft.Divider(),
                 ft.Container(content=area_list_view, expand=True),
             ],
@@ -78,24 +121,24 @@ def run_app(page: ft.Page):
     )
 
     page.add(ft.Row([left_panel, right_panel], expand=True))
+    profile.mark("first frame")
+
+    # ハンドラは別々のスレッドで動くので、読み取りは読み取り専用の接続を借りる
+    conn = open_db()
+    profile.mark("open db")
 
     areas_data: list[tuple[str, str]] = []
+    # 地方（centers）の名前 -> その地方の地域コード
+    regions: dict[str, list[str]] = {}
+    tiles_by_code: dict[str, ft.ListTile] = {}
     current_area_code: str | None = None
     current_area_name: str | None = None
 
-    def weather_icon(weather: str | None):
-        w = weather or ""
-        if "雪" in w:
-            return ft.Icons.AC_UNIT
-        if "雨" in w:
-            return ft.Icons.UMBRELLA
-        if "曇" in w or "くもり" in w:
-            if "晴" in w:
-                return ft.Icons.WB_CLOUDY
-            return ft.Icons.CLOUD
-        if "晴" in w:
-            return ft.Icons.WB_SUNNY
-        return ft.Icons.WB_CLOUDY
+    def weather_icon(r):
+        category = r["weather_category"]
+        if category is None:
+            category = classify(r["weather"], r["weather_code"])
+        return WEATHER_ICONS.get(category, ft.Icons.WB_CLOUDY)
 
     def fmt_temp(x):
         if x is None or x == "":
@@ -107,6 +150,12 @@ def run_app(page: ft.Page):
             return str(x)
 
     def render_cards(rows, subtitle: str):
+        # カードを組み立てている途中の状態は送らない
+        with span("render", rows=len(rows)), ui.batch():
+            _render_cards(rows, subtitle)
+            ui.mark(page)
+
+    def _render_cards(rows, subtitle: str):
         forecast_column.controls.clear()
         area_subtitle.value = subtitle
 
@@ -114,7 +163,6 @@ def run_app(page: ft.Page):
             forecast_column.controls.append(
                 ft.Text("保存済みデータがありません。まず地域を選択して取得してください。")
             )
-            page.update()
             return
 
         row_cards = []
@@ -135,7 +183,7 @@ def run_app(page: ft.Page):
                             ft.Text(date_iso, weight=ft.FontWeight.BOLD, size=16),
                             ft.Row(
                                 [
-                                    ft.Icon(weather_icon(weather_str), size=40, color="#ff9800"),
+                                    ft.Icon(weather_icon(r), size=40, color="#ff9800"),
                                     ft.Icon(ft.Icons.CLOUD, size=26, color="#90a4ae"),
                                 ],
                                 alignment=ft.MainAxisAlignment.START,
@@ -161,15 +209,14 @@ def run_app(page: ft.Page):
                 forecast_column.controls.append(ft.Row(row_cards, spacing=20))
                 row_cards = []
 
-        page.update()
-
     def refresh_date_dropdown(area_code: str):
         dates = list_available_target_dates(conn, area_code)
-        date_dropdown.options = [ft.dropdown.Option(d) for d in dates]
-        date_dropdown.visible = len(dates) > 0
-        if dates:
-            date_dropdown.value = dates[-1]
-        page.update()
+        with ui.batch():
+            date_dropdown.options = [ft.dropdown.Option(d) for d in dates]
+            date_dropdown.visible = len(dates) > 0
+            if dates:
+                date_dropdown.value = dates[-1]
+            ui.mark(page)
 
     def on_date_changed(e):
         nonlocal current_area_code
@@ -189,6 +236,94 @@ def run_app(page: ft.Page):
 
     date_dropdown.on_change = on_date_changed
 
+    def on_search(e):
+        query = (search_field.value or "").strip()
+        if not query:
+            return
+        area_codes = [current_area_code] if search_area_only.value and current_area_code else None
+        date_from = datetime.now(JST).date().isoformat() if search_upcoming.value else None
+        rows = search_forecasts(conn, query, area_codes=area_codes, date_from=date_from)
+
+        with span("render", rows=len(rows)), ui.batch():
+            date_dropdown.visible = False
+            area_title.value = f"「{query}」の検索結果"
+            area_subtitle.value = f"{len(rows)} 件（保存済みの予報から、よく合う順）"
+            forecast_column.controls.clear()
+            if not rows:
+                forecast_column.controls.append(ft.Text("見つかりませんでした。"))
+            for r in rows:
+                forecast_column.controls.append(
+                    ft.Card(
+                        color="white",
+                        content=ft.ListTile(
+                            leading=ft.Icon(weather_icon(r), color="#ff9800"),
+                            title=ft.Text(f"{r['target_date']}  {r['area_name']} {r['detail_area_name'] or ''}"),
+                            subtitle=ft.Text(
+                                f"天気: {r['weather'] or '-'}\n風: {r['wind'] or '-'}\n波: {r['wave'] or '-'}",
+                                size=12,
+                            ),
+                            is_three_line=True,
+                            on_click=lambda e, c=r["area_code"]: select_area(c),
+                        ),
+                    )
+                )
+            ui.mark(page)
+
+    search_field.on_submit = on_search
+
+    def on_overview_changed(e):
+        value = e.control.value
+        if not value:
+            return
+        area_codes = None if value == "全国" else regions.get(value, [])
+        rows = load_latest_forecasts_all(conn, area_codes)
+
+        by_area: dict[str, list] = {}
+        for r in rows:
+            by_area.setdefault(r["area_code"], []).append(r)
+
+        with span("render", rows=len(rows)), ui.batch():
+            date_dropdown.visible = False
+            area_title.value = f"{value} の概況"
+            area_subtitle.value = f"{len(by_area)} 地域（各地域の最新の発表、保存済みの予報から）"
+            forecast_column.controls.clear()
+            if not by_area:
+                forecast_column.controls.append(
+                    ft.Text("保存済みデータがありません。まず地域を選択して取得してください。")
+                )
+            for code, area_rows in by_area.items():
+                cells = [
+                    ft.Container(
+                        width=110,
+                        content=ft.Row(
+                            [
+                                ft.Icon(weather_icon(r), size=20, color="#ff9800"),
+                                ft.Text(
+                                    f"{r['target_date'][5:]}  {fmt_temp(r['temp_min']) or '-'}/{fmt_temp(r['temp_max']) or '-'}",
+                                    size=12,
+                                ),
+                            ],
+                            spacing=4,
+                        ),
+                    )
+                    for r in area_rows[:3]
+                ]
+                forecast_column.controls.append(
+                    ft.Container(
+                        bgcolor="white",
+                        border_radius=6,
+                        padding=ft.padding.symmetric(horizontal=10, vertical=4),
+                        on_click=lambda e, c=code: select_area(c),
+                        content=ft.Row(
+                            [ft.Text(area_rows[0]["area_name"], width=120, weight=ft.FontWeight.BOLD)] + cells,
+                            spacing=8,
+                        ),
+                    )
+                )
+            ui.mark(page)
+
+    overview_dropdown.on_change = on_overview_changed
+
     def load_areas():
         nonlocal areas_data
         try:
@@ -198,24 +333,34 @@ def run_app(page: ft.Page):
                 [(code, info.get("name", "")) for code, info in offices.items()],
                 key=lambda x: int(x[0]),
             )
-
-            area_dropdown.options = [ft.dropdown.Option(f"{name} ({code})") for code, name in areas_data]
-
-            area_list_view.controls.clear()
-            for code, name in areas_data:
-                tile = ft.ListTile(
-                    title=ft.Text(name, color="white"),
-                    subtitle=ft.Text(code, color="#cfd8dc"),
-                    on_click=lambda e, c=code: select_area(c),
-                )
-                area_list_view.controls.append(tile)
+            regions.clear()
+            for center in data.get("centers", {}).values():
+                regions[center.get("name", "")] = list(center.get("children", []))
+
+            with ui.batch():
+                area_dropdown.options = [ft.dropdown.Option(f"{name} ({code})") for code, name in areas_data]
+                overview_dropdown.options = [ft.dropdown.Option("全国")] + [ft.dropdown.Option(n) for n in regions]
+
+                area_list_view.controls.clear()
+                tiles_by_code.clear()
+                for code, name in areas_data:
+                    tile = ft.ListTile(
+                        title=ft.Text(name, color="white"),
+                        subtitle=ft.Text(code, color="#cfd8dc"),
+                        on_click=lambda e, c=code: select_area(c),
+                    )
+                    area_list_view.controls.append(tile)
+                    tiles_by_code[code] = tile
 
             status_text.value = "地域を選択してください。"
         except Exception as ex:
             status_text.value = "地域リストの取得に失敗しました。"
             error_text.value = f"[ERROR] {ex}"
         finally:
-            page.update()
+            ui.mark(page)
+            ui.flush()
+            profile.mark("areas")
+            profile.report()
 
     def select_area(value: str):
         nonlocal current_area_code, current_area_name
@@ -242,25 +387,49 @@ def run_app(page: ft.Page):
 
     area_dropdown.on_change = on_dropdown_changed
 
+    def on_condition_changed(e):
+        value = e.control.value
+        # DB の検索は batch の外で済ませる（batch の間は画面の更新が止まる）
+        matched = set()
+        if value:
+            tomorrow = (datetime.now(JST) + timedelta(days=1)).date().isoformat()
+            matched = {r["area_code"] for r in find_areas_by_category(conn, tomorrow, int(value))}
+        with ui.batch():
+            if not value:
+                for tile in tiles_by_code.values():
+                    tile.visible = True
+                status_text.value = "地域を選択してください。"
+            else:
+                for code, tile in tiles_by_code.items():
+                    tile.visible = code in matched
+                status_text.value = f"明日 {CATEGORY_NAMES[int(value)]} の地域: {len(matched)} 件（保存済みの予報から）"
+            ui.mark(page)
+
+    condition_dropdown.on_change = on_condition_changed
+
+    @traced("show")
     def fetch_store_show(area_code: str, area_name: str):
-        area_title.value = f"{area_name} の天気予報"
-        area_subtitle.value = ""
-        error_text.value = ""
-        forecast_column.controls.clear()
-        date_dropdown.visible = False
-        page.update()
-
-        status_text.value = f"{area_name}（{area_code}）の天気を取得中..."
-        page.update()
+        with ui.batch():
+            area_title.value = f"{area_name} の天気予報"
+            area_subtitle.value = ""
+            error_text.value = ""
+            forecast_column.controls.clear()
+            date_dropdown.visible = False
+            status_text.value = f"{area_name}（{area_code}）の天気を取得中..."
+            ui.mark(page)
+        # 通信で待つ前に「取得中」を出しておく
+        ui.flush()
 
         try:
+            from .parser import parse_jma_forecast, parse_jma_series
+
             data = fetch_forecast_json(area_code)
             rows, meta = parse_jma_forecast(area_code, area_name, data)
             if not rows:
                 raise ValueError("予報データのパースに失敗しました。")
 
-            for row in rows:
-                upsert_forecast(conn, row)
+            upsert_forecasts(conn, rows)
+            upsert_series(conn, parse_jma_series(area_code, data))
 
             latest_rows = load_latest_forecasts(conn, area_code)
             subtitle = f"{meta.get('detail_area_name','')} / 発表: {meta.get('publishing_office','')} {meta.get('published_at','')}"
@@ -280,6 +449,7 @@ def run_app(page: ft.Page):
                 render_cards(latest_rows, subtitle)
                 refresh_date_dropdown(area_code)
 
-        page.update()
+        ui.mark(page)
 
-    load_areas()
+    # 地域リストの取得は画面を出したあと別スレッドで行う（通信を待たずに最初の描画を返す）
+    threading.Thread(target=load_areas, daemon=True).start()
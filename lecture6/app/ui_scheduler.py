@@ -0,0 +1,111 @@
+"""
+Flet の画面更新をまとめて送るスケジューラ
+control.update() はそのたびに Flet クライアントへの往復になる。連打やスクリプトからの連続イベントでは
+同じコントロールを何度も送ることになるので、「更新が必要」という印だけ付けて、1フレームに1回まとめて送る。
+
+    ui = UpdateScheduler(page)          # 既定 60fps（環境変数 UI_MAX_FPS で変更、0 ならまとめずにすぐ送る）
+    counter.value = "1"
+    ui.mark(counter)                    # counter.update() の代わり
+    with ui.batch():                    # 複数のコントロールを書き換える間は送らない
+        ...
+    ui.metrics()                        # {"requested": 120, "flushed": 8, "flushes": 8, ...}
+
+正本はこのファイル（lecture6/app/ui_scheduler.py）。lecture4 のアプリ（issure・calculator・hello-world）は
+それぞれ単独で起動・flet build できるように同じ内容の写しを置き、
+lecture6/tests/test_ui_scheduler_copies.py で写しがずれていないかを確かめる。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import flet as ft
+
+DEFAULT_MAX_FPS = float(os.getenv("UI_MAX_FPS", "60"))
+
+
+class UpdateScheduler:
+    def __init__(self, page: ft.Page, max_fps: Optional[float] = None):
+        self.page = page
+        fps = DEFAULT_MAX_FPS if max_fps is None else max_fps
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self._dirty: Dict[int, ft.Control] = {}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_flush = 0.0
+        self._batch_depth = 0
+        # 指標
+        self.requested = 0   # mark されたコントロールの数（のべ）
+        self.flushed = 0     # 実際に送ったコントロールの数（のべ）
+        self.flushes = 0     # page.update() を呼んだ回数
+        self.flush_ms_max = 0.0
+
+    def mark(self, *controls: ft.Control) -> None:
+        """コントロールを「更新が必要」にする。page を渡すと画面全体を更新する"""
+        with self._lock:
+            self.requested += len(controls)
+            for c in controls:
+                self._dirty[id(c)] = c
+            if self.interval <= 0:
+                if not self._batch_depth:
+                    self.flush()
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ui-scheduler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def flush(self) -> None:
+        """たまっている更新を今すぐ送る（時間のかかる処理の前に途中経過を見せたいときなど）"""
+        with self._lock:
+            controls = list(self._dirty.values())
+            self._dirty.clear()
+            if not controls:
+                return
+            start = time.perf_counter()
+            if any(c is self.page for c in controls):
+                self.page.update()
+            else:
+                self.page.update(*controls)
+            self._last_flush = time.monotonic()
+            self.flushes += 1
+            self.flushed += len(controls)
+            self.flush_ms_max = max(self.flush_ms_max, (time.perf_counter() - start) * 1000)
+
+    @contextmanager
+    def batch(self):
+        """ブロックの間はまとめ送りを止める（書き換えの途中の状態を送らない）"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self.interval <= 0 and not self._batch_depth:
+                    self.flush()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            # 前回送ってから1フレーム経つまで待つ。その間の mark は次の1回にまとまる
+            delay = self._last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as ex:
+                print(f"[ui_scheduler] update failed: {ex}")
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requested": self.requested,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "coalesced": self.requested - self.flushed,
+                "pending": len(self._dirty),
+                "flush_ms_max": round(self.flush_ms_max, 3),
+            }
@@ -0,0 +1,55 @@
+"""
+天気を整数の区分にする（取り込み時に1回だけ行い、forecasts.weather_category に保存する）
+表示のアイコンはこの区分から表で引き、「明日 雨の地域」などの検索は索引で引く。
+
+区分の付け方は ui.weather_icon の文字列判定と同じ優先順位（雪 > 雨 > 晴と曇 > 曇 > 晴）。
+「くもり 一時 雨」(202) のように天気コードの百の位（主な天気）と、途中に出てくる雨・雪が違うことがあるので、
+文字列があればそれで判定し、無いときだけ気象庁の天気コード（weatherCodes）の百の位で決める。
+"""
+from typing import Optional
+
+UNKNOWN = 0
+SUNNY = 1           # 晴
+PARTLY_CLOUDY = 2   # 晴と曇が両方出てくる
+CLOUDY = 3          # 曇
+RAIN = 4            # 雨が出てくる
+SNOW = 5            # 雪が出てくる
+
+CATEGORY_NAMES = {
+    UNKNOWN: "不明",
+    SUNNY: "晴れ",
+    PARTLY_CLOUDY: "晴れ/くもり",
+    CLOUDY: "くもり",
+    RAIN: "雨",
+    SNOW: "雪",
+}
+
+# 天気コードの百の位 -> 区分（100番台 晴, 200番台 曇, 300番台 雨, 400番台 雪）
+_CODE_HUNDREDS = {1: SUNNY, 2: CLOUDY, 3: RAIN, 4: SNOW}
+
+
+def category_from_text(weather: Optional[str]) -> int:
+    w = weather or ""
+    if "雪" in w:
+        return SNOW
+    if "雨" in w:
+        return RAIN
+    if "曇" in w or "くもり" in w:
+        return PARTLY_CLOUDY if "晴" in w else CLOUDY
+    if "晴" in w:
+        return SUNNY
+    return UNKNOWN
+
+
+def category_from_code(code: Optional[int]) -> int:
+    if code is None:
+        return UNKNOWN
+    return _CODE_HUNDREDS.get(int(code) // 100, UNKNOWN)
+
+
+def classify(weather: Optional[str], code: Optional[int] = None) -> int:
+    category = category_from_text(weather)
+    if category == UNKNOWN:
+        category = category_from_code(code)
+    return category
+
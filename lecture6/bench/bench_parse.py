@@ -0,0 +1,72 @@
+"""
+予報 JSON のパース速度比較（lecture6 で実行）:
+    python -m bench.bench_parse [--repeat 2000]
+
+fixtures/forecast/*.json は気象庁の予報 JSON と同じ構造の見本データ。
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from app.fastparse import JSON_BACKEND, decode_forecast
+from app.parser import parse_jma_forecast, parse_jma_series
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "forecast")
+
+
+def load_fixtures(fixture_dir: str = FIXTURE_DIR):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json"))):
+        with open(path, "rb") as f:
+            fixtures.append((os.path.basename(path)[:-5], f.read()))
+    return fixtures
+
+
+def dict_path(area_code: str, body: bytes):
+    data = json.loads(body)
+    rows, meta = parse_jma_forecast(area_code, area_code, data)
+    return rows, parse_jma_series(area_code, data)
+
+
+def fast_path(area_code: str, body: bytes):
+    records, series, meta = decode_forecast(area_code, area_code, body)
+    return records, series
+
+
+def bench(fn, fixtures, repeat: int) -> float:
+    """1ペイロードあたりの µs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for code, body in fixtures:
+            fn(code, body)
+    return (time.perf_counter() - start) / (repeat * len(fixtures)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        raise SystemExit(f"fixture がありません: {args.fixtures}")
+
+    # 両方の経路が同じ行を作ることを先に確認する
+    for code, body in fixtures:
+        rows, series = dict_path(code, body)
+        records, fast_series = fast_path(code, body)
+        assert [tuple(r.values()) for r in rows] == [tuple(r) for r in records], code
+        assert series == [tuple(s) for s in fast_series], code
+
+    dict_us = bench(dict_path, fixtures, args.repeat)
+    fast_us = bench(fast_path, fixtures, args.repeat)
+    print(f"fixtures: {len(fixtures)}  repeat: {args.repeat}  json backend: {JSON_BACKEND}")
+    print(f"json.loads + parse_jma_forecast/series : {dict_us:8.1f} µs/payload")
+    print(f"fastparse.decode_forecast              : {fast_us:8.1f} µs/payload  (x{dict_us / fast_us:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+weather.db の同時読み書きの負荷試験（lecture6 で実行）:
+    python -m bench.db_concurrency [--seconds 5] [--readers 8] [--out db_results.json] [--compare 前回.json]
+
+一括取得（daemon の取り込みと同じ upsert_forecast_records）を書き込みスレッドで流し続けながら、
+読み取りスレッドが画面と同じ問い合わせ（最新の発表・日付の一覧）を繰り返す。次の2通りを比べる。
+  shared: init_db の接続1本をロックで守って全スレッドで共有する（以前の ui.py と同じ）
+  pool:   open_db（WAL・書き込み用1本 + 読み取り専用の接続のプール）
+--compare には bench.pipeline と同じ形式の結果を渡せる（悪化した項目があると終了コード 1）。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+from app import db, fastparse
+from bench.bench_parse import load_fixtures
+from bench.pipeline import JST, compare, percentiles, synthetic_records
+from bench.stub_server import FIXTURE_DIR
+
+
+class _Shared:
+    """接続1本をロックで順番に使う（比較用）"""
+
+    def __init__(self, path: str):
+        self.conn = db.init_db(path)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def read(self):
+        with self.lock:
+            yield self.conn
+
+    write = read
+
+    def close(self):
+        self.conn.close()
+
+
+def run(mode: str, path: str, preload, stream, area_codes: List[str], seconds: float, readers: int, chunk: int) -> Dict[str, float]:
+    target = _Shared(path) if mode == "shared" else db.open_db(path, readers)
+    with target.write() as conn:
+        for i in range(0, len(preload), chunk):
+            db.upsert_forecast_records(conn, preload[i:i + chunk])
+        conn.execute("ANALYZE;")
+
+    stop = threading.Event()
+    latencies: List[List[float]] = [[] for _ in range(readers)]
+    written = [0]
+    errors = [0]
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            batch = stream[i:i + chunk]
+            if not batch:
+                i = 0
+                continue
+            with target.write() as conn:
+                written[0] += db.upsert_forecast_records(conn, batch)
+            i += chunk
+
+    def reader(k: int):
+        rnd = random.Random(k)
+        samples = latencies[k]
+        while not stop.is_set():
+            code = rnd.choice(area_codes)
+            start = time.perf_counter()
+            try:
+                with target.read() as conn:
+                    db.load_latest_forecasts(conn, code)
+                    db.list_available_target_dates(conn, code)
+            except sqlite3.Error:
+                errors[0] += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(k,)) for k in range(readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    target.close()
+
+    samples = [s for per_thread in latencies for s in per_thread]
+    results = {
+        f"{mode}.reads_per_sec": round(len(samples) / elapsed, 1),
+        f"{mode}.write_rows_per_sec": round(written[0] / elapsed, 1),
+        f"{mode}.read_errors": errors[0],
+    }
+    if samples:
+        for k, v in percentiles(samples).items():
+            results[f"{mode}.read.{k}"] = v
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--rows", type=int, default=200000, help="始めに入れておく行数")
+    parser.add_argument("--seconds", type=float, default=5.0, help="それぞれの計測時間")
+    parser.add_argument("--readers", type=int, default=8, help="読み取りスレッドの数（pool の接続数も同じ）")
+    parser.add_argument("--chunk", type=int, default=2000, help="書き込み1回あたりの行数")
+    parser.add_argument("--modes", default="shared,pool")
+    parser.add_argument("--out", default=None, help="結果を書き出す JSON")
+    parser.add_argument("--compare", default=None, help="比較する前回の結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(os.path.join(args.fixtures, "forecast"))
+    # 前半を始めに入れ、後半（より新しい発表）を書き込みスレッドが流し続ける
+    records = synthetic_records(fastparse, fixtures, args.rows * 2)
+    preload, stream = records[: args.rows], records[args.rows:]
+    area_codes = sorted({r.area_code for r in preload})
+
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in [m for m in args.modes.split(",") if m]:
+            results.update(run(mode, os.path.join(tmp, f"{mode}.db"), preload, stream, area_codes, args.seconds, args.readers, args.chunk))
+            print(f"[{mode}] done", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(JST).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "rows": args.rows,
+            "seconds": args.seconds,
+            "readers": args.readers,
+            "chunk": args.chunk,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
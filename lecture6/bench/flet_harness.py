@@ -0,0 +1,348 @@
+"""
+Flet アプリの画面なしベンチマーク（lecture6 で実行）:
+    python -m bench.flet_harness [--events 500] [--network-events 50] [--out ui_results.json] [--compare 前回.json]
+
+本物の ft.Page に「送る代わりに記録する」接続をつないで、各アプリの main(page) / run_app(page) を動かす。
+クリック・ドロップダウン・キー入力のイベントを続けて発生させ、次の値を測る。
+  - ハンドラの処理時間 p50 / p99、1秒あたりのイベント数
+  - 最初の描画までと操作できるようになるまでの時間、コントロール数（起動直後と操作後）
+  - クライアントへ送った回数・コマンド数・JSON のバイト数
+天気アプリ（lecture5 / lecture6）は bench.stub_server の fixtures に接続するので、外部には出ない。
+--compare には bench.pipeline と同じ形式の結果を渡せる（悪化した項目があると終了コード 1）。
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from importlib.metadata import version
+from typing import Callable, Dict, List, Tuple
+
+import flet as ft
+from flet.core.connection import Connection
+from flet.core.protocol import CommandEncoder, PageCommandResponsePayload, PageCommandsBatchResponsePayload
+
+from bench.pipeline import JST, compare
+from bench.stub_server import AREA_PATH, FIXTURE_DIR, FORECAST_PREFIX, StubServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SETTLE_SEC = 0.1   # 最後の送信からこの時間なにも送られなければ描画が終わったとみなす
+SETTLE_MAX_SEC = 3.0
+
+
+class RecordingConnection(Connection):
+    """Flet クライアントの代わりに、送られたコマンドの数と大きさを記録する"""
+
+    def __init__(self):
+        super().__init__()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.sends = 0
+        self.commands = 0
+        self.payload_bytes = 0
+        self.max_payload_bytes = 0
+        self.first_send = None
+        self.last_send = time.perf_counter()
+
+    def _record(self, payload) -> None:
+        size = len(json.dumps(payload, cls=CommandEncoder))
+        with self._lock:
+            self.sends += 1
+            self.commands += len(payload) if isinstance(payload, list) else 1
+            self.payload_bytes += size
+            self.max_payload_bytes = max(self.max_payload_bytes, size)
+            self.last_send = time.perf_counter()
+            if self.first_send is None:
+                self.first_send = self.last_send
+
+    def send_command(self, session_id: str, command):
+        self._record(command)
+        return PageCommandResponsePayload(result="", error="")
+
+    def send_commands(self, session_id: str, commands):
+        self._record(commands)
+        # add コマンドには、追加したコントロールの ID を空白区切りで返す
+        results = []
+        for command in commands:
+            if command.name == "add":
+                results.append(" ".join(f"_{next(self._ids)}" for _ in command.commands))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sends": self.sends,
+                "commands": self.commands,
+                "payload_bytes": self.payload_bytes,
+            }
+
+    def settle(self) -> None:
+        """スケジューラなど別スレッドからの送信が落ち着くまで待つ（呼んだ時点から SETTLE_SEC は必ず待つ）"""
+        start = time.perf_counter()
+        deadline = start + SETTLE_MAX_SEC
+        while time.perf_counter() < deadline:
+            if time.perf_counter() - max(self.last_send, start) >= SETTLE_SEC:
+                return
+            time.sleep(SETTLE_SEC / 4)
+
+
+def make_page() -> Tuple[ft.Page, RecordingConnection]:
+    conn = RecordingConnection()
+    return ft.Page(conn, "bench", asyncio.new_event_loop()), conn
+
+
+def walk(control):
+    yield control
+    for child in control._get_children():
+        yield from walk(child)
+
+
+def find(page: ft.Page, kind, predicate: Callable = lambda c: True) -> List:
+    return [c for c in walk(page) if isinstance(c, kind) and predicate(c)]
+
+
+def event(page: ft.Page, control, name: str = "click", data: str = "") -> ft.ControlEvent:
+    return ft.ControlEvent(target=control.uid or "", name=name, data=data, control=control, page=page)
+
+
+def load_script(name: str, path: str):
+    """lecture4 などのスクリプトをモジュールとして読み込む（同じフォルダの import が通るようにする）"""
+    folder = os.path.dirname(path)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---- アプリごとの操作 ----
+#   setup(page) でアプリを起動し、{シナリオ名: イベント1回ぶんを発生させる関数} を返す
+
+def counter_app(module_name: str, path: str):
+    def setup(page: ft.Page):
+        module = load_script(module_name, path)
+        module.main(page)
+        fab = page.floating_action_button
+        return {"fab_click": lambda: fab.on_click(event(page, fab))}
+
+    return setup
+
+
+def calculator_app(page: ft.Page):
+    module = load_script("bench_issure", os.path.join(REPO_ROOT, "lecture4", "issure", "issure.py"))
+    module.main(page)
+    # 同じ文字のボタンが複数のパッドにあるので、最後に見つかったもの（基本パッド）を使う
+    buttons = {b.text: b for b in find(page, ft.ElevatedButton)}
+    keys = itertools.cycle(["1", "2", "+", "3", "4", "×", "5", "6", "=", "C"])
+    modes = itertools.cycle(["decimal", "fraction", "int", "float"])
+    number_mode = find(page, ft.Dropdown)[0]
+
+    def press():
+        b = buttons[next(keys)]
+        b.on_click(event(page, b))
+
+    def change_mode():
+        number_mode.value = next(modes)
+        number_mode.on_change(event(page, number_mode, "change", number_mode.value))
+
+    return {"keystroke": press, "number_mode_dropdown": change_mode}
+
+
+def wait_until(predicate: Callable[[], bool]) -> None:
+    """別スレッドで読み込むもの（天気アプリの地域リスト）を待つ"""
+    deadline = time.perf_counter() + SETTLE_MAX_SEC
+    while not predicate() and time.perf_counter() < deadline:
+        time.sleep(0.005)
+
+
+def weather_scenarios(page: ft.Page) -> Dict[str, Callable[[], None]]:
+    # 地域リストは最初の描画のあとに別スレッドで読み込まれる
+    wait_until(lambda: bool(find(page, ft.ListTile)))
+    tiles = find(page, ft.ListTile)
+    area_dropdown = find(page, ft.Dropdown, lambda d: d.label == "地域を選択")[0]
+    tile_cycle = itertools.cycle(tiles)
+    option_cycle = itertools.cycle(area_dropdown.options or [])
+
+    def click_tile():
+        tile = next(tile_cycle)
+        tile.on_click(event(page, tile))
+
+    def change_area():
+        area_dropdown.value = next(option_cycle).key
+        area_dropdown.on_change(event(page, area_dropdown, "change", area_dropdown.value))
+
+    return {"area_click": click_tile, "area_dropdown": change_area}
+
+
+def lecture5_app(base_url: str):
+    def setup(page: ft.Page):
+        module = load_script("bench_lecture5", os.path.join(REPO_ROOT, "lecture5", "main.py"))
+        # 気象庁の URL を手元のスタブに向ける
+        module.AREA_URL = base_url + AREA_PATH
+        module.FORECAST_BASE_URL = base_url + FORECAST_PREFIX.rstrip("/")
+        module.main(page)
+        return weather_scenarios(page)
+
+    return setup
+
+
+def lecture6_app(page: ft.Page):
+    # config は import 時に URL を組み立てるので、JMA_BASE_URL を設定したあとで読み込む
+    ui = importlib.import_module("app.ui")
+    ui.run_app(page)
+    scenarios = weather_scenarios(page)
+    date_dropdown = find(page, ft.Dropdown, lambda d: d.label and d.label.startswith("日付"))[0]
+    scenarios["area_click"]()  # 日付の選択肢を作っておく
+    dates = itertools.cycle([o.key for o in date_dropdown.options or []] or [""])
+
+    def change_date():
+        date_dropdown.value = next(dates)
+        date_dropdown.on_change(event(page, date_dropdown, "change", date_dropdown.value))
+
+    scenarios["date_dropdown"] = change_date
+
+    search_field = find(page, ft.TextField, lambda t: t.label and t.label.startswith("予報の文を検索"))[0]
+    # フィクスチャの予報日は過去なので、日付では絞らない
+    find(page, ft.Checkbox, lambda c: c.label == "今日以降だけ")[0].value = False
+    queries = itertools.cycle(["波 3メートル", "暴風", "北の風", "雨"])
+
+    def search():
+        search_field.value = next(queries)
+        search_field.on_submit(event(page, search_field, "submit", search_field.value))
+
+    scenarios["search"] = search
+
+    overview_dropdown = find(page, ft.Dropdown, lambda d: d.label and d.label.startswith("概況"))[0]
+    regions = itertools.cycle([o.key for o in overview_dropdown.options or []])
+
+    def change_overview():
+        overview_dropdown.value = next(regions)
+        overview_dropdown.on_change(event(page, overview_dropdown, "change", overview_dropdown.value))
+
+    scenarios["overview"] = change_overview
+    return scenarios
+
+
+# ---- 計測 ----
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    p99_index = min(len(samples) - 1, int(len(samples) * 0.99))
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(samples[p99_index] * 1000, 3),
+    }
+
+
+def run_app(name: str, setup: Callable, events: int) -> Dict[str, float]:
+    results = {}
+    page, conn = make_page()
+    start = time.perf_counter()
+    scenarios = setup(page)
+    results[f"{name}.startup_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    if conn.first_send is not None:
+        results[f"{name}.first_frame_ms"] = round((conn.first_send - start) * 1000, 3)
+    conn.settle()
+    results[f"{name}.startup.payload_bytes"] = conn.payload_bytes
+    results[f"{name}.controls.startup"] = sum(1 for _ in walk(page))
+
+    for scenario, fire in scenarios.items():
+        before = conn.snapshot()
+        samples = []
+        burst_start = time.perf_counter()
+        for _ in range(events):
+            t = time.perf_counter()
+            fire()
+            samples.append(time.perf_counter() - t)
+        burst = time.perf_counter() - burst_start
+        conn.settle()
+        after = conn.snapshot()
+
+        key = f"{name}.{scenario}"
+        for k, v in percentiles(samples).items():
+            results[f"{key}.{k}"] = v
+        results[f"{key}.events_per_sec"] = round(events / burst, 1)
+        results[f"{key}.sends_per_event"] = round((after["sends"] - before["sends"]) / events, 3)
+        results[f"{key}.commands_per_event"] = round((after["commands"] - before["commands"]) / events, 3)
+        results[f"{key}.payload_bytes_per_event"] = round((after["payload_bytes"] - before["payload_bytes"]) / events, 1)
+
+    results[f"{name}.controls.after"] = sum(1 for _ in walk(page))
+    results[f"{name}.max_payload_bytes"] = conn.max_payload_bytes
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500, help="ネットワークを使わないアプリのイベント数")
+    parser.add_argument("--network-events", type=int, default=50, help="天気アプリのイベント数")
+    parser.add_argument("--apps", default="hello-world,calculator,issure,lecture5,lecture6")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--out", default=None, help="結果を書き出す JSON")
+    parser.add_argument("--compare", default=None, help="比較する前回の結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合")
+    args = parser.parse_args()
+
+    # lecture4 のアプリは import 時に ft.app() を呼ぶので、画面を開かないようにしておく
+    ft.app = lambda *a, **kw: None
+
+    apps = [a for a in args.apps.split(",") if a]
+    results: Dict[str, float] = {}
+    with StubServer(args.fixtures) as base_url, tempfile.TemporaryDirectory() as tmp:
+        os.environ["JMA_BASE_URL"] = base_url
+        cwd = os.getcwd()
+        os.chdir(tmp)  # lecture6 の weather.db を一時フォルダに作る
+        try:
+            specs: Dict[str, Tuple[Callable, int]] = {
+                "hello-world": (counter_app("bench_hello_world", os.path.join(REPO_ROOT, "lecture4", "hello-world", "src", "main.py")), args.events),
+                "calculator": (counter_app("bench_calculator", os.path.join(REPO_ROOT, "lecture4", "calculator", "src", "main.py")), args.events),
+                "issure": (calculator_app, args.events),
+                "lecture5": (lecture5_app(base_url), args.network_events),
+                "lecture6": (lecture6_app, args.network_events),
+            }
+            for name in apps:
+                setup, events = specs[name]
+                results.update(run_app(name, setup, events))
+                print(f"[{name}] done", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(JST).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "flet": version("flet"),
+            "events": args.events,
+            "network_events": args.network_events,
+            "ui_max_fps": os.getenv("UI_MAX_FPS", "60"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+天気パイプライン（jma_api -> parser -> db）の段階別ベンチマーク（lecture6 で実行）:
+    python -m bench.pipeline --out bench_results.json
+    python -m bench.pipeline --sizes 10000 --compare bench_results.json
+
+fixtures を手元の HTTP スタブから返し、段階ごとに計測して JSON で書き出す。
+--compare に前回の結果を渡すと、許容幅（--tolerance）を超えて悪化した項目を表示して終了コード 1 を返す。
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from bench.bench_parse import load_fixtures
+from bench.stub_server import FIXTURE_DIR, StubServer
+
+JST = timezone(timedelta(hours=9))
+
+# 指標名の末尾で良し悪しの向きを決める（_per_sec は大きいほど良い、それ以外は小さいほど良い）
+HIGHER_IS_BETTER_SUFFIX = "_per_sec"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    p99_index = min(len(samples) - 1, int(len(samples) * 0.99))
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(samples[p99_index] * 1000, 3),
+    }
+
+
+def timed(fn: Callable, n: int) -> List[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_fetch(jma_api, codes: List[str], n: int) -> Dict[str, float]:
+    results = {}
+    for k, v in percentiles(timed(jma_api.fetch_areas_json, n)).items():
+        results[f"fetch.areas.{k}"] = v
+    samples = []
+    for i in range(n):
+        code = codes[i % len(codes)]
+        samples.extend(timed(lambda: jma_api.fetch_forecast_json(code), 1))
+    for k, v in percentiles(samples).items():
+        results[f"fetch.forecast.{k}"] = v
+    return results
+
+
+def bench_parse(parser, fastparse, fixtures, repeat: int) -> Dict[str, float]:
+    def run(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for code, body in fixtures:
+                fn(code, body)
+        return (time.perf_counter() - start) / (repeat * len(fixtures)) * 1e6
+
+    def dict_path(code, body):
+        data = json.loads(body)
+        parser.parse_jma_forecast(code, code, data)
+        parser.parse_jma_series(code, data)
+
+    dict_us = run(dict_path)
+    fast_us = run(lambda code, body: fastparse.decode_forecast(code, code, body))
+    return {
+        "parse.dict.us_per_payload": round(dict_us, 2),
+        "parse.fast.us_per_payload": round(fast_us, 2),
+    }
+
+
+def synthetic_records(fastparse, fixtures, n_rows: int, n_areas: int = 100):
+    """fixtures を地域コードと発表時刻をずらして複製し、n_rows 行ぶんの forecasts 行を作る"""
+    templates = [fastparse.decode_forecast(code, code, body)[0] for code, body in fixtures]
+    start = datetime(2024, 1, 1, 5, tzinfo=JST)
+    rows = []
+    issuance = 0
+    while len(rows) < n_rows:
+        published = start + timedelta(hours=6 * issuance)
+        published_at = published.isoformat(timespec="seconds")
+        for a in range(n_areas):
+            area_code = f"{100000 + a * 100:06d}"
+            for k, r in enumerate(templates[a % len(templates)]):
+                target_date = (published + timedelta(days=k)).date().isoformat()
+                rows.append(r._replace(area_code=area_code, published_at=published_at, target_date=target_date))
+        issuance += 1
+    return rows[:n_rows]
+
+
+def bench_db(db, records, sizes: List[int], queries: int) -> Dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # 書き込み速度: dict を1行ずつ / dict をまとめて / タプルをまとめて
+        sample = records[: min(len(records), 20000)]
+        as_dicts = [r._asdict() for r in sample]
+        for name, write in (
+            ("row_by_row", lambda conn: [db.upsert_forecast(conn, d) for d in as_dicts[:2000]] and 2000),
+            ("bulk_dict", lambda conn: db.upsert_forecasts(conn, as_dicts)),
+            ("bulk_records", lambda conn: db.upsert_forecast_records(conn, sample)),
+        ):
+            conn = db.init_db(os.path.join(tmp, f"upsert_{name}.db"))
+            start = time.perf_counter()
+            n = write(conn)
+            results[f"upsert.{name}.rows_per_sec"] = round(n / (time.perf_counter() - start), 1)
+            conn.close()
+
+        # 読み出し: load_latest_forecasts を行数ごとに
+        for size in sizes:
+            conn = db.init_db(os.path.join(tmp, f"load_{size}.db"))
+            chunk = 50000
+            for i in range(0, size, chunk):
+                db.upsert_forecast_records(conn, records[i:min(i + chunk, size)])
+            conn.execute("ANALYZE;")
+            area_codes = [r["area_code"] for r in conn.execute("SELECT DISTINCT area_code FROM forecasts;")]
+            rnd = random.Random(size)
+            samples = timed(lambda: db.load_latest_forecasts(conn, rnd.choice(area_codes)), queries)
+            for k, v in percentiles(samples).items():
+                results[f"load_latest.{size}.{k}"] = v
+            results[f"db.{size}.bytes"] = os.path.getsize(os.path.join(tmp, f"load_{size}.db"))
+            conn.close()
+    return results
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for key, base in baseline.items():
+        cur = current.get(key)
+        if cur is None or not base or key.endswith(".bytes"):
+            continue
+        if key.endswith(HIGHER_IS_BETTER_SUFFIX):
+            worse = cur < base * (1 - tolerance)
+        else:
+            worse = cur > base * (1 + tolerance)
+        if worse:
+            regressions.append(f"{key}: {base} -> {cur}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--sizes", default="10000,1000000", help="load_latest_forecasts を測る行数（カンマ区切り）")
+    parser.add_argument("--requests", type=int, default=200, help="fetch の計測回数")
+    parser.add_argument("--repeat", type=int, default=1000, help="parse の繰り返し回数")
+    parser.add_argument("--queries", type=int, default=500, help="load_latest_forecasts の計測回数")
+    parser.add_argument("--out", default=None, help="結果を書き出す JSON")
+    parser.add_argument("--compare", default=None, help="比較する前回の結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    fixtures = load_fixtures(os.path.join(args.fixtures, "forecast"))
+    codes = [code for code, _ in fixtures]
+
+    with StubServer(args.fixtures) as base_url:
+        # config は import 時に URL を組み立てるので、環境変数を設定してから読み込む
+        os.environ["JMA_BASE_URL"] = base_url
+        jma_api = importlib.import_module("app.jma_api")
+        parser_mod = importlib.import_module("app.parser")
+        fastparse = importlib.import_module("app.fastparse")
+        db = importlib.import_module("app.db")
+
+        results = {}
+        results.update(bench_fetch(jma_api, codes, args.requests))
+    results.update(bench_parse(parser_mod, fastparse, fixtures, args.repeat))
+    records = synthetic_records(fastparse, fixtures, max(sizes + [20000]))
+    results.update(bench_db(db, records, sizes, args.queries))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(JST).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "json_backend": fastparse.JSON_BACKEND,
+            "fixtures": len(fixtures),
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+fixtures を気象庁と同じパスで返す手元の HTTP スタブ
+    /bosai/common/const/area.json          -> fixtures/area.json
+    /bosai/forecast/data/forecast/{code}.json -> fixtures/forecast/{code}.json
+"""
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+AREA_PATH = "/bosai/common/const/area.json"
+FORECAST_PREFIX = "/bosai/forecast/data/forecast/"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fixture_dir = FIXTURE_DIR
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == AREA_PATH:
+            file_path = os.path.join(self.fixture_dir, "area.json")
+        elif path.startswith(FORECAST_PREFIX) and "/" not in path[len(FORECAST_PREFIX):]:
+            file_path = os.path.join(self.fixture_dir, "forecast", path[len(FORECAST_PREFIX):])
+        else:
+            file_path = ""
+
+        if not file_path or not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """with StubServer() as base_url: ... で使う"""
+
+    def __init__(self, fixture_dir: str = FIXTURE_DIR, port: int = 0):
+        handler = type("Handler", (_Handler,), {"fixture_dir": fixture_dir})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.base_url
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
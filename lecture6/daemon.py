@@ -0,0 +1,21 @@
+import argparse
+
+from app.config import DB_PATH, METRICS_PATH, RETENTION_DAYS
+from app.db import open_db
+from app.poller import run_daemon
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="気象庁の定時発表に合わせて全地域の予報を weather.db に取り込む")
+    parser.add_argument("--db", default=DB_PATH, help="保存先DB")
+    parser.add_argument("--metrics", default=METRICS_PATH, help="状態を書き出すJSONファイル（空文字で無効）")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS, help="この日数より古い発表は最終発表だけ残す（0 で無効）")
+    parser.add_argument("--once", action="store_true", help="直近の発表分を1回だけ取得して終了")
+    args = parser.parse_args()
+
+    db = open_db(args.db)
+    try:
+        run_daemon(db, once=args.once, metrics_path=args.metrics, retention_days=args.retention_days)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
@@ -1,5 +1,15 @@
+from app.startup import from_argv
+
+# --profile-startup: import と最初の描画までの時間を段階ごとに表示する
+profile = from_argv()
+
 import flet as ft
+
+profile.mark("import flet")
+
 from app.ui import run_app
 
+profile.mark("import app.ui")
+
 if __name__ == "__main__":
-    ft.app(target=run_app)
+    ft.app(target=lambda page: run_app(page, profile))
@@ -0,0 +1,24 @@
+import argparse
+
+from app.api_server import ApiServer, ReadThroughStore
+from app.config import API_CACHE_SIZE, API_SERVER_HOST, API_SERVER_PORT, DB_PATH
+from app.db import open_db
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="weather.db を使った手元の予報 API（クライアントは WEATHER_API_BASE で指定）")
+    parser.add_argument("--db", default=DB_PATH, help="保存先DB")
+    parser.add_argument("--host", default=API_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=API_SERVER_PORT)
+    parser.add_argument("--cache-size", type=int, default=API_CACHE_SIZE, help="メモリに置く（地域, 発表）の数")
+    args = parser.parse_args()
+
+    db = open_db(args.db)
+    server = ApiServer((args.host, args.port), ReadThroughStore(db, cache_size=args.cache_size))
+    print(f"http://{args.host}:{server.server_address[1]} で待ち受け中（WEATHER_API_BASE に設定してください）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.close()
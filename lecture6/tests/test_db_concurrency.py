@@ -0,0 +1,129 @@
+"""
+open_db の読み書きを同時に行う（bench/db_concurrency.py の負荷試験を短くしたもの）
+書き込みスレッドが upsert_forecast_records で一括保存を続けている間に、読み取りプールから問い合わせる。
+  - 読み取りは書き込みを待たずに終わる（busy_timeout=0 にして、待てば "database is locked" になるようにする）
+  - 読み取りが見る中身は、コミットの単位でそろっている（書きかけの一括保存が見えない）
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db as dbmod
+from app.fastparse import ForecastRecord
+from app.retention import JST
+
+AREAS = [f"{100000 + a * 100:06d}" for a in range(50)]
+DAYS = 3
+ISSUANCES_PER_BATCH = 5
+PRELOAD_BATCHES = 2
+BATCHES = 10
+READERS = 4
+BATCH_ROWS = ISSUANCES_PER_BATCH * len(AREAS) * DAYS
+
+
+def batch(k: int):
+    """k 番目の一括保存: 発表 ISSUANCES_PER_BATCH 回ぶん × 全地域 × DAYS 日"""
+    rows = []
+    start = datetime(2024, 1, 1, 5, tzinfo=JST)
+    for i in range(k * ISSUANCES_PER_BATCH, (k + 1) * ISSUANCES_PER_BATCH):
+        published = start + timedelta(hours=6 * i)
+        published_at = published.isoformat(timespec="seconds")
+        for code in AREAS:
+            for d in range(DAYS):
+                target_date = (published + timedelta(days=d)).date().isoformat()
+                rows.append(ForecastRecord(
+                    code, code, code, "気象台", published_at, target_date,
+                    f"晴れ {i}", None, None, 1.0, 9.0, "jma", 100, 1,
+                ))
+    return rows
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # 読み取りがロックを待った時点で失敗するようにする
+    monkeypatch.setattr(dbmod, "DB_BUSY_TIMEOUT_MS", 0)
+    db = dbmod.open_db(str(tmp_path / "weather.db"), READERS)
+    for k in range(PRELOAD_BATCHES):
+        dbmod.upsert_forecast_records(db, batch(k))
+    yield db
+    db.close()
+
+
+def snapshot(conn):
+    """1つの読み取りトランザクションの中で、件数と地域ごとの最新発表を2回の問い合わせで読む"""
+    conn.execute("BEGIN;")
+    try:
+        n, issuances = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT published_at) FROM forecasts;"
+        ).fetchone()
+        latest = dbmod.load_latest_forecasts(conn, AREAS[-1])
+        again = conn.execute("SELECT COUNT(*) FROM forecasts;").fetchone()[0]
+    finally:
+        conn.execute("COMMIT;")
+    return n, issuances, latest, again
+
+
+def test_readers_run_during_bulk_upsert(db):
+    batches = [batch(k) for k in range(PRELOAD_BATCHES, PRELOAD_BATCHES + BATCHES)]
+    writing = threading.Event()
+    done = threading.Event()
+    errors = []
+    seen = [[] for _ in range(READERS)]
+    reads_during_write = [0] * READERS
+
+    def writer():
+        try:
+            writing.set()
+            for rows in batches:
+                with db.write() as conn:
+                    dbmod.upsert_forecast_records(conn, rows)
+        except Exception as ex:
+            errors.append(ex)
+        finally:
+            done.set()
+
+    def reader(k: int):
+        writing.wait()
+        try:
+            while True:
+                last = done.is_set()
+                with db.read() as conn:
+                    seen[k].append(snapshot(conn))
+                if last:
+                    return
+                reads_during_write[k] += 1
+        except sqlite3.Error as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(READERS)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=60)
+    assert not [t for t in threads if t.is_alive()], "読み取りか書き込みが終わりませんでした"
+
+    # "database is locked" を含め、読み取りも書き込みも失敗していない
+    assert errors == []
+    assert sum(reads_during_write) > 0
+
+    for per_reader in seen:
+        counts = []
+        for n, issuances, latest, again in per_reader:
+            # コミットの単位（一括保存1回ぶん）でそろっている
+            assert n == issuances * len(AREAS) * DAYS
+            assert n % BATCH_ROWS == 0
+            assert PRELOAD_BATCHES * BATCH_ROWS <= n <= (PRELOAD_BATCHES + BATCHES) * BATCH_ROWS
+            # 同じトランザクションの中では、あとの問い合わせも同じ時点を見る
+            assert again == n
+            # 最新発表は日数ぶんそろっていて、件数と同じ時点のもの
+            assert len(latest) == DAYS
+            assert len({r["published_at"] for r in latest}) == 1
+            assert latest[0]["weather"] == f"晴れ {issuances - 1}"
+            counts.append(n)
+        # コミット済みのものが見えなくなることはない
+        assert counts == sorted(counts)
+        # 書き込みが終わったあとの読み取りは全部を見る
+        assert counts[-1] == (PRELOAD_BATCHES + BATCHES) * BATCH_ROWS
@@ -0,0 +1,185 @@
+"""
+retention.apply_retention を数年分の合成データで確かめる
+地域3つ、1日2回（05時・17時）の発表。予報は発表日から3日分、時系列は6時間ごとに48時間分。
+"""
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import open_db, upsert_forecasts, upsert_series
+from app.retention import JST, apply_retention
+
+AREAS = ["016000", "130000", "270000"]
+YEARS = 3
+KEEP_DAYS = 30
+NOW = datetime(2025, 1, 1, 12, 0, tzinfo=JST)
+START = NOW - timedelta(days=365 * YEARS)
+
+
+def issuances():
+    day = START.replace(hour=0)
+    while day < NOW:
+        for hour in (5, 17):
+            published = day.replace(hour=hour)
+            if published <= NOW:
+                yield published
+        day += timedelta(days=1)
+
+
+def fill(db):
+    forecasts, series = [], []
+    for published in issuances():
+        pub_iso = published.isoformat(timespec="seconds")
+        pub_epoch = int(published.timestamp())
+        for code in AREAS:
+            for k in range(3):
+                target = (published + timedelta(days=k)).date().isoformat()
+                forecasts.append({
+                    "area_code": code,
+                    "area_name": code,
+                    "published_at": pub_iso,
+                    "target_date": target,
+                    "weather": f"晴れ {pub_iso}",
+                    "temp_min": 1.0,
+                    "temp_max": 9.0,
+                })
+            # 時系列は発表の次の 00/06/12/18 時から48時間分
+            first = published.replace(minute=0) + timedelta(hours=6 - published.hour % 6)
+            for h in range(0, 48, 6):
+                valid = int((first + timedelta(hours=h)).timestamp())
+                series.append((code, pub_epoch, valid, 10, 5, 100))
+    upsert_forecasts(db, forecasts)
+    upsert_series(db, series)
+
+
+def all_rows(db, sql):
+    with db.read() as conn:
+        return [tuple(r) for r in conn.execute(sql)]
+
+
+@pytest.fixture(scope="module")
+def template(tmp_path_factory):
+    """合成データを入れた DB を1回だけ作る（各テストはコピーを使う）"""
+    path = str(tmp_path_factory.mktemp("template") / "weather.db")
+    db = open_db(path)
+    fill(db)
+    db.close()
+    return path
+
+
+@pytest.fixture
+def db(template, tmp_path):
+    path = str(tmp_path / "weather.db")
+    shutil.copyfile(template, path)
+    db = open_db(path)
+    yield db
+    db.close()
+
+
+def cutoff():
+    c = NOW - timedelta(days=KEEP_DAYS)
+    return c.isoformat(timespec="seconds"), int(c.timestamp())
+
+
+def test_old_target_dates_keep_only_final_issuance(db):
+    before = all_rows(db, "SELECT area_code, target_date, published_at FROM forecasts")
+    apply_retention(db, KEEP_DAYS, now=NOW)
+    after = all_rows(db, "SELECT area_code, target_date, published_at FROM forecasts")
+
+    cutoff_iso, _ = cutoff()
+    final = {}
+    for area, target, pub in before:
+        final[(area, target)] = max(final.get((area, target), ""), pub)
+
+    kept = {}
+    for area, target, pub in after:
+        kept.setdefault((area, target), []).append(pub)
+    # 全部の発表が期限より古い (地域, 対象日) は、最終発表の1行だけ
+    for key, last in final.items():
+        if last < cutoff_iso:
+            assert kept[key] == [last]
+    assert set(kept) == set(final)
+
+
+def test_rows_inside_keep_days_untouched(db):
+    cutoff_iso, cutoff_epoch = cutoff()
+    sql_f = f"SELECT * FROM forecasts WHERE published_at >= '{cutoff_iso}' ORDER BY id"
+    sql_s = f"SELECT * FROM forecast_series WHERE published_at >= {cutoff_epoch} ORDER BY area_code, published_at, valid_time"
+    forecasts_before, series_before = all_rows(db, sql_f), all_rows(db, sql_s)
+    assert forecasts_before and series_before
+
+    apply_retention(db, KEEP_DAYS, now=NOW)
+    assert all_rows(db, sql_f) == forecasts_before
+    assert all_rows(db, sql_s) == series_before
+
+
+def test_series_keep_final_issuance_per_valid_time(db):
+    _, cutoff_epoch = cutoff()
+    before = all_rows(db, "SELECT area_code, published_at, valid_time FROM forecast_series")
+    apply_retention(db, KEEP_DAYS, now=NOW)
+    after = set(all_rows(db, "SELECT area_code, published_at, valid_time FROM forecast_series"))
+
+    final = {}
+    for area, pub, valid in before:
+        final[(area, valid)] = max(final.get((area, valid), 0), pub)
+    expected = {
+        (area, pub, valid) for area, pub, valid in before
+        if pub >= cutoff_epoch or pub == final[(area, valid)]
+    }
+    assert after == expected
+
+
+def test_reclaims_space_and_second_run_is_noop(db):
+    first = apply_retention(db, KEEP_DAYS, now=NOW)
+    assert first["forecasts_deleted"] > 0
+    assert first["series_deleted"] > 0
+    assert first["bytes_reclaimed"] > 0
+
+    forecasts = all_rows(db, "SELECT * FROM forecasts ORDER BY id")
+    series = all_rows(db, "SELECT * FROM forecast_series ORDER BY area_code, published_at, valid_time")
+    second = apply_retention(db, KEEP_DAYS, now=NOW)
+    assert second["forecasts_deleted"] == 0
+    assert second["series_deleted"] == 0
+    assert second["bytes_reclaimed"] == 0
+    assert all_rows(db, "SELECT * FROM forecasts ORDER BY id") == forecasts
+    assert all_rows(db, "SELECT * FROM forecast_series ORDER BY area_code, published_at, valid_time") == series
+
+
+def test_nothing_to_delete_reclaims_nothing(tmp_path):
+    # 初めての ANALYZE で統計表が増えても、回収量が負にならない
+    db = open_db(str(tmp_path / "small.db"))
+    try:
+        result = apply_retention(db, KEEP_DAYS, now=NOW)
+        assert result["forecasts_deleted"] == 0
+        assert result["bytes_reclaimed"] == 0
+        assert result["bytes_after"] == result["bytes_before"]
+    finally:
+        db.close()
+
+
+def test_converts_auto_vacuum_none(tmp_path):
+    path = str(tmp_path / "old.db")
+    # 古い DB: auto_vacuum=NONE のまま中身がある（init_db の PRAGMA は空のファイルにしか効かない）
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA auto_vacuum=NONE;")
+    conn.execute("CREATE TABLE legacy(x INTEGER);")
+    conn.commit()
+    conn.close()
+
+    db = open_db(path)
+    try:
+        with db.read() as c:
+            assert c.execute("PRAGMA auto_vacuum;").fetchone()[0] == 0
+        fill(db)
+        result = apply_retention(db, KEEP_DAYS, now=NOW)
+        assert result["bytes_reclaimed"] > 0
+    finally:
+        db.close()
+    # 開いたままの接続は auto_vacuum を覚えたままなので、ファイルを開き直して確かめる
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2
+    finally:
+        conn.close()
@@ -0,0 +1,16 @@
+"""
+最終課題 には tracing.py の写しを置いている。正本とずれていないかを確かめる
+"""
+import os
+
+LECTURE6 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(LECTURE6)
+CANONICAL = os.path.join(LECTURE6, "app", "tracing.py")
+COPY = os.path.join(REPO_ROOT, "最終課題", "tracing.py")
+
+
+def test_copy_matches_canonical():
+    with open(CANONICAL, "rb") as f:
+        canonical = f.read()
+    with open(COPY, "rb") as f:
+        assert f.read() == canonical, f"{COPY} が {CANONICAL} とずれています。正本をコピーし直してください"
@@ -0,0 +1,23 @@
+"""
+lecture4 のアプリには ui_scheduler.py の写しを置いている。正本とずれていないかを確かめる
+"""
+import os
+
+import pytest
+
+LECTURE6 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(LECTURE6)
+CANONICAL = os.path.join(LECTURE6, "app", "ui_scheduler.py")
+COPIES = [
+    os.path.join(REPO_ROOT, "lecture4", "issure", "ui_scheduler.py"),
+    os.path.join(REPO_ROOT, "lecture4", "calculator", "src", "ui_scheduler.py"),
+    os.path.join(REPO_ROOT, "lecture4", "hello-world", "src", "ui_scheduler.py"),
+]
+
+
+@pytest.mark.parametrize("path", COPIES, ids=lambda p: os.path.relpath(p, REPO_ROOT))
+def test_copy_matches_canonical(path):
+    with open(CANONICAL, "rb") as f:
+        canonical = f.read()
+    with open(path, "rb") as f:
+        assert f.read() == canonical, f"{path} が {CANONICAL} とずれています。正本をコピーし直してください"
@@ -3,19 +3,35 @@ import time
 import json
 import sqlite3
 import argparse
+from itertools import chain, islice
+from typing import Iterable, Iterator
 
 import requests
 from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from partitions import aggregate, drop_partition, init_partition, split_into_partitions
+from jsonstream import JsonItemStream
+from catalog import cached_search, init_catalog, meta_is_fresh, save_meta, save_tables, search_local
+from sketches import init_sketches, rebuild_sketches, summarize, update_sketches
+from tracing import span, traced
+
 load_dotenv()
 
 DB_PATH = "estat.db"
+# 統計表ごとのファイル（partitions.py）に分けて保存する。--partitioned でも切り替えられる
+PARTITIONED = os.getenv("ESTAT_PARTITIONED") == "1"
 RAW_JSON_PATH = "estat_raw.json"
 
 STATS_LIST_URL = "https://api.e-stat.go.jp/rest/3.0/app/json/getStatsList"
 STATS_DATA_URL = "https://api.e-stat.go.jp/rest/3.0/app/json/getStatsData"
+META_INFO_URL = "https://api.e-stat.go.jp/rest/3.0/app/json/getMetaInfo"
+
+# getStatsData の中の VALUE 配列の位置
+VALUE_PATH = ["GET_STATS_DATA", "STATISTICAL_DATA", "DATA_INF", "VALUE"]
+STREAM_CHUNK_SIZE = 64 * 1024   # 受信した本文をこの単位で読み進める
+INSERT_BATCH = 10000            # VALUE をこの件数ずつ行にして保存する
 
 
 session = requests.Session()
@@ -60,23 +76,56 @@ def assert_api_ok(resp_json: dict):
             msg = result.get("ERROR_MSG") or result.get("ERROR_MESSAGE") or "Unknown error"
             raise RuntimeError(f"e-Stat API error: STATUS={status}, MSG={msg}")
 
-    if "GET_STATS_DATA" not in resp_json and "GET_STATS_LIST" not in resp_json:
+    if not any(k in resp_json for k in ("GET_STATS_DATA", "GET_STATS_LIST", "GET_META_INFO")):
         raise RuntimeError("APIの返却が想定外です: " + short_json(resp_json, 500))
 
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (educational; e-Stat API client)"
+}
+
+
 def api_get(url: str, params: dict) -> dict:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (educational; e-Stat API client)"
-    }
-    r = session.get(url, params=params, headers=headers, timeout=(10, 30))
-    r.raise_for_status()
+    with span("api_get", url=url) as s:
+        r = session.get(url, params=params, headers=HEADERS, timeout=(10, 30))
+        r.raise_for_status()
+        s.set(bytes=len(r.content), status=r.status_code)
 
-    data = r.json()
-    assert_api_ok(data)
+        data = r.json()
+        assert_api_ok(data)
 
     time.sleep(1)
     return data
 
+def api_stream(url: str, params: dict, path: list[str], raw_path: str | None = None) -> JsonItemStream:
+    """
+    api_get と同じ呼び出しを、本文を溜めずに行う。path の配列の要素を受け取った順に返す
+    RESULT などほかの部分は読み終えたあとの stream.head で確かめる（assert_api_ok は呼び出し側で）
+    raw_path: 受け取った本文をそのままこのファイルにも書く
+    """
+    def chunks():
+        with span("api_stream", url=url) as s:
+            r = session.get(url, params=params, headers=HEADERS, timeout=(10, 30), stream=True)
+            s.set(status=r.status_code)
+        with r:
+            r.raise_for_status()
+            received = 0
+            raw = open(raw_path, "wb") if raw_path else None
+            try:
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    received += len(chunk)
+                    if raw:
+                        raw.write(chunk)
+                    yield chunk
+            finally:
+                if raw:
+                    raw.close()
+        print(f"Received: {received} bytes")
+        time.sleep(1)
+
+    return JsonItemStream(chunks(), path)
+
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -93,7 +142,13 @@ def init_db():
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_obs_time ON observations(time);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_obs_area ON observations(area);")
+    # 差分取得で統計表ごとの MAX(time) を引くための索引
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_obs_sid_time ON observations(stats_data_id, time);")
     conn.commit()
+    # 統計表一覧・分類情報のカタログ（catalog.py）
+    init_catalog(conn)
+    # 期・地域ごとの分位点 / 異なり数のスケッチ（sketches.py）
+    init_sketches(conn)
     conn.close()
 
 
@@ -113,10 +168,7 @@ def normalize_value(v):
     return None
 
 
-def insert_rows(stats_data_id: str, values: list[dict]):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
+def to_rows(stats_data_id: str, values: Iterable[dict]) -> list[tuple]:
     rows = []
     for item in values:
         raw_value = item.get("$") or item.get("@value") or item.get("value")
@@ -128,48 +180,197 @@ def insert_rows(stats_data_id: str, values: list[dict]):
         dims_json = json.dumps(dims, ensure_ascii=False)
 
         rows.append((stats_data_id, val, t, a, dims_json))
+    return rows
 
-    cur.executemany("""
-        INSERT INTO observations(stats_data_id, value, time, area, dims_json)
-        VALUES (?, ?, ?, ?, ?)
-    """, rows)
 
-    conn.commit()
-    conn.close()
-    print(f"Inserted: {len(rows)} rows")
+_INSERT_SQL = """
+    INSERT INTO observations(stats_data_id, value, time, area, dims_json)
+    VALUES (?, ?, ?, ?, ?)
+"""
 
 
+def data_db_path(stats_data_id: str) -> str:
+    """
+    observations / sketches を置く DB（分けて保存するときは統計表ごとのファイル）
+    カタログ（統計表一覧・分類情報）はどちらの場合も DB_PATH に置く
+    """
+    if PARTITIONED:
+        return init_partition(stats_data_id)
+    return DB_PATH
 
-def search_stats_list(keyword: str, limit: int = 10) -> list[dict]:
-    app_id = get_app_id()
-    params = {
-        "appId": app_id,
-        "searchWord": keyword,
-        "limit": limit,
-    }
-    data = api_get(STATS_LIST_URL, params)
 
-    items = dig(data, ["GET_STATS_LIST", "DATALIST_INF", "TABLE_INF"])
-    if items is None:
-        raise RuntimeError("統計表一覧が見つかりません: " + short_json(data, 600))
+def _insert_in_batches(conn: sqlite3.Connection, stats_data_id: str, values: Iterable[dict],
+                       sketches: bool) -> int:
+    """
+    VALUE を INSERT_BATCH 件ずつ行にして入れる（values がストリームでも全件をリストにしない）
+    sketches: 入れた行をスケッチにも足し込む
+    """
+    values = iter(values)
+    total = 0
+    while True:
+        rows = to_rows(stats_data_id, islice(values, INSERT_BATCH))
+        if not rows:
+            return total
+        conn.executemany(_INSERT_SQL, rows)
+        if sketches:
+            update_sketches(conn, stats_data_id, ((r[1], r[2], r[3]) for r in rows))
+        total += len(rows)
+
+
+@traced("insert_rows", rows=lambda n: n)
+def insert_rows(stats_data_id: str, values: Iterable[dict]) -> int:
+    conn = sqlite3.connect(data_db_path(stats_data_id))
+    try:
+        n = _insert_in_batches(conn, stats_data_id, values, sketches=True)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Inserted: {n} rows")
+    return n
+
+
+def latest_time(stats_data_id: str) -> str | None:
+    """
+    保存済みの最新の時間軸コード（例: "2023000000"）。無ければ None
+    e-Stat の時間軸コードは桁数がそろった数字なので、文字列の MAX がそのまま最新になる
+    """
+    conn = sqlite3.connect(data_db_path(stats_data_id))
+    row = conn.execute(
+        "SELECT MAX(time) FROM observations WHERE stats_data_id = ?;",
+        (stats_data_id,),
+    ).fetchone()
+    conn.close()
+    return row[0] if row else None
 
-    if isinstance(items, dict):
-        items = [items]
-    if not isinstance(items, list):
-        raise RuntimeError("統計表一覧の形式が想定外です")
 
-    return items
+@traced("merge_rows", rows=lambda n: n)
+def merge_rows(stats_data_id: str, values: Iterable[dict], time_from: str) -> int:
+    """
+    time_from 以降の行を入れ替える（差分取得の結果を取り込む）
+    最新の期は速報値が確報に置き換わることがあるので、time_from の期も取り直した内容で上書きする
+    cdTimeFrom は time_from の期を含むので、普通の返却には必ずその期がある。
+    1件も無い（STATUS=1 など）ときは何も消さずに戻る（消すと保存済みの最新の期だけが失われる）
+    """
+    values = iter(values)
+    first = next(values, None)
+    if first is None:
+        print(f"Merged: 0 rows (no data for time >= {time_from}; nothing replaced)")
+        return 0
+
+    conn = sqlite3.connect(data_db_path(stats_data_id))
+    with conn:
+        # 最初の VALUE が届いてから消す（途中で失敗したら with を抜けるときに消した分も戻る）
+        deleted = conn.execute(
+            "DELETE FROM observations WHERE stats_data_id = ? AND time >= ?;",
+            (stats_data_id, time_from),
+        ).rowcount
+        n = _insert_in_batches(conn, stats_data_id, chain([first], values), sketches=False)
+        # 入れ替えた行は t-digest から取り除けないので、この統計表のスケッチは作り直す
+        rebuild_sketches(conn, stats_data_id)
+    conn.close()
+    print(f"Merged: {n} rows (replaced {deleted} rows, time >= {time_from})")
+    return n
 
 
-def fetch_stats_data(stats_data_id: str) -> dict:
+
+def search_stats_list(keyword: str, limit: int = 10, refresh: bool = False, local: bool = False) -> list[dict]:
+    """
+    同じキーワードで前回検索した結果がカタログにあり、期限内ならそれを返す（API を使わない）
+    refresh: カタログを使わずに取り直す
+    local: API を使わず、保存済みの統計表の名前から探す
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if local:
+            return search_local(conn, keyword, limit)
+        if not refresh:
+            cached = cached_search(conn, keyword, limit)
+            if cached is not None:
+                print("[catalog] 保存済みの検索結果を使います")
+                return cached
+
+        app_id = get_app_id()
+        params = {
+            "appId": app_id,
+            "searchWord": keyword,
+            "limit": limit,
+        }
+        data = api_get(STATS_LIST_URL, params)
+
+        items = dig(data, ["GET_STATS_LIST", "DATALIST_INF", "TABLE_INF"])
+        if items is None:
+            raise RuntimeError("統計表一覧が見つかりません: " + short_json(data, 600))
+
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            raise RuntimeError("統計表一覧の形式が想定外です")
+
+        save_tables(conn, keyword, limit, items)
+        return items
+    finally:
+        conn.close()
+
+
+def ensure_meta_info(stats_data_id: str, refresh: bool = False) -> None:
+    """
+    分類（地域・時間軸など）のコードと名前をカタログに入れておく。期限内なら何もしない
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if not refresh and meta_is_fresh(conn, stats_data_id):
+            return
+        params = {
+            "appId": get_app_id(),
+            "statsDataId": stats_data_id,
+        }
+        n = save_meta(conn, stats_data_id, api_get(META_INFO_URL, params))
+        print(f"[catalog] 分類情報を保存しました: {n} codes")
+    finally:
+        conn.close()
+
+
+def stats_data_params(stats_data_id: str, time_from: str | None = None) -> dict:
+    """
+    time_from を渡すと、その時間軸コード以降だけを取得する（cdTimeFrom、その期を含む）
+    """
     app_id = get_app_id()
     params = {
         "appId": app_id,
         "statsDataId": stats_data_id,
     }
-    return api_get(STATS_DATA_URL, params)
+    if time_from:
+        params["cdTimeFrom"] = time_from
+    return params
+
+
+def fetch_stats_data(stats_data_id: str, time_from: str | None = None) -> dict:
+    return api_get(STATS_DATA_URL, stats_data_params(stats_data_id, time_from))
+
+
+def stream_stats_values(stats_data_id: str, time_from: str | None = None,
+                        raw_path: str | None = RAW_JSON_PATH) -> Iterator[dict]:
+    """
+    fetch_stats_data + extract_values を本文を溜めずに行う（VALUE を受け取った順に1件ずつ返す）
+    返却の全体を dict にしないので、大きな統計表でも使うメモリはほぼ一定
+    該当データが無い（STATUS=1）ときは何も返さない
+    """
+    stream = api_stream(STATS_DATA_URL, stats_data_params(stats_data_id, time_from), VALUE_PATH, raw_path)
+    yield from stream
+    assert_api_ok(stream.head)
+    if not stream.found and not has_no_data(stream.head):
+        raise RuntimeError("VALUEが見つかりません。返却内容（先頭）: " + short_json(stream.head, 700))
+
+
+def has_no_data(stats_data_json: dict) -> bool:
+    """
+    STATUS=1 は「正常に終了したが該当データが無い」（差分取得で新しい期がまだ無いとき）
+    """
+    status = dig(stats_data_json, ["GET_STATS_DATA", "RESULT", "STATUS"])
+    return str(status) == "1"
 
 
+@traced("extract_values", rows=len)
 def extract_values(stats_data_json: dict) -> list[dict]:
     values = dig(stats_data_json, ["GET_STATS_DATA", "STATISTICAL_DATA", "DATA_INF", "VALUE"])
     if values is None:
@@ -182,18 +383,76 @@ def extract_values(stats_data_json: dict) -> list[dict]:
 
     return values
 
+def print_summary(stats_data_id: str, dim: str, quantiles: list[float]):
+    """
+    スケッチだけを読んで、期（または地域）ごとの件数・分位点・異なり数を表示する
+    """
+    conn = sqlite3.connect(data_db_path(stats_data_id))
+    rows = summarize(conn, stats_data_id, dim, quantiles)
+    conn.close()
+    if not rows:
+        print("スケッチがありません（先にデータを取得してね）")
+        return
+    print_table(rows)
+
+
+def print_table(rows: list[dict]):
+    cols = list(rows[0])
+    print("\t".join(cols))
+    for r in rows:
+        print("\t".join("" if r[c] is None else f"{r[c]:.6g}" if isinstance(r[c], float) else str(r[c]) for c in cols))
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--keyword", default="宿泊", help="統計表検索キーワード（例：宿泊 / 観光 / 旅行 / 住宅 / 人口）")
     parser.add_argument("--pick", type=int, default=1, help="候補の何番目を使うか（1始まり）")
     parser.add_argument("--statsDataId", default=None, help="分かっている場合は統計表IDを直接指定（優先）")
+    parser.add_argument("--local-search", action="store_true", help="API を使わず、保存済みのカタログから候補を探す")
+    parser.add_argument("--refresh-catalog", action="store_true", help="カタログの期限内でも統計表一覧・分類情報を取り直す")
+    parser.add_argument("--quantiles", default=None, help="取得せず、保存済みのスケッチから分位点を表示する（例: 0.5,0.9）。--statsDataId と使う")
+    parser.add_argument("--by", choices=["time", "area"], default="time", help="--quantiles の集計単位")
+    parser.add_argument("--incremental", action="store_true", help="保存済みの最新の期以降だけを取得して取り込む（定期更新用）")
+    parser.add_argument("--partitioned", action="store_true", help="統計表ごとのファイル（estat_parts/）に保存・集計する")
+    parser.add_argument("--split-partitions", action="store_true", help="estat.db の observations を統計表ごとのファイルへ移して終了")
+    parser.add_argument("--drop-partition", default=None, help="統計表を1つ消して終了（ファイルを消すだけ）")
+    parser.add_argument("--report", choices=["time", "area"], default=None, help="取得せず、全ての統計表ファイルをまとめて期ごと / 地域ごとに集計する")
+    parser.add_argument("--workers", type=int, default=0, help="--report で使うプロセス数（0 なら順番に読む）")
     args = parser.parse_args()
 
+    global PARTITIONED
+    PARTITIONED = PARTITIONED or args.partitioned
+
     init_db()
+
+    if args.split_partitions:
+        moved = split_into_partitions(DB_PATH)
+        for sid, n in moved.items():
+            print(f"{sid}: {n} rows")
+        print("（元の estat.db の空き領域は VACUUM で返せます）")
+        return
+    if args.drop_partition:
+        print("削除しました" if drop_partition(args.drop_partition) else "ファイルがありません")
+        return
+    if args.report:
+        rows = aggregate(args.report, workers=args.workers)
+        if rows:
+            print_table(rows)
+        else:
+            print("統計表のファイルがありません（--partitioned で取得してね）")
+        return
     stats_data_id = args.statsDataId
 
+    if args.quantiles:
+        if not stats_data_id:
+            raise RuntimeError("--quantiles には --statsDataId も指定してね")
+        print_summary(stats_data_id, args.by, [float(q) for q in args.quantiles.split(",") if q])
+        return
+
     if not stats_data_id:
-        items = search_stats_list(args.keyword, limit=10)
+        items = search_stats_list(args.keyword, limit=10, refresh=args.refresh_catalog, local=args.local_search)
+        if not items:
+            raise RuntimeError(f"「{args.keyword}」に当たる統計表がありません")
 
         print("=== statsDataId 候補（上から10件）===")
         for i, it in enumerate(items, start=1):
@@ -215,17 +474,28 @@ def main():
         print(f"\n[選択] statsDataId = {stats_data_id}\n")
 
 
-    data = fetch_stats_data(stats_data_id)
-
-    with open(RAW_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        ensure_meta_info(stats_data_id, refresh=args.refresh_catalog)
+    except Exception as e:
+        # 分類名は後からでも付けられるので、取得に失敗してもデータの取得は続ける
+        print(f"[catalog] 分類情報を取得できませんでした: {e}")
+
+    time_from = latest_time(stats_data_id) if args.incremental else None
+    if args.incremental:
+        if time_from:
+            print(f"[差分取得] {time_from} 以降を取得します")
+        else:
+            print("[差分取得] 保存済みのデータが無いので全期間を取得します")
+
+    # 受け取りながら INSERT_BATCH 件ずつ保存する（受け取った本文は RAW_JSON_PATH にもそのまま書く）
+    values = stream_stats_values(stats_data_id, time_from)
+    if time_from:
+        merge_rows(stats_data_id, values, time_from)
+    else:
+        insert_rows(stats_data_id, values)
     print(f"Saved raw JSON: {RAW_JSON_PATH}")
 
-
-    values = extract_values(data)
-    insert_rows(stats_data_id, values)
-
-    print(f"Done. DB: {DB_PATH}")
+    print(f"Done. DB: {data_db_path(stats_data_id)}")
 
 
 if __name__ == "__main__":
@@ -26,3 +26,18 @@ WHERE value IS NOT NULL
 GROUP BY area
 ORDER BY avg_value DESC
 LIMIT 20;
+
+
+-- 地域名を付けて集計する（analyze.py が getMetaInfo の分類情報を class_info に保存している）
+SELECT
+  area,
+  area_name,
+  COUNT(*) AS n,
+  AVG(value) AS avg_value
+FROM observations_labeled
+WHERE value IS NOT NULL
+  AND area IS NOT NULL
+  AND area <> ''
+GROUP BY area, area_name
+ORDER BY avg_value DESC
+LIMIT 20;
@@ -0,0 +1,244 @@
+"""
+e-Stat の統計表一覧（getStatsList）と分類・メタ情報（getMetaInfo）を estat.db に保存しておく
+  - 同じキーワードの検索は CATALOG_TTL_SEC の間は API を呼ばずに保存済みの結果を返す
+  - 保存した統計表の名前は全文検索（FTS5 trigram）できるので、オフラインでも候補を探せる
+  - 分類（地域・時間軸など）のコードと名前は class_info に入れ、observations_labeled で名前を付けて引ける
+API の呼び出しは analyze.py が行い、ここでは保存と検索だけを扱う。
+"""
+import json
+import sqlite3
+import time
+
+CATALOG_TTL_SEC = 24 * 3600       # 統計表一覧の検索結果を使い回す時間
+META_TTL_SEC = 7 * 24 * 3600      # 分類・メタ情報を使い回す時間
+
+# trigram は SQLite 3.34 以降。古い SQLite では LIKE で探す
+HAS_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def text_of(v) -> str:
+    """{"@code": ..., "$": "名前"} の形と文字列の両方から名前を取り出す"""
+    if isinstance(v, dict):
+        return str(v.get("$") or "")
+    return "" if v is None else str(v)
+
+
+def init_catalog(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stats_tables (
+        stats_data_id TEXT PRIMARY KEY,
+        stat_name TEXT,
+        statistics_name TEXT,
+        title TEXT,
+        gov_org TEXT,
+        survey_date TEXT,
+        updated_date TEXT,
+        raw_json TEXT NOT NULL,
+        fetched_at INTEGER NOT NULL
+    );
+    """)
+    # キーワードごとの検索結果（並び順どおりの statsDataId）
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS stats_searches (
+        keyword TEXT NOT NULL,
+        max_items INTEGER NOT NULL,
+        ids_json TEXT NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        PRIMARY KEY (keyword, max_items)
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS class_info (
+        stats_data_id TEXT NOT NULL,
+        class_id TEXT NOT NULL,
+        class_name TEXT,
+        code TEXT NOT NULL,
+        name TEXT,
+        level TEXT,
+        unit TEXT,
+        parent_code TEXT,
+        PRIMARY KEY (stats_data_id, class_id, code)
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meta_fetched (
+        stats_data_id TEXT PRIMARY KEY,
+        fetched_at INTEGER NOT NULL
+    );
+    """)
+    if HAS_TRIGRAM:
+        conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS stats_tables_fts USING fts5(
+            stats_data_id UNINDEXED, title, stat_name, statistics_name,
+            tokenize='trigram'
+        );
+        """)
+    # observations の地域・時間軸コードに名前を付けたもの（分類情報が無い行は名前が NULL）
+    conn.execute("""
+    CREATE VIEW IF NOT EXISTS observations_labeled AS
+    SELECT
+        o.*,
+        a.name AS area_name,
+        t.name AS time_name
+    FROM observations o
+    LEFT JOIN class_info a
+        ON a.stats_data_id = o.stats_data_id AND a.class_id = 'area' AND a.code = o.area
+    LEFT JOIN class_info t
+        ON t.stats_data_id = o.stats_data_id AND t.class_id = 'time' AND t.code = o.time;
+    """)
+    conn.commit()
+
+
+def save_tables(conn: sqlite3.Connection, keyword: str, max_items: int, items: list[dict], now: int | None = None):
+    """getStatsList の TABLE_INF を保存し、キーワードの検索結果として並び順も残す"""
+    now = int(now or time.time())
+    ids = []
+    with conn:
+        for it in items:
+            sid = it.get("@id")
+            if not sid:
+                continue
+            ids.append(sid)
+            row = (
+                sid,
+                text_of(it.get("STAT_NAME")),
+                text_of(it.get("STATISTICS_NAME")),
+                text_of(it.get("TITLE")),
+                text_of(it.get("GOV_ORG")),
+                text_of(it.get("SURVEY_DATE")),
+                text_of(it.get("UPDATED_DATE")),
+                json.dumps(it, ensure_ascii=False),
+                now,
+            )
+            conn.execute("""
+                INSERT INTO stats_tables(stats_data_id, stat_name, statistics_name, title, gov_org,
+                                         survey_date, updated_date, raw_json, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(stats_data_id) DO UPDATE SET
+                    stat_name=excluded.stat_name,
+                    statistics_name=excluded.statistics_name,
+                    title=excluded.title,
+                    gov_org=excluded.gov_org,
+                    survey_date=excluded.survey_date,
+                    updated_date=excluded.updated_date,
+                    raw_json=excluded.raw_json,
+                    fetched_at=excluded.fetched_at;
+            """, row)
+            if HAS_TRIGRAM:
+                conn.execute("DELETE FROM stats_tables_fts WHERE stats_data_id = ?;", (sid,))
+                conn.execute(
+                    "INSERT INTO stats_tables_fts(stats_data_id, title, stat_name, statistics_name) VALUES (?, ?, ?, ?);",
+                    (sid, row[3], row[1], row[2]),
+                )
+        conn.execute("""
+            INSERT INTO stats_searches(keyword, max_items, ids_json, fetched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(keyword, max_items) DO UPDATE SET ids_json=excluded.ids_json, fetched_at=excluded.fetched_at;
+        """, (keyword, max_items, json.dumps(ids), now))
+
+
+def _load_tables(conn: sqlite3.Connection, ids: list[str]) -> list[dict]:
+    if not ids:
+        return []
+    marks = ",".join("?" for _ in ids)
+    raw = dict(conn.execute(f"SELECT stats_data_id, raw_json FROM stats_tables WHERE stats_data_id IN ({marks});", ids))
+    return [json.loads(raw[sid]) for sid in ids if sid in raw]
+
+
+def cached_search(conn: sqlite3.Connection, keyword: str, max_items: int, ttl_sec: int = CATALOG_TTL_SEC,
+                  now: int | None = None) -> list[dict] | None:
+    """
+    前回と同じ検索の結果（getStatsList の TABLE_INF と同じ形）。無いか古ければ None
+    """
+    now = int(now or time.time())
+    row = conn.execute(
+        "SELECT ids_json, fetched_at FROM stats_searches WHERE keyword = ? AND max_items = ?;",
+        (keyword, max_items),
+    ).fetchone()
+    if row is None or now - row[1] >= ttl_sec:
+        return None
+    return _load_tables(conn, json.loads(row[0]))
+
+
+def search_local(conn: sqlite3.Connection, query: str, limit: int = 10) -> list[dict]:
+    """
+    保存済みの統計表を名前で探す（API を使わない）
+    trigram は3文字未満の語を引けないので、短い語と古い SQLite では LIKE で探す
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if HAS_TRIGRAM and len(query) >= 3:
+        phrase = '"' + query.replace('"', '""') + '"'
+        ids = [r[0] for r in conn.execute(
+            "SELECT stats_data_id FROM stats_tables_fts WHERE stats_tables_fts MATCH ? ORDER BY rank LIMIT ?;",
+            (phrase, limit),
+        )]
+    else:
+        like = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        ids = [r[0] for r in conn.execute("""
+            SELECT stats_data_id FROM stats_tables
+            WHERE title LIKE ?1 ESCAPE '\\' OR stat_name LIKE ?1 ESCAPE '\\' OR statistics_name LIKE ?1 ESCAPE '\\'
+            ORDER BY updated_date DESC
+            LIMIT ?2;
+        """, (like, limit))]
+    return _load_tables(conn, ids)
+
+
+def meta_is_fresh(conn: sqlite3.Connection, stats_data_id: str, ttl_sec: int = META_TTL_SEC,
+                  now: int | None = None) -> bool:
+    now = int(now or time.time())
+    row = conn.execute("SELECT fetched_at FROM meta_fetched WHERE stats_data_id = ?;", (stats_data_id,)).fetchone()
+    return row is not None and now - row[0] < ttl_sec
+
+
+def save_meta(conn: sqlite3.Connection, stats_data_id: str, meta_json: dict, now: int | None = None) -> int:
+    """
+    getMetaInfo の CLASS_INF を class_info に入れ直す
+    returns: 保存した分類コードの数
+    """
+    now = int(now or time.time())
+    class_objs = (
+        meta_json.get("GET_META_INFO", {})
+        .get("METADATA_INF", {})
+        .get("CLASS_INF", {})
+        .get("CLASS_OBJ", [])
+    )
+    if isinstance(class_objs, dict):
+        class_objs = [class_objs]
+
+    rows = []
+    for obj in class_objs:
+        classes = obj.get("CLASS", [])
+        if isinstance(classes, dict):
+            classes = [classes]
+        for c in classes:
+            rows.append((
+                stats_data_id,
+                obj.get("@id"),
+                obj.get("@name"),
+                c.get("@code"),
+                c.get("@name"),
+                c.get("@level"),
+                c.get("@unit"),
+                c.get("@parentCode"),
+            ))
+
+    with conn:
+        conn.execute("DELETE FROM class_info WHERE stats_data_id = ?;", (stats_data_id,))
+        conn.executemany("""
+            INSERT OR REPLACE INTO class_info(stats_data_id, class_id, class_name, code, name, level, unit, parent_code)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """, rows)
+        conn.execute("""
+            INSERT INTO meta_fetched(stats_data_id, fetched_at) VALUES (?, ?)
+            ON CONFLICT(stats_data_id) DO UPDATE SET fetched_at=excluded.fetched_at;
+        """, (stats_data_id, now))
+    return len(rows)
+
+
+def class_labels(conn: sqlite3.Connection, stats_data_id: str, class_id: str) -> dict[str, str]:
+    """分類コード -> 名前（例: class_id="area" なら地域コード -> 地域名）"""
+    return dict(conn.execute(
+        "SELECT code, name FROM class_info WHERE stats_data_id = ? AND class_id = ?;",
+        (stats_data_id, class_id),
+    ))
@@ -0,0 +1,109 @@
+"""
+グラフ用に時系列を間引く（形を保ったまま、描く点の数を図の横幅に合わせて一定にする）
+  - SQL（M4）: 行を並び順で width 個の区間に分け、区間ごとに最初・最後・最小・最大の4点だけを返す
+               1ピクセル幅の区間の折れ線はこの4点で決まるので、横幅どおりに描くなら見た目は変わらない
+  - NumPy（LTTB）: Largest-Triangle-Three-Buckets。M4 で残った点から、形をよく保つ width 点を選ぶ
+保存している期間が長くなっても、Python に来る行数と plt.plot に渡す点の数は width で決まる。
+
+    fig = plt.figure(figsize=(8, 4))
+    x, y = downsample_observations(conn, width=int(fig.get_figwidth() * fig.dpi), area="13000")
+    plt.plot(x, y)
+"""
+import sqlite3
+
+import numpy as np
+
+# 区間ごとに最初・最後・最小・最大の行を返す。
+# SQLite では集約関数が MIN() か MAX() の1つだけなら、ほかの列はその行の値になるので、4つの GROUP BY を重ねている
+_M4_SQL = """
+WITH s(x, y) AS ({series}),
+numbered AS (
+    SELECT x, y, ROW_NUMBER() OVER (ORDER BY x) - 1 AS i FROM s WHERE y IS NOT NULL
+),
+b AS (
+    SELECT x, y, i, i * :width / (SELECT COUNT(*) FROM numbered) AS bucket FROM numbered
+)
+SELECT x, y, i FROM (
+    SELECT x, y, MIN(i) AS i FROM b GROUP BY bucket
+    UNION SELECT x, y, MAX(i) FROM b GROUP BY bucket
+    UNION SELECT x, MIN(y), i FROM b GROUP BY bucket
+    UNION SELECT x, MAX(y), i FROM b GROUP BY bucket
+)
+ORDER BY i;
+"""
+
+
+def m4(conn: sqlite3.Connection, series_sql: str, params: dict | None = None, width: int = 800) -> list[tuple]:
+    """
+    series_sql: (x, y) の2列を返す SELECT（x の順に並べる。y が NULL の行は除く）
+    returns: (x, y, 元の並びでの番号) を最大 4 * width 行
+    """
+    if width < 1:
+        raise ValueError("width は 1 以上にしてね")
+    return conn.execute(_M4_SQL.format(series=series_sql), {**(params or {}), "width": width}).fetchall()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets で n 点を選ぶ。選んだ点の添字（昇順）を返す
+    x は数値で昇順（時間軸コードのような文字列なら並びの番号を渡す）
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1])[:max(n, 0)]
+
+    # 両端は必ず残し、間を n - 2 個の区間に分ける
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    picked = np.empty(n, dtype=int)
+    picked[0] = 0
+    picked[-1] = size - 1
+    prev = 0
+    for k in range(n - 2):
+        start, end = edges[k], edges[k + 1]
+        # 次の区間の平均（最後の区間なら右端の点）を三角形の3つ目の頂点にする
+        nxt_start, nxt_end = end, edges[k + 2] if k + 2 < len(edges) else size
+        if nxt_start >= nxt_end:
+            nxt_start, nxt_end = size - 1, size
+        cx = x[nxt_start:nxt_end].mean()
+        cy = y[nxt_start:nxt_end].mean()
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[prev] - cx) * (by - y[prev]) - (x[prev] - bx) * (cy - y[prev]))
+        prev = start + int(area.argmax())
+        picked[k + 1] = prev
+    return picked
+
+
+def downsample(conn: sqlite3.Connection, series_sql: str, params: dict | None = None, width: int = 800,
+               method: str = "lttb") -> tuple[list, np.ndarray]:
+    """
+    series_sql の時系列を横幅 width 向けに間引いて (x のリスト, y の配列) を返す
+    method: "m4" なら SQL の4点/区間まで（最大 4 * width 点）、"lttb" ならそこからさらに width 点にする
+    """
+    if method not in ("m4", "lttb"):
+        raise ValueError("method は m4 か lttb です")
+    rows = m4(conn, series_sql, params, width)
+    xs = [r[0] for r in rows]
+    ys = np.array([r[1] for r in rows], dtype=float)
+    if method == "m4" or len(rows) <= width:
+        return xs, ys
+    # 文字列の時間軸コードでも間隔が分かるように、元の並びでの番号を横軸にして選ぶ
+    keep = lttb(np.array([r[2] for r in rows], dtype=float), ys, width)
+    return [xs[i] for i in keep], ys[keep]
+
+
+def downsample_observations(conn: sqlite3.Connection, width: int = 800, stats_data_id: str | None = None,
+                            area: str | None = None, method: str = "lttb") -> tuple[list, np.ndarray]:
+    """observations の (time, value) を統計表・地域で絞って間引く"""
+    where = ["value IS NOT NULL"]
+    params = {}
+    if stats_data_id:
+        where.append("stats_data_id = :stats_data_id")
+        params["stats_data_id"] = stats_data_id
+    if area:
+        where.append("area = :area")
+        params["area"] = area
+    series = f"SELECT time, value FROM observations WHERE {' AND '.join(where)}"
+    return downsample(conn, series, params, width, method)
+
@@ -0,0 +1,142 @@
+"""
+大きな JSON の中の配列を、本文をまとめて読まずに1要素ずつ取り出す（標準ライブラリだけで動く）
+    stream = JsonItemStream(r.iter_content(65536), ["GET_STATS_DATA", "STATISTICAL_DATA", "DATA_INF", "VALUE"])
+    for item in stream:       # VALUE の要素（dict）を受け取った順に返す
+        ...
+    stream.head               # 配列以外の部分（RESULT など）。配列より前の値は最初の要素を返す時点で入っている
+    stream.found              # 配列が見つかったか
+
+メモリに持つのは読みかけの要素1つ分と head だけなので、応答がどれだけ大きくても使う量はほぼ変わらない。
+path の途中にあるオブジェクトだけをたどり、それ以外の値（CLASS_INF など）は丸ごと json で読んで head に入れる。
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+# 読み終えた部分をこの文字数ごとに捨てる
+_COMPACT_CHARS = 64 * 1024
+
+
+class JsonItemStream:
+    def __init__(self, chunks: Iterable[bytes], path: list[str]):
+        if not path:
+            raise ValueError("path には配列までのキーを1つ以上指定してね")
+        self.path = list(path)
+        self.head: dict = {}
+        self.found = False
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._peek() != "{":
+            raise ValueError("JSON の先頭がオブジェクトではありません")
+        yield from self._object(self.head, 0)
+        # 末尾まで読み切る（chunks を渡した側の後始末もここで走る）
+        while self._fill():
+            pass
+        if self._buf[self._pos:].strip(_WHITESPACE):
+            raise ValueError("JSON のあとに余分なデータがあります")
+
+    # ---- 読み込み ----
+
+    def _fill(self, want: int = 1) -> bool:
+        """want 文字以上を読み足す（足りなくても終わりまで来たら止める）。1文字でも増えたら True"""
+        added = 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            self._buf += text
+            added += len(text)
+            if added >= want:
+                return True
+        if not self._eof:
+            self._eof = True
+            tail = self._utf8.decode(b"", final=True)
+            self._buf += tail
+            added += len(tail)
+        return added > 0
+
+    def _peek(self) -> str:
+        """空白を飛ばして次の文字を返す（位置は進めない）"""
+        if self._pos > _COMPACT_CHARS:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("JSON が途中で終わっています")
+
+    def _take(self, allowed: str) -> str:
+        ch = self._peek()
+        if ch not in allowed:
+            raise ValueError(f"JSON の {self._pos} 文字目に {allowed!r} のどれかがあるはずが {ch!r} でした")
+        self._pos += 1
+        return ch
+
+    def _value(self) -> Any:
+        """次の値を1つ丸ごと読む。途中で切れていたら読み足してやり直す"""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # 読みかけの分と同じだけ読み足す（大きな値でもやり直しの回数は対数で済む）
+                if self._fill(len(self._buf) - self._pos):
+                    continue
+                raise
+            # 数値は chunk の境目で切れていても読めてしまう（"2." や "1e" の手前までで止まる）ので、
+            # 末尾に届いたときや数値の続きになりうる文字が残っているときは、読み足して確かめる
+            if (end == len(self._buf) or self._continues_number(value, end)) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _continues_number(self, value: Any, end: int) -> bool:
+        return (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and self._buf[end] in ".eE+-")
+
+    # ---- 構造をたどる ----
+
+    def _object(self, into: dict, depth: int) -> Iterator[Any]:
+        self._take("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._take(":")
+            if key == self.path[depth]:
+                if depth == len(self.path) - 1:
+                    self.found = True
+                    yield from self._items()
+                elif self._peek() == "{":
+                    into[key] = {}
+                    yield from self._object(into[key], depth + 1)
+                else:
+                    into[key] = self._value()
+            else:
+                into[key] = self._value()
+            if self._take(",}") == "}":
+                return
+
+    def _items(self) -> Iterator[Any]:
+        # e-Stat は要素が1つだけのとき配列ではなくその要素を返す
+        if self._peek() != "[":
+            yield self._value()
+            return
+        self._pos += 1
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._take(",]") == "]":
+                return
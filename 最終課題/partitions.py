@@ -0,0 +1,181 @@
+"""
+統計表（statsDataId）ごとに SQLite ファイルを分けて保存する
+    estat_parts/{statsDataId}.db   それぞれに observations と sketches を持つ
+
+  - 1つの統計表を消すのはファイルの削除だけ（大きな DELETE や VACUUM が要らない）
+  - 索引の更新・VACUUM もファイルごとなので、表が増えても1回あたりの手間は変わらない
+  - まとめて集計するときは
+      federated(): 必要なファイルを ATTACH して observations_all（UNION ALL）に見せる。任意の SQL が使える
+      aggregate(): analyze.sql の「期ごと / 地域ごと」の集計を各ファイルで計算し（プロセスプールも可）、結果を足し合わせる
+"""
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from sketches import init_sketches
+
+PARTITION_DIR = "estat_parts"
+
+# ATTACH できる数の上限（SQLite の既定値）。これを超えるなら aggregate() を使う
+MAX_ATTACHED = 10
+
+
+def partition_path(stats_data_id: str, base_dir: str = PARTITION_DIR) -> str:
+    if not stats_data_id or not stats_data_id.replace("_", "").replace("-", "").isalnum():
+        raise ValueError(f"statsDataId が想定外です: {stats_data_id!r}")
+    return os.path.join(base_dir, f"{stats_data_id}.db")
+
+
+def init_partition(stats_data_id: str, base_dir: str = PARTITION_DIR) -> str:
+    """ファイルが無ければ作り、observations / sketches を用意する。パスを返す"""
+    os.makedirs(base_dir, exist_ok=True)
+    path = partition_path(stats_data_id, base_dir)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS observations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stats_data_id TEXT,
+        value REAL,
+        time TEXT,
+        area TEXT,
+        dims_json TEXT,
+        scraped_at TEXT DEFAULT (datetime('now'))
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_obs_time ON observations(time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_obs_area ON observations(area);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_obs_sid_time ON observations(stats_data_id, time);")
+    conn.commit()
+    init_sketches(conn)
+    conn.close()
+    return path
+
+
+def list_partitions(base_dir: str = PARTITION_DIR) -> list[str]:
+    """保存済みの statsDataId の一覧"""
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(name[:-3] for name in os.listdir(base_dir) if name.endswith(".db"))
+
+
+def drop_partition(stats_data_id: str, base_dir: str = PARTITION_DIR) -> bool:
+    """統計表を1つ消す（ファイルを消すだけ）。消したら True"""
+    path = partition_path(stats_data_id, base_dir)
+    found = os.path.exists(path)
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return found
+
+
+def split_into_partitions(db_path: str, base_dir: str = PARTITION_DIR) -> dict[str, int]:
+    """
+    1つの DB の observations を統計表ごとのファイルへ移す（移した行は元の DB から消す）
+    returns: statsDataId -> 移した行数
+    """
+    conn = sqlite3.connect(db_path)
+    ids = [r[0] for r in conn.execute("SELECT DISTINCT stats_data_id FROM observations WHERE stats_data_id IS NOT NULL;")]
+    moved = {}
+    for sid in ids:
+        path = init_partition(sid, base_dir)
+        conn.execute("ATTACH DATABASE ? AS part;", (path,))
+        with conn:
+            moved[sid] = conn.execute("""
+                INSERT INTO part.observations(stats_data_id, value, time, area, dims_json, scraped_at)
+                SELECT stats_data_id, value, time, area, dims_json, scraped_at
+                FROM main.observations WHERE stats_data_id = ?;
+            """, (sid,)).rowcount
+            if _has_table(conn, "main", "sketches"):
+                conn.execute("""
+                    INSERT OR REPLACE INTO part.sketches SELECT * FROM main.sketches WHERE stats_data_id = ?;
+                """, (sid,))
+                conn.execute("DELETE FROM main.sketches WHERE stats_data_id = ?;", (sid,))
+            conn.execute("DELETE FROM main.observations WHERE stats_data_id = ?;", (sid,))
+        conn.execute("DETACH DATABASE part;")
+    conn.close()
+    return moved
+
+
+def _has_table(conn: sqlite3.Connection, schema: str, name: str) -> bool:
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?;", (name,)
+    ).fetchone() is not None
+
+
+@contextmanager
+def federated(stats_data_ids: list[str] | None = None, base_dir: str = PARTITION_DIR):
+    """
+    指定した統計表（省略時は全部）のファイルを ATTACH し、observations_all として1つに見せた接続を返す
+        with federated(["0003", "0004"]) as conn:
+            conn.execute("SELECT time, AVG(value) FROM observations_all GROUP BY time")
+    """
+    ids = list_partitions(base_dir) if stats_data_ids is None else list(stats_data_ids)
+    if not ids:
+        raise ValueError("統計表のファイルがありません")
+    if len(ids) > MAX_ATTACHED:
+        raise ValueError(f"ATTACH できるのは {MAX_ATTACHED} ファイルまでです（aggregate() を使ってね）")
+    conn = sqlite3.connect(":memory:")
+    try:
+        selects = []
+        for i, sid in enumerate(ids):
+            path = partition_path(sid, base_dir)
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            conn.execute(f"ATTACH DATABASE ? AS p{i};", (path,))
+            selects.append(f"SELECT * FROM p{i}.observations")
+        conn.execute(f"CREATE TEMP VIEW observations_all AS {' UNION ALL '.join(selects)};")
+        yield conn
+    finally:
+        conn.close()
+
+
+# ---- 振り分けて集計 ----
+
+def _partial(args: tuple[str, str]) -> list[tuple]:
+    """1ファイル分の部分集計（プロセスプールから呼ばれる）: (key, n, sum, min, max)"""
+    path, dim = args
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"""
+            SELECT {dim}, COUNT(*), SUM(value), MIN(value), MAX(value)
+            FROM observations
+            WHERE value IS NOT NULL AND {dim} IS NOT NULL AND {dim} <> ''
+            GROUP BY {dim};
+        """).fetchall()
+    finally:
+        conn.close()
+
+
+def aggregate(dim: str = "time", stats_data_ids: list[str] | None = None, workers: int = 0,
+              base_dir: str = PARTITION_DIR) -> list[dict]:
+    """
+    analyze.sql の期ごと / 地域ごとの集計（件数・平均・最小・最大）を全ファイルに振り分けて計算し、足し合わせる
+    AVG はそのまま足せないので、各ファイルでは SUM と COUNT を返して最後に割る
+    workers > 1 ならプロセスプールで並べて読む
+    """
+    if dim not in ("time", "area"):
+        raise ValueError("dim は time か area です")
+    ids = list_partitions(base_dir) if stats_data_ids is None else list(stats_data_ids)
+    jobs = [(partition_path(sid, base_dir), dim) for sid in ids]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_partial, jobs))
+    else:
+        partials = [_partial(job) for job in jobs]
+
+    merged: dict[str, list] = {}
+    for rows in partials:
+        for key, n, total, lo, hi in rows:
+            m = merged.get(key)
+            if m is None:
+                merged[key] = [n, total, lo, hi]
+            else:
+                m[0] += n
+                m[1] += total
+                m[2] = min(m[2], lo)
+                m[3] = max(m[3], hi)
+    return [
+        {dim: key, "n": n, "avg_value": total / n, "min_value": lo, "max_value": hi}
+        for key, (n, total, lo, hi) in sorted(merged.items())
+    ]
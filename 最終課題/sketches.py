@@ -0,0 +1,308 @@
+"""
+取り込み時に作る集計用のスケッチ（近似統計）
+  - TDigest:     分位点（中央値・90%点など）。数百個の重心だけを持つ
+  - HyperLogLog: 異なり数（地域の数・期の数）。2^p バイトのレジスタだけを持つ
+どちらも同じ種類どうしを足し合わせられる（merge）ので、(統計表, 期) / (統計表, 地域) ごとに作っておけば
+全体の中央値も「グループ数ぶんの読み出し」だけで求まり、observations を並べ替えなくてよい。
+
+sketches テーブルにバイナリで保存し、SQLite の集約関数からも使える:
+    SELECT key, tdigest_quantile(tdigest, 0.5), hll_count(hll) FROM sketches
+    WHERE stats_data_id = ? AND dim = 'time' GROUP BY key;
+"""
+import hashlib
+import math
+import sqlite3
+import struct
+import zlib
+from array import array
+from typing import Iterable
+
+TDIGEST_COMPRESSION = 100.0
+HLL_PRECISION = 10               # レジスタ 1024 個（誤差 ±3% 程度）
+_BUFFER_SIZE = 500               # これだけ溜まったら重心にまとめる
+
+# dim ごとに、分位点を取る値と異なり数を数える次元
+DIMS = {
+    "time": "area",   # 期ごとに: 値の分布 + 地域の数
+    "area": "time",   # 地域ごとに: 値の分布 + 期の数
+}
+
+
+class TDigest:
+    """merging t-digest（スケール関数 k1）"""
+
+    _HEADER = struct.Struct("<dddI")
+
+    def __init__(self, compression: float = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means: list[float] = []
+        self.weights: list[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: list[float] = []
+
+    @property
+    def count(self) -> float:
+        return sum(self.weights) + len(self._buffer)
+
+    def add(self, x: float) -> None:
+        self._buffer.append(x)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self._buffer) >= _BUFFER_SIZE:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._compress()
+        self._compress(list(zip(other.means, other.weights)))
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _compress(self, extra: list[tuple[float, float]] = ()) -> None:
+        if not self._buffer and not extra:
+            return
+        items = list(zip(self.means, self.weights))
+        items.extend((x, 1.0) for x in self._buffer)
+        items.extend(extra)
+        items.sort()
+        self._buffer = []
+        if not items:
+            return
+
+        total = sum(w for _, w in items)
+        means, weights = [], []
+        cur_m, cur_w = items[0]
+        so_far = 0.0
+        q_limit = self._k_inv(self._k(0.0) + 1)
+        for m, w in items[1:]:
+            if (so_far + cur_w + w) / total <= q_limit:
+                cur_w += w
+                cur_m += (m - cur_m) * w / cur_w
+            else:
+                means.append(cur_m)
+                weights.append(cur_w)
+                so_far += cur_w
+                q_limit = self._k_inv(self._k(so_far / total) + 1)
+                cur_m, cur_w = m, w
+        means.append(cur_m)
+        weights.append(cur_w)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        self._compress()
+        n = len(self.means)
+        if n == 0:
+            return math.nan
+        if n == 1:
+            return self.means[0]
+        total = sum(self.weights)
+        target = min(max(q, 0.0), 1.0) * total
+
+        # 重心の中心どうしを直線でつなぐ。両端は min / max まで伸ばす
+        first_half = self.weights[0] / 2
+        if target < first_half:
+            return self.min + (self.means[0] - self.min) * target / first_half
+        cum = 0.0
+        for i in range(n - 1):
+            left = cum + self.weights[i] / 2
+            right = cum + self.weights[i] + self.weights[i + 1] / 2
+            if target <= right:
+                frac = (target - left) / (right - left)
+                return self.means[i] + frac * (self.means[i + 1] - self.means[i])
+            cum += self.weights[i]
+        last_half = self.weights[-1] / 2
+        frac = (target - (total - last_half)) / last_half
+        return self.means[-1] + frac * (self.max - self.means[-1])
+
+    def to_bytes(self) -> bytes:
+        self._compress()
+        pairs = array("d")
+        for m, w in zip(self.means, self.weights):
+            pairs.append(m)
+            pairs.append(w)
+        return self._HEADER.pack(self.compression, self.min, self.max, len(self.means)) + pairs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        compression, lo, hi, n = cls._HEADER.unpack_from(data)
+        td = cls(compression)
+        td.min, td.max = lo, hi
+        pairs = array("d")
+        pairs.frombytes(data[cls._HEADER.size:cls._HEADER.size + n * 16])
+        td.means = list(pairs[0::2])
+        td.weights = list(pairs[1::2])
+        return td
+
+
+class HyperLogLog:
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.registers = bytearray(1 << p)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        idx = h >> (64 - self.p)
+        rest = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - rest.bit_length(), 64 - self.p) + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("精度(p)の違う HyperLogLog は足し合わせられません")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # 少ないときは空きレジスタの数から数える
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        # 地域・期の数は少ないのでレジスタのほとんどが 0。圧縮すると数十バイトになる
+        return bytes([self.p]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        hll = cls(data[0])
+        hll.registers = bytearray(zlib.decompress(data[1:]))
+        return hll
+
+
+# ---- 保存 ----
+
+def init_sketches(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sketches (
+        stats_data_id TEXT NOT NULL,
+        dim TEXT NOT NULL,
+        key TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        tdigest BLOB NOT NULL,
+        hll BLOB NOT NULL,
+        PRIMARY KEY (stats_data_id, dim, key)
+    ) WITHOUT ROWID;
+    """)
+    conn.commit()
+
+
+def update_sketches(conn: sqlite3.Connection, stats_data_id: str, rows: Iterable[tuple], replace: bool = False) -> int:
+    """
+    rows: (value, time, area) の並び。グループごとに保存済みのスケッチへ足し込む
+    replace=True なら保存済みのものを捨てて作り直す（rebuild_sketches 用）
+    returns: 更新したグループ数
+    """
+    groups: dict[tuple[str, str], tuple[TDigest, HyperLogLog, list[int]]] = {}
+    for value, t, a in rows:
+        coords = {"time": t, "area": a}
+        for dim, other in DIMS.items():
+            key = coords[dim]
+            if key is None:
+                continue
+            g = groups.get((dim, key))
+            if g is None:
+                g = groups[(dim, key)] = (TDigest(), HyperLogLog(), [0])
+            if value is not None:
+                g[0].add(value)
+                g[2][0] += 1
+            if coords[other] is not None:
+                g[1].add(coords[other])
+
+    for (dim, key), (td, hll, n) in groups.items():
+        if not replace:
+            old = conn.execute(
+                "SELECT n, tdigest, hll FROM sketches WHERE stats_data_id = ? AND dim = ? AND key = ?;",
+                (stats_data_id, dim, key),
+            ).fetchone()
+            if old is not None:
+                n[0] += old[0]
+                td.merge(TDigest.from_bytes(old[1]))
+                hll.merge(HyperLogLog.from_bytes(old[2]))
+        conn.execute("""
+            INSERT INTO sketches(stats_data_id, dim, key, n, tdigest, hll) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(stats_data_id, dim, key) DO UPDATE SET
+                n=excluded.n, tdigest=excluded.tdigest, hll=excluded.hll;
+        """, (stats_data_id, dim, key, n[0], td.to_bytes(), hll.to_bytes()))
+    return len(groups)
+
+
+def rebuild_sketches(conn: sqlite3.Connection, stats_data_id: str) -> int:
+    """
+    observations から作り直す。t-digest は値を取り除けないので、行を入れ替えたとき（差分取得）に使う
+    """
+    conn.execute("DELETE FROM sketches WHERE stats_data_id = ?;", (stats_data_id,))
+    cur = conn.execute("SELECT value, time, area FROM observations WHERE stats_data_id = ?;", (stats_data_id,))
+    return update_sketches(conn, stats_data_id, cur, replace=True)
+
+
+# ---- 問い合わせ ----
+
+class _QuantileAgg:
+    def __init__(self):
+        self.td = None
+        self.q = 0.5
+
+    def step(self, blob, q):
+        if blob is None:
+            return
+        self.q = q
+        td = TDigest.from_bytes(blob)
+        self.td = td if self.td is None else self.td.merge(td)
+
+    def finalize(self):
+        if self.td is None or not self.td.weights:
+            return None
+        return self.td.quantile(self.q)
+
+
+class _DistinctAgg:
+    def __init__(self):
+        self.hll = None
+
+    def step(self, blob):
+        if blob is None:
+            return
+        hll = HyperLogLog.from_bytes(blob)
+        self.hll = hll if self.hll is None else self.hll.merge(hll)
+
+    def finalize(self):
+        return None if self.hll is None else self.hll.count()
+
+
+def register_functions(conn: sqlite3.Connection):
+    """集約関数 tdigest_quantile(tdigest, q) と hll_count(hll) を使えるようにする"""
+    conn.create_aggregate("tdigest_quantile", 2, _QuantileAgg)
+    conn.create_aggregate("hll_count", 1, _DistinctAgg)
+
+
+def summarize(conn: sqlite3.Connection, stats_data_id: str, dim: str, quantiles: list[float]) -> list[dict]:
+    """
+    グループ（dim='time' なら期、'area' なら地域）ごとの件数・分位点・異なり数
+    読むのはグループ数ぶんのスケッチだけ
+    """
+    if dim not in DIMS:
+        raise ValueError(f"dim は {'/'.join(DIMS)} のどれかです")
+    out = []
+    for key, n, td_blob, hll_blob in conn.execute(
+        "SELECT key, n, tdigest, hll FROM sketches WHERE stats_data_id = ? AND dim = ? ORDER BY key;",
+        (stats_data_id, dim),
+    ):
+        td = TDigest.from_bytes(td_blob)
+        row = {dim: key, "n": n, f"distinct_{DIMS[dim]}": HyperLogLog.from_bytes(hll_blob).count()}
+        for q in quantiles:
+            row[f"p{q * 100:g}"] = td.quantile(q) if n else None
+        out.append(row)
+    return out
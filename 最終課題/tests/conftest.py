@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests/ から 最終課題 のモジュールを import できるようにする（最終課題 をパスに足す）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
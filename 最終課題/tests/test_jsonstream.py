@@ -0,0 +1,58 @@
+"""
+JsonItemStream が chunk の境目の位置によらず、json.loads と同じ値を返すことを確かめる
+"""
+import json
+
+import pytest
+
+from jsonstream import JsonItemStream
+
+PATH = ["GET_STATS_DATA", "STATISTICAL_DATA", "DATA_INF", "VALUE"]
+
+DOCUMENT = json.dumps({
+    "GET_STATS_DATA": {
+        "RESULT": {"STATUS": 0, "n": 12.5, "exp": -3.25e-7, "big": 1234567, "flag": True, "none": None},
+        "STATISTICAL_DATA": {
+            "TABLE_INF": {"id": "0003448237", "ratio": 1.5E+3},
+            "DATA_INF": {
+                "VALUE": [1234567, 2.5e10, -0.125, {"$": "12.0", "@area": "13000", "w": 6.02e+23}, 0, -7],
+            },
+            "TOTAL": 98765.4321,
+        },
+    },
+}, ensure_ascii=False)
+
+
+def expected():
+    doc = json.loads(DOCUMENT)
+    head = json.loads(DOCUMENT)
+    del head["GET_STATS_DATA"]["STATISTICAL_DATA"]["DATA_INF"]["VALUE"]
+    return doc["GET_STATS_DATA"]["STATISTICAL_DATA"]["DATA_INF"]["VALUE"], head
+
+
+def read(chunks):
+    stream = JsonItemStream(chunks, PATH)
+    items = list(stream)
+    assert stream.found
+    return items, stream.head
+
+
+@pytest.mark.parametrize("split", range(1, len(DOCUMENT.encode("utf-8"))))
+def test_every_split_position(split):
+    data = DOCUMENT.encode("utf-8")
+    assert read([data[:split], data[split:]]) == expected()
+
+
+def test_one_byte_chunks():
+    data = DOCUMENT.encode("utf-8")
+    assert read(data[i:i + 1] for i in range(len(data))) == expected()
+
+
+def test_number_split_after_dot():
+    # "2." で切れても 2 と 5e10 に分かれずに 2.5e10 として読む
+    assert list(JsonItemStream([b'{"VALUE": [1234567, 2.', b'5e10]}'], ["VALUE"])) == [1234567, 2.5e10]
+
+
+def test_truncated_number_is_an_error():
+    with pytest.raises(ValueError):
+        list(JsonItemStream([b'{"VALUE": [1, 2.'], ["VALUE"]))